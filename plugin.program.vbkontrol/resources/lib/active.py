@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+
+"""
+VB Kontrol - Active background
+Maps the window Kodi shows (and, for the video library, what it lists)
+to a slot through a table built from the slot names, so the service can
+publish the one background a skin should show and the skin needs a
+single control instead of a visibility condition per slot.
+"""
+
+HOME_WINDOW = 10000
+
+# window ID[:content]=slot name, matched against the universal default
+# names; the active_window_map setting adds to and overrides these
+DEFAULT_RULES = (
+    "10000=Home, 10025:movies=Movies, 10025:sets=Movies, 10025:tvshows=TV Shows, "
+    "10025:seasons=TV Shows, 10025:episodes=TV Shows, 10025=Videos, 10502=Music, "
+    "10002=Pictures, 10060=Favourites, 10040=Add-ons, 10004=Settings, 12600=Weather, "
+    "10001=Programs, 10820=Games, 10007=System, 10700=Live TV, 10702=Live TV, "
+    "10705=Radio, 10707=Radio, 10003=Files, 10028=Playlists, 10500=Playlists"
+)
+
+
+def parse_rules(text):
+    """{(window ID, content or None): slot name} from "10025:movies=Movies, 10502=Music".
+
+    Raises ValueError on a rule that is not window[:content]=name.
+    """
+    rules = {}
+    for rule in text.split(','):
+        if not rule.strip():
+            continue
+        key, separator, name = rule.partition('=')
+        window, _, content = key.strip().partition(':')
+        if not separator or not name.strip() or not window.strip().isdigit():
+            raise ValueError(rule.strip())
+        rules[(int(window), content.strip().lower() or None)] = name.strip()
+    return rules
+
+
+class ActiveMap:
+    """(window ID, content) -> slot lookup, rebuilt when slot names change"""
+
+    def __init__(self, custom_rules=''):
+        self.rules = parse_rules(DEFAULT_RULES)
+        self.rules.update(parse_rules(custom_rules))
+        self.table = {}
+        self.content_windows = set()  # windows with rules that depend on Container.Content
+
+    def rebuild(self, slot_names):
+        """Resolve the rules against lowercase slot name -> slot_num"""
+        self.table = {key: slot_names[name.lower()] for key, name in self.rules.items()
+                      if name.lower() in slot_names}
+        self.content_windows = {window for window, content in self.table if content}
+
+    def lookup(self, window, content=None):
+        """Slot for a window (listing `content`), or None"""
+        return self.table.get((window, content)) or self.table.get((window, None))
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+
+"""
+VB Kontrol - Change notifications
+The plugin broadcasts which slots it changed; the service listens in
+xbmc.Monitor.onNotification and republishes only those slots
+"""
+
+import json
+
+import xbmc
+
+from resources.lib.slotstore import ADDON_ID
+
+SLOTS_CHANGED = "SlotsChanged"
+CANCEL_FASTSTART = "CancelFaststart"
+PROFILE_SERVICE = "ProfileService"
+PROFILES_CHANGED = "ProfilesChanged"  # slot profiles or their skins changed
+
+
+def notify(message, data=None):
+    """Broadcast a VB Kontrol notification to every xbmc.Monitor"""
+    request = {
+        'jsonrpc': '2.0',
+        'method': 'JSONRPC.NotifyAll',
+        'params': {'sender': ADDON_ID, 'message': message, 'data': data or {}},
+        'id': 1,
+    }
+    try:
+        xbmc.executeJSONRPC(json.dumps(request))
+    except Exception as e:
+        xbmc.log(f"[VBKontrol] Error sending {message} notification: {e}", xbmc.LOGERROR)
+
+
+def notify_slots_changed(slots):
+    """Broadcast a SlotsChanged notification carrying the affected slot ids"""
+    notify(SLOTS_CHANGED, {'slots': sorted(set(slots))})
+
+
+def parse_notification(sender, method, data):
+    """(message, payload) from an onNotification call, or (None, None) if it is not ours"""
+    if sender != ADDON_ID:
+        return None, None
+    try:
+        payload = json.loads(data) if data else {}
+    except ValueError:
+        return None, None
+    # Kodi prefixes NotifyAll messages with "Other."
+    return method.rsplit('.', 1)[-1], payload if isinstance(payload, dict) else {}
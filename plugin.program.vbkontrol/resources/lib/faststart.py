@@ -0,0 +1,394 @@
+# -*- coding: utf-8 -*-
+
+"""
+VB Kontrol - Faststart remux
+Rewrites MP4 backgrounds whose moov box sits after the media data so the
+moov comes first. Pure stream copy: sample data is copied byte for byte
+and only the stco/co64 chunk offsets inside the moov are shifted.
+"""
+
+import hashlib
+import os
+import queue
+import struct
+import threading
+
+import xbmc
+import xbmcgui
+import xbmcvfs
+
+from resources.lib.mediainfo import iter_boxes, read_top_level_boxes
+from resources.lib.slotstore import ADDON_DATA
+
+CACHE_FOLDER = ADDON_DATA + "faststart/"
+COPY_CHUNK = 1024 * 1024
+SWEEP = object()  # worker queue item: delete copies of sources no longer retained
+
+# Boxes on the path from moov down to the chunk offset tables
+OFFSET_CONTAINERS = {b'moov', b'trak', b'mdia', b'minf', b'stbl'}
+
+
+class FaststartCancelled(Exception):
+    pass
+
+
+def _box(kind, payload):
+    if len(payload) + 8 > 0xFFFFFFFF:
+        return struct.pack('>I4sQ', 1, kind, len(payload) + 16) + payload
+    return struct.pack('>I4s', len(payload) + 8, kind) + payload
+
+
+def _rebuild_moov(data, start, end, shift, force_co64):
+    """Serialize a moov subtree with every chunk offset passed through `shift`"""
+    out = bytearray()
+    for kind, body, body_end in iter_boxes(data, start, end):
+        if kind in OFFSET_CONTAINERS:
+            out += _box(kind, _rebuild_moov(data, body, body_end, shift, force_co64))
+        elif kind in (b'stco', b'co64'):
+            version_flags, count = struct.unpack_from('>4sI', data, body)
+            wide = kind == b'co64'
+            entry = '>Q' if wide else '>I'
+            step = 8 if wide else 4
+            offsets = [shift(struct.unpack_from(entry, data, body + 8 + i * step)[0]) for i in range(count)]
+            if wide or force_co64:
+                payload = version_flags + struct.pack('>I', count) + struct.pack(f'>{count}Q', *offsets)
+                out += _box(b'co64', payload)
+            else:
+                payload = version_flags + struct.pack('>I', count) + struct.pack(f'>{count}I', *offsets)
+                out += _box(b'stco', payload)
+        else:
+            out += _box(kind, data[body:body_end])
+    return bytes(out)
+
+
+def _max_stco_offset(data, start, end):
+    highest = 0
+    for kind, body, body_end in iter_boxes(data, start, end):
+        if kind in OFFSET_CONTAINERS:
+            highest = max(highest, _max_stco_offset(data, body, body_end))
+        elif kind == b'stco':
+            count = struct.unpack_from('>I', data, body + 4)[0]
+            if count:
+                highest = max(highest, max(struct.unpack_from(f'>{count}I', data, body + 8)))
+    return highest
+
+
+def plan_faststart(f, file_size):
+    """(moov bytes, copy plan) to move the moov first, or None if not needed.
+
+    The copy plan is a list of (offset, size) ranges of the source file to
+    write after the new moov, in order.
+    """
+    boxes = read_top_level_boxes(f, file_size)
+    kinds = [box[0] for box in boxes]
+    if b'moov' not in kinds or b'mdat' not in kinds:
+        return None
+    moov_index = kinds.index(b'moov')
+    mdat_index = kinds.index(b'mdat')
+    if moov_index < mdat_index:
+        return None
+
+    _, moov_offset, header_size, moov_size = boxes[moov_index]
+    f.seek(moov_offset)
+    data = f.read(moov_size)
+    if len(data) != moov_size:
+        return None
+
+    # New layout: boxes before the first mdat, moov, then everything else
+    insert_at = boxes[mdat_index][1]
+    moov_end = moov_offset + moov_size
+    head = [(offset, size) for _, offset, _, size in boxes[:mdat_index]]
+    tail = [(offset, size) for i, (_, offset, _, size) in enumerate(boxes)
+            if i >= mdat_index and i != moov_index]
+
+    def build(force_co64, new_size):
+        def shift(offset):
+            if offset >= moov_end:
+                return offset + new_size - moov_size
+            if offset >= insert_at:
+                return offset + new_size
+            return offset
+        return _box(b'moov', _rebuild_moov(data, header_size, moov_size, shift, force_co64))
+
+    # Box sizes do not depend on the offset values, so size the new moov
+    # first, switch to co64 if the shifted offsets no longer fit 32 bits,
+    # then build it for real
+    force_co64 = False
+    new_size = len(build(False, 0))
+    if _max_stco_offset(data, header_size, moov_size) + new_size > 0xFFFFFFFF:
+        force_co64 = True
+        new_size = len(build(True, 0))
+    return build(force_co64, new_size), head, tail
+
+
+def remux_faststart(source, destination, progress=None, cancel=None, pause=None):
+    """Write a moov-first copy of `source` to `destination`.
+
+    Returns False if the file is not an MP4 that needs it. `progress` is
+    called with a percentage; `cancel` is a threading.Event checked
+    between chunks and `pause`, if given, is called between chunks and
+    may block. Raises FaststartCancelled if cancelled.
+    """
+    file_size = os.path.getsize(source)
+    with open(source, 'rb') as src:
+        plan = plan_faststart(src, file_size)
+        if plan is None:
+            return False
+        moov, head, tail = plan
+
+        tmp_path = destination + '.part'
+        total = sum(size for _, size in head + tail) + len(moov)
+        written = 0
+        try:
+            with open(tmp_path, 'wb') as dst:
+                for offset, size in head:
+                    written += _copy_range(src, dst, offset, size, cancel, pause)
+                dst.write(moov)
+                written += len(moov)
+                for offset, size in tail:
+                    remaining = size
+                    while remaining > 0:
+                        chunk = min(COPY_CHUNK * 8, remaining)
+                        _copy_range(src, dst, offset + size - remaining, chunk, cancel, pause)
+                        remaining -= chunk
+                        written += chunk
+                        if progress:
+                            progress(int(written * 100 / total))
+            os.replace(tmp_path, destination)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+    return True
+
+
+def _copy_range(src, dst, offset, size, cancel, pause=None):
+    src.seek(offset)
+    remaining = size
+    while remaining > 0:
+        if pause:
+            pause()
+        if cancel is not None and cancel.is_set():
+            raise FaststartCancelled()
+        data = src.read(min(COPY_CHUNK, remaining))
+        if not data:
+            raise IOError("Unexpected end of file")
+        dst.write(data)
+        remaining -= len(data)
+    return size
+
+
+class FaststartManager:
+    """Background queue of faststart jobs for assigned slot videos"""
+
+    def __init__(self, log=None, gate=None):
+        self._log = log
+        self._gate = gate  # IOGate pausing remuxes, e.g. during playback
+        self.folder = xbmcvfs.translatePath(CACHE_FOLDER)
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._queued = set()
+        self._current = None
+        self._cancel = threading.Event()
+        self._optimized = {}   # source path -> optimized copy
+        self._plain = {}       # source path -> would-be copy, for sources already moov-first
+        self._retained = None  # cache keys of assigned sources, None until retain()
+        self._sweep_queued = False
+        self._changed = set()
+        self._thread = threading.Thread(target=self._run, name="VBKontrolFaststart", daemon=True)
+        self._thread.start()
+
+    def log(self, message, level=xbmc.LOGINFO):
+        if self._log:
+            self._log(message, level)
+
+    def resolve(self, video_path):
+        """Optimized copy of `video_path` if one is ready, else the path itself"""
+        return self._optimized.get(video_path, video_path)
+
+    def sources(self, paths):
+        """Source paths whose optimized copy is one of `paths`"""
+        with self._lock:
+            return {source for source, copy in self._optimized.items() if copy in paths}
+
+    def request(self, video_path):
+        """Queue a video for faststart checking. An optimized video is checked
+        again: if its source was overwritten the copy is dropped and redone"""
+        with self._lock:
+            if video_path in self._queued or video_path == self._current:
+                return
+            self._queued.add(video_path)
+        self._queue.put(video_path)
+
+    def retain(self, video_paths):
+        """Cancel and forget work for videos no longer assigned to any slot,
+        and have the worker delete their cached copies"""
+        retained = {self.cache_key(xbmcvfs.translatePath(path)) for path in video_paths}
+        with self._lock:
+            self._queued &= set(video_paths)
+            for path in set(self._optimized) - set(video_paths):
+                del self._optimized[path]
+            for path in set(self._plain) - set(video_paths):
+                del self._plain[path]
+            if self._current and self._current not in video_paths:
+                self._cancel.set()
+            self._retained = retained
+            if self._sweep_queued:
+                return
+            self._sweep_queued = True
+        self._queue.put(SWEEP)
+
+    def cancel(self):
+        """Cancel the running job and drop everything queued"""
+        with self._lock:
+            self._queued.clear()
+            if self._current:
+                self._cancel.set()
+
+    def take_changed(self):
+        """Source paths whose optimized copy became ready or went away"""
+        with self._lock:
+            changed, self._changed = self._changed, set()
+        return changed
+
+    def stop(self):
+        self.cancel()
+        self._queue.put(None)
+
+    @staticmethod
+    def cache_key(source):
+        """Prefix shared by every cache file of `source`"""
+        return hashlib.sha1(source.encode('utf-8')).hexdigest()[:16]
+
+    def output_path(self, source):
+        """Cache file for `source`, keyed by its path, size and mtime"""
+        st = os.stat(source)
+        return os.path.join(self.folder, f"{self.cache_key(source)}-{st.st_size}-{st.st_mtime_ns}.mp4")
+
+    def _run(self):
+        while True:
+            video_path = self._queue.get()
+            if video_path is None:
+                return
+            if video_path is SWEEP:
+                if self._gate:
+                    self._gate.wait()
+                self._sweep()
+                continue
+            with self._lock:
+                if video_path not in self._queued:
+                    continue
+                self._queued.discard(video_path)
+                self._current = video_path
+                self._cancel.clear()
+            if self._gate:
+                self._gate.wait()
+            try:
+                self._process(video_path)
+            except Exception as e:
+                self.log(f"Faststart failed for {video_path}: {e}", xbmc.LOGERROR)
+            finally:
+                with self._lock:
+                    self._current = None
+
+    def _process(self, video_path):
+        source = xbmcvfs.translatePath(video_path)
+        if not source.lower().endswith(('.mp4', '.m4v', '.mov')) or not os.path.isfile(source):
+            # Only local MP4 files can be stream-copied here
+            self._drop(video_path)
+            return
+        destination = self.output_path(source)
+        with self._lock:
+            # Checked at this size and mtime already
+            current = destination in (self._optimized.get(video_path), self._plain.get(video_path))
+        if current:
+            return
+        # The source changed size or mtime since its copy was made
+        self._drop(video_path)
+        if not os.path.exists(destination):
+            if not os.path.isdir(self.folder):
+                xbmcvfs.mkdirs(self.folder)
+            if not self._remux(video_path, source, destination):
+                return
+        self._remove_stale(destination)
+        with self._lock:
+            self._optimized[video_path] = destination
+            self._changed.add(video_path)
+
+    def _remux(self, video_path, source, destination):
+        name = os.path.basename(source)
+        progress = None
+        window = xbmcgui.Window(10000)
+        try:
+            with open(source, 'rb') as f:
+                if plan_faststart(f, os.path.getsize(source)) is None:
+                    with self._lock:
+                        self._plain[video_path] = destination
+                    return False
+
+            self.log(f"Moving moov atom to the front of {name}")
+            window.setProperty('VBKontrol.Faststart.Running', 'true')
+            progress = xbmcgui.DialogProgressBG()
+            progress.create("VB Kontrol", f"Optimizing {name} for fast start")
+            remux_faststart(
+                source, destination,
+                progress=lambda percent: progress.update(percent),
+                cancel=self._cancel,
+                pause=self._gate.wait if self._gate else None
+            )
+            self.log(f"Optimized copy of {name} ready")
+            return True
+        except FaststartCancelled:
+            self.log(f"Faststart cancelled for {name}")
+            return False
+        finally:
+            window.clearProperty('VBKontrol.Faststart.Running')
+            if progress:
+                progress.close()
+
+    def _sweep(self):
+        # Copies of sources no assigned slot uses any more, including ones
+        # left by an earlier run; the worker is idle, so nothing is being written
+        with self._lock:
+            self._sweep_queued = False
+            retained = self._retained
+        try:
+            names = os.listdir(self.folder)
+        except OSError:
+            return
+        removed = 0
+        for name in names:
+            if name.split('-', 1)[0] not in retained:
+                try:
+                    os.remove(os.path.join(self.folder, name))
+                    removed += 1
+                except OSError:
+                    pass
+        if removed:
+            self.log(f"Removed {removed} optimized copies of videos no longer assigned")
+
+    def _drop(self, video_path):
+        # Point skins back at the source and delete its outdated copy
+        with self._lock:
+            copy = self._optimized.pop(video_path, None)
+            if copy is None:
+                return
+            self._changed.add(video_path)
+        try:
+            os.remove(copy)
+        except OSError:
+            pass
+        self.log(f"Dropped the optimized copy of {os.path.basename(video_path)}: the source changed")
+
+    def _remove_stale(self, destination):
+        # Older copies of the same source (different size/mtime)
+        prefix = os.path.basename(destination).split('-', 1)[0] + '-'
+        for name in os.listdir(self.folder):
+            path = os.path.join(self.folder, name)
+            if name.startswith(prefix) and path != destination:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+
+"""
+VB Kontrol - Home menu focus tracking
+Reads the focused main-menu item (and its neighbours) from the skin via
+info labels, so the service can map it to a slot by name, and debounces
+background switches while the user scrolls
+"""
+
+import time
+
+import xbmc
+
+
+class FocusTracker:
+    """Polls the focused home-menu item and reports when it changes"""
+
+    def __init__(self, container_id=0, depth=1):
+        # 0 means whichever container currently has focus
+        self.container = f"Container({container_id})" if container_id else "Container"
+        self.depth = depth
+        self.label = None
+
+    def neighbour_offsets(self):
+        """1, -1, 2, -2, ... up to `depth` items either side"""
+        offsets = []
+        for k in range(1, self.depth + 1):
+            offsets += [k, -k]
+        return offsets
+
+    def poll(self):
+        """(label, neighbour labels) if focus moved since last poll, else None.
+
+        The label is '' while the home window is not active.
+        """
+        label = ''
+        if xbmc.getCondVisibility('Window.IsActive(home)'):
+            label = xbmc.getInfoLabel(f'{self.container}.ListItem.Label')
+        if label == self.label:
+            return None
+        self.label = label
+        if not label:
+            return label, []
+
+        neighbours = []
+        for offset in self.neighbour_offsets():
+            neighbour = xbmc.getInfoLabel(f'{self.container}.ListItemNoWrap({offset}).Label')
+            if neighbour and neighbour != label:
+                neighbours.append(neighbour)
+        return label, neighbours
+
+
+class DwellScheduler:
+    """Commits a new target only after it has stayed wanted for `dwell` seconds.
+
+    Targets proposed while focus is still moving replace each other, so a
+    fast scroll through the menu ends in a single switch.
+    """
+
+    def __init__(self, dwell=0.4, clock=time.monotonic):
+        self.dwell = dwell
+        self._clock = clock
+        self.current = None
+        self._pending = None
+        self._since = None
+
+    def propose(self, target):
+        """The target focus currently points at"""
+        if target == self.current:
+            self._since = None
+            return
+        if self._since is None or target != self._pending:
+            self._pending = target
+            self._since = self._clock()
+
+    @property
+    def pending(self):
+        """True while a proposed target waits out the dwell time"""
+        return self._since is not None
+
+    def tick(self):
+        """Commit the pending target if it has dwelt long enough. True if current changed"""
+        if self._since is None or self._clock() - self._since < self.dwell:
+            return False
+        self.current = self._pending
+        self._since = None
+        return True
@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+
+"""
+VB Kontrol - Video library pages
+The in-plugin video picker lists the video_backgrounds folder from
+pre-sorted pages under addon_data/library, rewritten from the media
+index whenever it changes. Opening a page, in any sort order or for a
+name prefix, reads the small meta.json and one or two page files,
+however many clips the folder holds.
+"""
+
+import bisect
+import hashlib
+import json
+import os
+
+import xbmc
+import xbmcvfs
+
+from resources.lib.slotstore import ADDON_DATA
+
+LIBRARY_FOLDER = "library"
+LIBRARY_VERSION = 1
+META_FILE = "meta.json"
+PAGE_SIZE = 50
+
+# Name A-Z; largest, longest and newest first
+SORTS = ('name', 'size', 'duration', 'added')
+SORT_LABELS = {'name': "Name", 'size': "Size", 'duration': "Duration", 'added': "Date Added"}
+
+# Fields of a page row
+NAME, SIZE, DURATION, ADDED, SUMMARY = range(5)
+
+
+def name_key(name):
+    """Sort and search key of a file name"""
+    return name.casefold()
+
+
+def _row(path, info):
+    from resources.lib.mediainfo import describe
+    added = info.get('added') or info.get('mtime', 0) // 1000000000
+    return [os.path.basename(path), info.get('size', 0), round(info.get('duration') or 0, 1),
+            added, describe(info)]
+
+
+def _digest(rows):
+    return hashlib.md5(json.dumps(rows, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+class LibraryPages:
+    """Sorted, paginated listing of the video_backgrounds folder"""
+
+    def __init__(self, log=None, page_size=PAGE_SIZE):
+        self._log = log
+        self.page_size = page_size
+        self.folder = os.path.join(xbmcvfs.translatePath(ADDON_DATA), LIBRARY_FOLDER)
+        self._meta = None
+        self._pages = {}  # page file -> rows read this run
+
+    def log(self, message, level=xbmc.LOGINFO):
+        if self._log:
+            self._log(message, level)
+
+    def _read(self, name):
+        try:
+            with open(os.path.join(self.folder, name), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write(self, name, data):
+        path = os.path.join(self.folder, name)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    @property
+    def meta(self):
+        if self._meta is None:
+            meta = self._read(META_FILE)
+            valid = isinstance(meta, dict) and meta.get('version') == LIBRARY_VERSION \
+                and meta.get('page_size') == self.page_size
+            self._meta = meta if valid else {}
+        return self._meta
+
+    @property
+    def count(self):
+        return self.meta.get('count', 0)
+
+    def pages(self):
+        return max((self.count - 1) // self.page_size + 1, 1)
+
+    def stale(self, folder_mtime):
+        """True if the pages were not written for this state of the folder"""
+        return not self.meta or self.meta.get('folder_mtime') != folder_mtime
+
+    def update(self, items, folder_mtime):
+        """Rewrite the pages that differ from the media index entries (real path, info)"""
+        rows = sorted((_row(path, info) for path, info in items), key=lambda row: name_key(row[NAME]))
+        # Stable sorts: ties stay in name order
+        orders = {
+            'name': rows,
+            'size': sorted(rows, key=lambda row: row[SIZE], reverse=True),
+            'duration': sorted(rows, key=lambda row: row[DURATION], reverse=True),
+            'added': sorted(rows, key=lambda row: row[ADDED], reverse=True),
+        }
+        size = self.page_size
+        previous = self.meta.get('hashes', {})
+        hashes = {}
+        written = 0
+        try:
+            os.makedirs(self.folder, exist_ok=True)
+            for sort, ordered in orders.items():
+                for number, start in enumerate(range(0, len(ordered), size), 1):
+                    name = f"{sort}-{number}.json"
+                    page = ordered[start:start + size]
+                    hashes[name] = _digest(page)
+                    if previous.get(name) != hashes[name]:
+                        self._write(name, page)
+                        written += 1
+            for name in set(previous) - set(hashes):
+                try:
+                    os.remove(os.path.join(self.folder, name))
+                except OSError:
+                    pass
+            self._meta = {
+                'version': LIBRARY_VERSION,
+                'page_size': size,
+                'count': len(rows),
+                'folder_mtime': folder_mtime,
+                # First name key of each page by name, for prefix search
+                'heads': [name_key(rows[start][NAME]) for start in range(0, len(rows), size)],
+                'hashes': hashes,
+            }
+            self._write(META_FILE, self._meta)
+            self._pages = {}
+        except Exception as e:
+            self.log(f"Error writing library pages: {e}", xbmc.LOGERROR)
+            return
+        if written:
+            self.log(f"Library pages updated: {written} pages written for {len(rows)} videos")
+
+    def _rows(self, sort, start, stop):
+        """Rows [start, stop) in `sort` order, reading only the pages they are on"""
+        size = self.page_size
+        rows = []
+        for number in range(start // size + 1, (min(stop, self.count) - 1) // size + 2):
+            name = f"{sort}-{number}.json"
+            if name not in self._pages:
+                self._pages[name] = self._read(name) or []
+            page_start = (number - 1) * size
+            rows.extend(self._pages[name][max(start - page_start, 0):stop - page_start])
+        return rows
+
+    def page(self, sort, number):
+        """Rows of page `number` (from 1) in `sort` order"""
+        start = (number - 1) * self.page_size
+        return self._rows(sort if sort in SORTS else 'name', start, start + self.page_size)
+
+    def search(self, prefix, number):
+        """(rows, more) of page `number` of the names starting with `prefix`"""
+        key = name_key(prefix)
+        heads = self.meta.get('heads', [])
+        # Matches start on the page before the first one headed at or past the key
+        first_page = max(bisect.bisect_left(heads, key) - 1, 0)
+        page_start = first_page * self.page_size
+        keys = [name_key(row[NAME]) for row in self._rows('name', page_start, page_start + self.page_size)]
+        start = page_start + bisect.bisect_left(keys, key) + (number - 1) * self.page_size
+        # One row past the page says whether there is a next one
+        rows = []
+        for row in self._rows('name', start, start + self.page_size + 1):
+            if not name_key(row[NAME]).startswith(key):
+                break
+            rows.append(row)
+        return rows[:self.page_size], len(rows) > self.page_size
@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+
+"""
+VB Kontrol - Local loop-stream server
+Serves slot videos over HTTP on 127.0.0.1 so the player reopening a
+file at the end of every loop reads it from memory: responses honour
+Range requests and go through an LRU cache of the hot blocks (the head,
+the moov/cues at the tail). MPEG-TS sources are served as one endless
+stream of the file played back to back, so the player never reaches an
+end of file to reopen.
+"""
+
+import collections
+import http.server
+import mimetypes
+import os
+import re
+import threading
+import zlib
+from urllib.parse import urlsplit
+
+import xbmc
+import xbmcvfs
+
+BLOCK_SIZE = 256 * 1024
+SLOT_PATH = r'^/slot/(\d+)$'
+# MPEG transport streams can be concatenated packet for packet
+LOOPED_EXTENSIONS = ('.ts', '.m2ts', '.mts')
+CONTENT_TYPES = {'.mkv': 'video/x-matroska', '.webm': 'video/webm', '.ts': 'video/mp2t',
+                 '.m2ts': 'video/mp2t', '.mts': 'video/mp2t', '.m4v': 'video/mp4'}
+
+
+def parse_range(header, size):
+    """(first, last) byte of a single "bytes=" Range header, None if it
+    cannot be satisfied. Raises ValueError for headers to ignore"""
+    unit, _, ranges = header.partition('=')
+    if unit.strip().lower() != 'bytes' or not ranges:
+        raise ValueError(header)
+    # Players ask for one range; serve the first of several
+    first, _, last = ranges.split(',')[0].strip().partition('-')
+    if not first:
+        length = int(last)
+        if length <= 0 or not size:
+            return None
+        return max(size - length, 0), size - 1
+    first = int(first)
+    last = min(int(last), size - 1) if last else size - 1
+    if first >= size or last < first:
+        return None
+    return first, last
+
+
+class RangeCache:
+    """Byte-bounded LRU cache of fixed-size file blocks"""
+
+    def __init__(self, budget_bytes=64 * 1024 * 1024):
+        self.budget_bytes = budget_bytes
+        self._lock = threading.Lock()
+        self._blocks = collections.OrderedDict()  # (path, size, mtime, index) -> bytes
+        self.used_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _get(self, key):
+        with self._lock:
+            data = self._blocks.get(key)
+            if data is None:
+                self.misses += 1
+                return None
+            self._blocks.move_to_end(key)
+            self.hits += 1
+            return data
+
+    def _put(self, key, data):
+        if len(data) > self.budget_bytes:
+            return
+        with self._lock:
+            if key in self._blocks:
+                return
+            self._blocks[key] = data
+            self.used_bytes += len(data)
+            while self.used_bytes > self.budget_bytes:
+                _, evicted = self._blocks.popitem(last=False)
+                self.used_bytes -= len(evicted)
+
+    def read(self, path, st, start, stop):
+        """Yield the bytes [start, stop) of `path`, whose os.stat is `st`"""
+        # A rewritten file gets new keys; its old blocks age out
+        base = (path, st.st_size, st.st_mtime_ns)
+        f = None
+        try:
+            for index in range(start // BLOCK_SIZE, (stop - 1) // BLOCK_SIZE + 1):
+                key = base + (index,)
+                data = self._get(key)
+                if data is None:
+                    if f is None:
+                        f = open(path, 'rb')
+                    f.seek(index * BLOCK_SIZE)
+                    data = f.read(BLOCK_SIZE)
+                    if not data:
+                        return
+                    self._put(key, data)
+                offset = index * BLOCK_SIZE
+                yield memoryview(data)[max(start - offset, 0):stop - offset]
+        finally:
+            if f is not None:
+                f.close()
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        self.server.owner.log(f"{self.address_string()} {format % args}")
+
+    def do_HEAD(self):
+        self._serve(body=False)
+
+    def do_GET(self):
+        self._serve(body=True)
+
+    def _serve(self, body):
+        owner = self.server.owner
+        match = re.match(SLOT_PATH, urlsplit(self.path).path)
+        path = owner.paths.get(int(match.group(1))) if match else None
+        try:
+            st = os.stat(path) if path else None
+        except OSError:
+            st = None
+        if st is None:
+            self.send_error(404)
+            return
+        try:
+            if path.lower().endswith(LOOPED_EXTENSIONS) and owner.loop_ts:
+                self._serve_loop(int(match.group(1)), path, st, body)
+            else:
+                self._serve_file(path, st, body)
+        except (BrokenPipeError, ConnectionResetError):
+            # Players drop connections when they seek or stop
+            self.close_connection = True
+
+    def _content_type(self, path):
+        extension = os.path.splitext(path)[1].lower()
+        return CONTENT_TYPES.get(extension) or mimetypes.guess_type(path)[0] or 'application/octet-stream'
+
+    def _serve_file(self, path, st, body):
+        size = st.st_size
+        first, last, status = 0, size - 1, 200
+        header = self.headers.get('Range')
+        if header:
+            try:
+                satisfiable = parse_range(header, size)
+            except ValueError:
+                satisfiable = (first, last)
+            else:
+                status = 206
+            if satisfiable is None:
+                self.send_response(416)
+                self.send_header('Content-Range', f"bytes */{size}")
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            first, last = satisfiable
+        self.send_response(status)
+        self.send_header('Content-Type', self._content_type(path))
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('Content-Length', str(max(last - first + 1, 0)))
+        if status == 206:
+            self.send_header('Content-Range', f"bytes {first}-{last}/{size}")
+        self.end_headers()
+        if body and size:
+            self._send(path, st, first, last + 1)
+
+    def _serve_loop(self, slot, path, st, body):
+        # Endless: no length, the response ends when the connection closes
+        self.close_connection = True
+        self.send_response(200)
+        self.send_header('Content-Type', self._content_type(path))
+        self.send_header('Accept-Ranges', 'none')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        owner = self.server.owner
+        # Until the slot moves to another file, which the player then reopens
+        while body and st.st_size and not owner.stopping and owner.paths.get(slot) == path:
+            self._send(path, st, 0, st.st_size)
+            owner.loops += 1
+
+    def _send(self, path, st, start, stop):
+        owner = self.server.owner
+        for chunk in owner.cache.read(path, st, start, stop):
+            self.wfile.write(chunk)
+            owner.bytes_served += len(chunk)
+
+
+class LoopServer:
+    """HTTP server on 127.0.0.1 serving /slot/N from the slot's local video file"""
+
+    def __init__(self, port=0, cache_bytes=64 * 1024 * 1024, loop_ts=True, log=None):
+        self._log = log
+        self.cache = RangeCache(cache_bytes)
+        self.loop_ts = loop_ts
+        self.paths = {}  # slot_num -> real path served for it
+        self.stopping = False
+        self.bytes_served = 0
+        self.loops = 0
+
+        try:
+            self._server = http.server.ThreadingHTTPServer(('127.0.0.1', port), _Handler)
+        except OSError:
+            # Configured port taken: any free one will do, URLs carry it
+            self._server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+        self._server.daemon_threads = True
+        self._server.owner = self
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="VBKontrolLoopServer", daemon=True)
+        self._thread.start()
+
+    def log(self, message, level=xbmc.LOGDEBUG):
+        if self._log:
+            self._log(message, level)
+
+    def url(self, slot_num, video_path, paths=None):
+        """URL to publish for a slot playing `video_path`, or the path itself
+        for sources that are not local files. `paths` is the slot -> file
+        table to record it in, when it is not the one being served"""
+        paths = self.paths if paths is None else paths
+        path = xbmcvfs.translatePath(video_path)
+        if not os.path.isabs(path):
+            paths.pop(slot_num, None)
+            return video_path
+        paths[slot_num] = path
+        # Changes with the file, so skins reload when the slot's video does
+        return f"http://127.0.0.1:{self.port}/slot/{slot_num}?v={zlib.crc32(path.encode('utf-8')):08x}"
+
+    def forget(self, slot_num, paths=None):
+        (self.paths if paths is None else paths).pop(slot_num, None)
+
+    def properties(self, prefix='VBKontrol.LoopServer'):
+        return {
+            f'{prefix}.Port': str(self.port),
+            f'{prefix}.Hits': str(self.cache.hits),
+            f'{prefix}.Misses': str(self.cache.misses),
+            f'{prefix}.BytesServed': str(self.bytes_served),
+            f'{prefix}.CachedBytes': str(self.cache.used_bytes),
+            f'{prefix}.Loops': str(self.loops),
+        }
+
+    def stop(self):
+        self.stopping = True
+        self._server.shutdown()
+        self._server.server_close()
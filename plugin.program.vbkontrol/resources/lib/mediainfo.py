@@ -0,0 +1,491 @@
+# -*- coding: utf-8 -*-
+
+"""
+VB Kontrol - Video metadata index
+Reads duration, resolution, codec, bitrate and keyframe count straight
+from MP4 box trees and Matroska/WebM EBML headers, without decoding, and
+keeps the results in media_index.json keyed by (path, size, mtime).
+"""
+
+import collections
+import json
+import os
+import struct
+import threading
+
+import xbmc
+import xbmcvfs
+
+from resources.lib.slotstore import ADDON_DATA, VIDEO_FOLDER
+
+INDEX_FILE = "media_index.json"
+INDEX_VERSION = 1
+VIDEO_EXTENSIONS = ('.mp4', '.mkv', '.avi', '.mov', '.wmv', '.flv', '.webm', '.m4v', '.ts')
+
+# Clips above these are known to stutter on low-end devices
+HEAVY_HEIGHT = 1080
+HEAVY_BITRATE = 20000000
+
+# Every this many rescans the files are stat'ed even if the folder's
+# mtime did not change, to catch clips overwritten in place
+FULL_RESCAN_EVERY = 10
+
+# Largest moov box we are prepared to read into memory
+MAX_MOOV_SIZE = 64 * 1024 * 1024
+
+MP4_CODECS = {
+    'avc1': 'h264', 'avc3': 'h264', 'hvc1': 'hevc', 'hev1': 'hevc',
+    'vp09': 'vp9', 'av01': 'av1', 'mp4v': 'mpeg4',
+}
+MKV_CODECS = {
+    'V_MPEG4/ISO/AVC': 'h264', 'V_MPEGH/ISO/HEVC': 'hevc', 'V_VP8': 'vp8',
+    'V_VP9': 'vp9', 'V_AV1': 'av1', 'V_MPEG4/ISO/ASP': 'mpeg4', 'V_MPEG2': 'mpeg2',
+}
+
+
+# --- MP4 ------------------------------------------------------------------
+
+MP4_CONTAINERS = {b'moov', b'trak', b'mdia', b'minf', b'stbl', b'edts', b'dinf'}
+
+
+def read_top_level_boxes(f, file_size):
+    """[(type, offset, header_size, size)] for every top-level MP4 box"""
+    boxes = []
+    pos = 0
+    while pos + 8 <= file_size:
+        f.seek(pos)
+        header = f.read(16)
+        if len(header) < 8:
+            break
+        size, kind = struct.unpack('>I4s', header[:8])
+        header_size = 8
+        if size == 1:
+            if len(header) < 16:
+                break
+            size = struct.unpack('>Q', header[8:16])[0]
+            header_size = 16
+        elif size == 0:
+            size = file_size - pos
+        if size < header_size:
+            break
+        boxes.append((kind, pos, header_size, size))
+        pos += size
+    return boxes
+
+
+def iter_boxes(data, start, end):
+    """(type, payload_start, payload_end) for boxes inside a buffer"""
+    pos = start
+    while pos + 8 <= end:
+        size, kind = struct.unpack_from('>I4s', data, pos)
+        header_size = 8
+        if size == 1:
+            if pos + 16 > end:
+                return
+            size = struct.unpack_from('>Q', data, pos + 8)[0]
+            header_size = 16
+        elif size == 0:
+            size = end - pos
+        if size < header_size:
+            return
+        yield kind, pos + header_size, min(pos + size, end)
+        pos += size
+
+
+def _parse_trak(data, start, end, info):
+    track = {}
+
+    def walk(start, end):
+        for kind, body, body_end in iter_boxes(data, start, end):
+            if kind in MP4_CONTAINERS:
+                walk(body, body_end)
+            elif kind == b'tkhd':
+                offset = body + (88 if data[body] == 1 else 76)
+                if offset + 8 <= body_end:
+                    width, height = struct.unpack_from('>II', data, offset)
+                    track['width'], track['height'] = width >> 16, height >> 16
+            elif kind == b'hdlr' and body + 12 <= body_end:
+                track['handler'] = data[body + 8:body + 12]
+            elif kind == b'stsd' and body + 16 <= body_end:
+                track['codec'] = data[body + 12:body + 16].decode('latin-1')
+            elif kind == b'stss' and body + 8 <= body_end:
+                track['keyframes'] = struct.unpack_from('>I', data, body + 4)[0]
+            elif kind == b'stsz' and body + 12 <= body_end:
+                track['samples'] = struct.unpack_from('>I', data, body + 8)[0]
+
+    walk(start, end)
+    if track.get('handler') != b'vide' or 'width' in info:
+        return
+    info['width'] = track.get('width', 0)
+    info['height'] = track.get('height', 0)
+    info['codec'] = MP4_CODECS.get(track.get('codec', ''), track.get('codec', ''))
+    # No stss box means every sample is a sync sample
+    info['keyframes'] = track.get('keyframes', track.get('samples', 0))
+
+
+def parse_mp4(f, file_size):
+    """Metadata from an MP4/MOV box tree, or None if it is not one"""
+    boxes = read_top_level_boxes(f, file_size)
+    kinds = [box[0] for box in boxes]
+    if b'moov' not in kinds or not (b'ftyp' in kinds or b'mdat' in kinds):
+        return None
+
+    _, moov_offset, header_size, moov_size = boxes[kinds.index(b'moov')]
+    mdat_offset = boxes[kinds.index(b'mdat')][1] if b'mdat' in kinds else None
+    info = {
+        'container': 'mp4',
+        'moov_offset': moov_offset,
+        'faststart': mdat_offset is None or moov_offset < mdat_offset,
+    }
+    if moov_size > MAX_MOOV_SIZE:
+        return info
+
+    f.seek(moov_offset)
+    data = f.read(moov_size)
+    for kind, body, body_end in iter_boxes(data, header_size, len(data)):
+        if kind == b'mvhd':
+            if data[body] == 1:
+                timescale, duration = struct.unpack_from('>IQ', data, body + 20)
+            else:
+                timescale, duration = struct.unpack_from('>II', data, body + 12)
+            if timescale:
+                info['duration'] = duration / float(timescale)
+        elif kind == b'trak':
+            _parse_trak(data, body, body_end, info)
+    return info
+
+
+# --- Matroska / WebM ------------------------------------------------------
+
+EBML_HEADER = 0x1A45DFA3
+MKV_SEGMENT = 0x18538067
+MKV_SEEKHEAD = 0x114D9B74
+MKV_SEEK = 0x4DBB
+MKV_SEEKID = 0x53AB
+MKV_SEEKPOSITION = 0x53AC
+MKV_INFO = 0x1549A966
+MKV_TIMECODESCALE = 0x2AD7B1
+MKV_DURATION = 0x4489
+MKV_TRACKS = 0x1654AE6B
+MKV_TRACKENTRY = 0xAE
+MKV_TRACKTYPE = 0x83
+MKV_CODECID = 0x86
+MKV_VIDEO = 0xE0
+MKV_PIXELWIDTH = 0xB0
+MKV_PIXELHEIGHT = 0xBA
+MKV_CUES = 0x1C53BB6B
+MKV_CUEPOINT = 0xBB
+MKV_CLUSTER = 0x1F43B675
+
+
+def _read_vint(f, keep_marker):
+    first = f.read(1)
+    if not first:
+        return None, 0
+    value = first[0]
+    length = 1
+    mask = 0x80
+    while length <= 8 and not value & mask:
+        mask >>= 1
+        length += 1
+    if length > 8:
+        return None, 0
+    if not keep_marker:
+        value &= mask - 1
+    rest = f.read(length - 1)
+    unknown = not keep_marker and value == mask - 1
+    for byte in rest:
+        value = (value << 8) | byte
+        unknown = unknown and byte == 0xFF
+    return (None if unknown else value), length
+
+
+def _read_element(f):
+    """(id, size, data_offset); size is None for unknown-size elements"""
+    element_id, id_length = _read_vint(f, True)
+    if element_id is None:
+        return None
+    size, size_length = _read_vint(f, False)
+    if not size_length:
+        return None
+    return element_id, size, f.tell()
+
+
+def _iter_elements(f, start, end):
+    pos = start
+    while end is None or pos < end:
+        f.seek(pos)
+        element = _read_element(f)
+        if element is None:
+            return
+        yield element
+        if element[1] is None:
+            return
+        pos = element[2] + element[1]
+
+
+def _read_uint(f, offset, size):
+    f.seek(offset)
+    return int.from_bytes(f.read(size), 'big')
+
+
+def _read_float(f, offset, size):
+    f.seek(offset)
+    data = f.read(size)
+    if size == 4:
+        return struct.unpack('>f', data)[0]
+    if size == 8:
+        return struct.unpack('>d', data)[0]
+    return 0.0
+
+
+def parse_mkv(f, file_size):
+    """Metadata from a Matroska/WebM EBML header, or None if it is not one"""
+    f.seek(0)
+    header = _read_element(f)
+    if not header or header[0] != EBML_HEADER or header[1] is None:
+        return None
+    f.seek(header[2] + header[1])
+    segment = _read_element(f)
+    if not segment or segment[0] != MKV_SEGMENT:
+        return None
+
+    segment_start = segment[2]
+    segment_end = file_size if segment[1] is None else min(segment_start + segment[1], file_size)
+    info = {'container': 'mkv', 'moov_offset': None, 'faststart': True}
+    timecode_scale = 1000000
+    duration = None
+    cues_offset = None
+
+    for element_id, size, offset in _iter_elements(f, segment_start, segment_end):
+        if element_id == MKV_SEEKHEAD:
+            for seek_id, seek_size, seek_offset in _iter_elements(f, offset, offset + size):
+                if seek_id != MKV_SEEK:
+                    continue
+                target = position = None
+                for child_id, child_size, child_offset in _iter_elements(f, seek_offset, seek_offset + seek_size):
+                    if child_id == MKV_SEEKID:
+                        target = _read_uint(f, child_offset, child_size)
+                    elif child_id == MKV_SEEKPOSITION:
+                        position = _read_uint(f, child_offset, child_size)
+                if target == MKV_CUES and position is not None:
+                    cues_offset = segment_start + position
+        elif element_id == MKV_INFO:
+            for child_id, child_size, child_offset in _iter_elements(f, offset, offset + size):
+                if child_id == MKV_TIMECODESCALE:
+                    timecode_scale = _read_uint(f, child_offset, child_size)
+                elif child_id == MKV_DURATION:
+                    duration = _read_float(f, child_offset, child_size)
+        elif element_id == MKV_TRACKS and 'width' not in info:
+            _parse_mkv_tracks(f, offset, offset + size, info)
+        elif element_id == MKV_CUES:
+            info['keyframes'] = _count_cue_points(f, offset, size)
+            cues_offset = None
+        elif element_id == MKV_CLUSTER or size is None:
+            # Media data from here on; jump to the cues if the SeekHead had them
+            break
+
+    if cues_offset is not None and 'keyframes' not in info:
+        f.seek(cues_offset)
+        cues = _read_element(f)
+        if cues and cues[0] == MKV_CUES and cues[1] is not None:
+            info['keyframes'] = _count_cue_points(f, cues[2], cues[1])
+
+    if duration is not None:
+        info['duration'] = duration * timecode_scale / 1e9
+    return info
+
+
+def _parse_mkv_tracks(f, start, end, info):
+    for entry_id, entry_size, entry_offset in _iter_elements(f, start, end):
+        if entry_id != MKV_TRACKENTRY:
+            continue
+        track = {}
+        for child_id, child_size, child_offset in _iter_elements(f, entry_offset, entry_offset + entry_size):
+            if child_id == MKV_TRACKTYPE:
+                track['type'] = _read_uint(f, child_offset, child_size)
+            elif child_id == MKV_CODECID:
+                f.seek(child_offset)
+                track['codec'] = f.read(child_size).rstrip(b'\0').decode('ascii', 'replace')
+            elif child_id == MKV_VIDEO:
+                for video_id, video_size, video_offset in _iter_elements(f, child_offset, child_offset + child_size):
+                    if video_id == MKV_PIXELWIDTH:
+                        track['width'] = _read_uint(f, video_offset, video_size)
+                    elif video_id == MKV_PIXELHEIGHT:
+                        track['height'] = _read_uint(f, video_offset, video_size)
+        if track.get('type') == 1:
+            info['width'] = track.get('width', 0)
+            info['height'] = track.get('height', 0)
+            info['codec'] = MKV_CODECS.get(track.get('codec', ''), track.get('codec', ''))
+            return
+
+
+def _count_cue_points(f, start, size):
+    # Each CuePoint indexes one keyframe of the video track
+    return sum(1 for element in _iter_elements(f, start, start + size) if element[0] == MKV_CUEPOINT)
+
+
+# --- Index ----------------------------------------------------------------
+
+def probe_file(path):
+    """Parse container headers of a local file; {} if the format is unknown"""
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        info = parse_mp4(f, size) or parse_mkv(f, size) or {}
+    info['size'] = size
+    duration = info.get('duration')
+    if duration:
+        info['bitrate'] = int(size * 8 / duration)
+    return info
+
+
+def is_heavy(info):
+    """True for clips likely to stutter on low-end devices (4K or high bitrate)"""
+    return info.get('height', 0) > HEAVY_HEIGHT or info.get('bitrate', 0) > HEAVY_BITRATE
+
+
+def describe(info):
+    """Short human readable summary, e.g. '1080p h264 42s 8.1 Mbps'"""
+    parts = []
+    if info.get('height'):
+        parts.append(f"{info['height']}p")
+    if info.get('codec'):
+        parts.append(info['codec'])
+    if info.get('duration'):
+        parts.append(f"{info['duration']:.0f}s")
+    if info.get('bitrate'):
+        parts.append(f"{info['bitrate'] / 1e6:.1f} Mbps")
+    return ' '.join(parts)
+
+
+class MediaIndex:
+    """Persistent metadata index of the video_backgrounds folder"""
+
+    def __init__(self, log=None, gate=None, library=None):
+        self._log = log
+        self._gate = gate  # IOGate pausing rescans, e.g. during playback
+        self.library = library  # LibraryPages kept in step with the index
+        self.folder = xbmcvfs.translatePath(VIDEO_FOLDER)
+        self.path = os.path.join(xbmcvfs.translatePath(ADDON_DATA), INDEX_FILE)
+        self.entries = {}  # real path -> info incl. 'size', 'mtime' and 'added'
+        self.folder_mtime = None  # of the folder at the last full listing
+        self._scans = 0
+        self._lock = threading.Lock()
+        self._changed = set()
+        self._scan_thread = None
+        self.io_counts = collections.Counter()  # real path -> stats and header reads
+        self.load()
+
+    def log(self, message, level=xbmc.LOGINFO):
+        if self._log:
+            self._log(message, level)
+
+    def load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == INDEX_VERSION:
+                self.entries = data.get('entries', {})
+                self.folder_mtime = data.get('folder_mtime')
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def save(self):
+        try:
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'version': INDEX_VERSION, 'folder_mtime': self.folder_mtime,
+                           'entries': self.entries}, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            self.log(f"Error saving media index: {e}", xbmc.LOGERROR)
+
+    def items(self):
+        """(real path, info) pairs, safe to use while a rescan runs"""
+        with self._lock:
+            return list(self.entries.items())
+
+    def lookup(self, video_path):
+        """Indexed metadata for a slot video path, or None"""
+        return self.entries.get(xbmcvfs.translatePath(video_path))
+
+    def rescan(self, full=False):
+        """Incrementally re-index the folder. Returns the paths that changed.
+
+        Adding, removing or renaming a clip changes the folder's mtime, so
+        while it stays the same only every FULL_RESCAN_EVERY-th rescan (or
+        a `full` one) lists and stats the files.
+        """
+        try:
+            folder_mtime = os.stat(self.folder).st_mtime_ns
+        except OSError:
+            return set()
+        scans, self._scans = self._scans, self._scans + 1
+        if folder_mtime == self.folder_mtime and scans % FULL_RESCAN_EVERY and not full:
+            return set()
+        try:
+            names = os.listdir(self.folder)
+        except OSError:
+            return set()
+
+        changed = set()
+        seen = set()
+        for name in names:
+            if not name.lower().endswith(VIDEO_EXTENSIONS):
+                continue
+            path = os.path.join(self.folder, name)
+            if self._gate:
+                self._gate.wait()
+            self.io_counts[path] += 1
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            seen.add(path)
+            entry = self.entries.get(path)
+            if entry and entry.get('size') == st.st_size and entry.get('mtime') == st.st_mtime_ns:
+                continue
+            self.io_counts[path] += 1
+            try:
+                info = probe_file(path)
+            except Exception as e:
+                self.log(f"Could not read headers of {name}: {e}", xbmc.LOGWARNING)
+                info = {'size': st.st_size}
+            info['mtime'] = st.st_mtime_ns
+            # Creation time on Windows, time the file was copied in elsewhere
+            info['added'] = entry.get('added', int(st.st_ctime)) if entry else int(st.st_ctime)
+            with self._lock:
+                self.entries[path] = info
+            changed.add(path)
+
+        with self._lock:
+            for path in set(self.entries) - seen:
+                del self.entries[path]
+                changed.add(path)
+
+        if changed or folder_mtime != self.folder_mtime:
+            self.folder_mtime = folder_mtime
+            self.save()
+        if changed:
+            self.log(f"Media index updated: {len(changed)} changed, {len(self.entries)} files")
+        if self.library and (changed or self.library.stale(folder_mtime)):
+            self.library.update(self.items(), folder_mtime)
+        return changed
+
+    def rescan_async(self):
+        """Run rescan() on a background thread unless one is already running"""
+        if self._scan_thread and self._scan_thread.is_alive():
+            return
+        self._scan_thread = threading.Thread(target=self._rescan_worker, name="VBKontrolMediaScan", daemon=True)
+        self._scan_thread.start()
+
+    def take_changed(self):
+        """Paths changed by background rescans since the last call"""
+        with self._lock:
+            changed, self._changed = self._changed, set()
+        return changed
+
+    def _rescan_worker(self):
+        changed = self.rescan()
+        with self._lock:
+            self._changed |= changed
@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+
+"""
+VB Kontrol - Background loop player
+Plays the active slot video behind the home menu through xbmc.Player and
+keeps it looping without reopening the file: the playlist always holds
+the next iteration, so Kodi has it queued before the current one ends.
+The gap between end-of-file and the next iteration's first frame is
+measured and kept as a histogram.
+"""
+
+import bisect
+import collections
+import json
+import time
+
+import xbmc
+
+# Upper bounds (ms) of the loop-gap histogram buckets; the last is open
+GAP_BUCKETS_MS = (50, 100, 250, 500, 1000)
+
+
+class GapHistogram:
+    """Loop-gap samples in fixed buckets plus a rolling window for percentiles"""
+
+    def __init__(self, window=200):
+        self.counts = [0] * (len(GAP_BUCKETS_MS) + 1)
+        self.samples = collections.deque(maxlen=window)
+        self.last = None
+
+    def add(self, gap_ms):
+        self.counts[bisect.bisect_left(GAP_BUCKETS_MS, gap_ms)] += 1
+        self.samples.append(gap_ms)
+        self.last = gap_ms
+
+    def percentile(self, fraction):
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+    def properties(self, prefix='VBKontrol.Loop'):
+        """Window properties describing the histogram"""
+        properties = {f'{prefix}.Count': str(sum(self.counts))}
+        if self.last is not None:
+            properties[f'{prefix}.GapLast'] = f"{self.last:.0f}"
+            properties[f'{prefix}.GapP50'] = f"{self.percentile(0.5):.0f}"
+            properties[f'{prefix}.GapP95'] = f"{self.percentile(0.95):.0f}"
+            properties[f'{prefix}.GapMax'] = f"{max(self.samples):.0f}"
+        labels = [f"Under{bound}ms" for bound in GAP_BUCKETS_MS] + [f"Over{GAP_BUCKETS_MS[-1]}ms"]
+        for label, count in zip(labels, self.counts):
+            properties[f'{prefix}.Gap.{label}'] = str(count)
+        return properties
+
+
+def _jsonrpc(method, params=None):
+    request = {'jsonrpc': '2.0', 'method': method, 'params': params or {}, 'id': 1}
+    try:
+        return json.loads(xbmc.executeJSONRPC(json.dumps(request))).get('result')
+    except (ValueError, AttributeError):
+        return None
+
+
+class LoopPlayer(xbmc.Player):
+    """Owns background playback of one target video at a time"""
+
+    def __init__(self, loop=True, volume=None, log=None, clock=time.monotonic):
+        super().__init__()
+        self.loop = loop
+        self.volume = volume
+        self._log = log
+        self._clock = clock
+
+        self.target = None      # video the service wants behind the menu
+        self.active = False     # we currently own the player
+        self.suspended = False  # foreground media took the player over
+        self.histogram = GapHistogram()
+        self.updated = False    # histogram changed since the service last looked
+
+        self._expected = None
+        self._switching = False
+        self._eof_at = None
+        self._last_position = 0.0
+        self._saved_volume = None
+
+    def log(self, message, level=xbmc.LOGDEBUG):
+        if self._log:
+            self._log(message, level)
+
+    def set_target(self, path):
+        """Play `path` behind the menu, or stop background playback for None"""
+        if path == self.target:
+            return
+        self.target = path
+        if self.suspended:
+            return
+        if path:
+            self._start(path)
+        elif self.active:
+            self.stop_background()
+
+    def stop_background(self):
+        """Stop our playback and give the volume back"""
+        if self.active:
+            self.active = False
+            self._switching = True
+            self.stop()
+        self._restore_volume()
+
+    def tick(self):
+        """Sample the play position; called from the service loop"""
+        if not self.active or not self.isPlayingVideo():
+            return
+        try:
+            position = self.getTime()
+            total = self.getTotalTime()
+        except RuntimeError:
+            return
+        # Only trust samples moving forward within the current iteration
+        if total > 0 and position >= self._last_position:
+            self._last_position = position
+            self._eof_at = self._clock() + max(total - position, 0.0)
+
+    def _start(self, path):
+        if self.isPlaying() and not self.active:
+            # Something else is playing; wait until it stops
+            self.suspended = True
+            return
+        playlist = xbmc.PlayList(xbmc.PLAYLIST_VIDEO)
+        playlist.clear()
+        playlist.add(path)
+        if self.loop:
+            # The second copy is the next iteration, queued before EOF
+            playlist.add(path)
+        self._apply_volume()
+        self.active = True
+        self._switching = True
+        self._expected = path
+        self._eof_at = None
+        self._last_position = 0.0
+        self.play(playlist, windowed=True)
+        xbmc.executebuiltin('PlayerControl(RepeatAll)' if self.loop else 'PlayerControl(RepeatOff)')
+        self.log(f"Background playback: {path}")
+
+    def _apply_volume(self):
+        if self.volume is None or self._saved_volume is not None:
+            return
+        result = _jsonrpc('Application.GetProperties', {'properties': ['volume']})
+        if isinstance(result, dict) and 'volume' in result:
+            self._saved_volume = result['volume']
+            _jsonrpc('Application.SetVolume', {'volume': int(self.volume)})
+
+    def _restore_volume(self):
+        if self._saved_volume is not None:
+            _jsonrpc('Application.SetVolume', {'volume': self._saved_volume})
+            self._saved_volume = None
+
+    # xbmc.Player callbacks
+
+    def onAVStarted(self):
+        try:
+            playing = self.getPlayingFile()
+        except RuntimeError:
+            playing = ''
+        if self.active and playing == self._expected:
+            if self._eof_at is not None:
+                gap_ms = max((self._clock() - self._eof_at) * 1000.0, 0.0)
+                self.histogram.add(gap_ms)
+                self.updated = True
+                self.log(f"Loop gap {gap_ms:.0f} ms")
+            self._switching = False
+            self._eof_at = None
+            self._last_position = 0.0
+            return
+
+        # Foreground media started: get out of the way
+        if self.active or not self.suspended:
+            self.log("Foreground playback started, pausing background video")
+        self.active = False
+        self.suspended = True
+        self._restore_volume()
+
+    def onPlayBackEnded(self):
+        if self.active:
+            if self.loop:
+                # Playlist ran out despite RepeatAll; start over
+                self._eof_at = self._clock()
+                self._start(self._expected)
+            else:
+                self.active = False
+                self._restore_volume()
+            return
+        self._foreground_finished()
+
+    def onPlayBackStopped(self):
+        if self._switching:
+            self._switching = False
+            return
+        if self.active:
+            # User stopped the background video
+            self.active = False
+            self._restore_volume()
+            return
+        self._foreground_finished()
+
+    def _foreground_finished(self):
+        if self.suspended:
+            self.suspended = False
+            self.log("Foreground playback finished, resuming background video")
+            if self.target:
+                self._start(self.target)
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+
+"""
+VB Kontrol - Rotation playlists
+A slot can hold an ordered or shuffled list of videos that rotates every
+N minutes of the day or every N loops. The plugin precomputes the
+schedule when the playlist is saved, so the service never lists folders
+or draws random numbers: each cycle it only compares the clock with the
+next switch, and it is told the clip after it ahead of time to warm it.
+"""
+
+import bisect
+import math
+import random
+import time
+
+ORDERS = ('ordered', 'shuffled')
+MODES = ('minutes', 'loops')
+DAY = 86400
+# Shuffled playlists rotating on loops repeat after this many shuffles
+SHUFFLE_ROUNDS = 4
+SHUFFLE_ATTEMPTS = 20
+# Loop length assumed for clips the media index has no duration for
+DEFAULT_LOOP_SECONDS = 30.0
+
+
+def shuffled_sequence(count, length, rng):
+    """`length` clip indexes from successive shuffles of range(count), never
+    the same clip twice in a row, also where the schedule wraps around
+    (as far as `count` allows: two clips cannot alternate over an odd length)"""
+    sequence = []
+    order = list(range(count))
+    while len(sequence) < length:
+        # Reshuffle until the seams fit; a few draws almost always do
+        for _ in range(SHUFFLE_ATTEMPTS):
+            rng.shuffle(order)
+            chunk = order[:length - len(sequence)]
+            wraps = length > 1 and len(sequence) + len(chunk) == length
+            if ((not sequence or chunk[0] != sequence[-1])
+                    and not (wraps and chunk[-1] == (sequence or chunk)[0])):
+                break
+        sequence.extend(chunk)
+    return sequence
+
+
+def build(videos, order='ordered', mode='minutes', every=30, durations=None, now=None, seed=None):
+    """Playlist record for slots.json, with its schedule precomputed.
+
+    In `minutes` mode the day is cut into steps of `every` minutes from
+    local midnight, so a clip comes back at the same times every day. In
+    `loops` mode each clip shows for `every` of its loops, timed from
+    `durations` (video path -> seconds) and counted from `now`.
+    """
+    videos = list(videos)
+    every = max(int(every), 1)
+    if mode == 'minutes':
+        length = math.ceil(DAY / (every * 60))
+    else:
+        length = len(videos) * (SHUFFLE_ROUNDS if order == 'shuffled' and len(videos) > 1 else 1)
+    if order == 'shuffled':
+        clips = shuffled_sequence(len(videos), length, random.Random(seed))
+    else:
+        clips = [i % len(videos) for i in range(length)]
+
+    playlist = {'videos': videos, 'order': order, 'mode': mode, 'every': every, 'clips': clips}
+    if mode == 'loops':
+        # Entry start offsets within one period of the rotation
+        starts, position = [], 0.0
+        for clip in clips:
+            starts.append(round(position, 3))
+            duration = (durations or {}).get(videos[clip]) or DEFAULT_LOOP_SECONDS
+            position += duration * every
+        playlist.update(anchor=round(time.time() if now is None else now, 3), starts=starts,
+                        period=round(position, 3))
+    return playlist
+
+
+def locate(playlist, now):
+    """(schedule entry showing at wall-clock time `now`, seconds until it ends)"""
+    clips = playlist['clips']
+    if playlist['mode'] == 'minutes':
+        local = time.localtime(now)
+        position = local.tm_hour * 3600 + local.tm_min * 60 + local.tm_sec + now % 1
+        step = playlist['every'] * 60
+        entry = min(int(position // step), len(clips) - 1)
+        end = DAY if entry == len(clips) - 1 else (entry + 1) * step
+    else:
+        position = (now - playlist['anchor']) % playlist['period']
+        starts = playlist['starts']
+        entry = max(bisect.bisect_right(starts, position) - 1, 0)
+        end = starts[entry + 1] if entry + 1 < len(starts) else playlist['period']
+    return entry, max(end - position, 0.001)
+
+
+def summary(playlist):
+    """Short description, e.g. "3 videos, shuffled, every 30 minutes" """
+    count = len(playlist['videos'])
+    return (f"{count} video{'s' if count != 1 else ''}, {playlist['order']}, "
+            f"every {playlist['every']} {playlist['mode'] if playlist['every'] != 1 else playlist['mode'][:-1]}")
+
+
+class Cursor:
+    """Where a slot is in its schedule"""
+
+    __slots__ = ('entry', 'switch_at', 'warmed')
+
+    def __init__(self, entry, switch_at):
+        self.entry = entry
+        self.switch_at = switch_at
+        self.warmed = False
+
+
+class Rotation:
+    """Active and upcoming clip of every slot with a playlist"""
+
+    def __init__(self, warm_ahead=120.0, clock=time.time):
+        self.warm_ahead = warm_ahead
+        self._clock = clock
+        self.playlists = {}  # slot_num -> playlist record
+        self.cursors = {}  # slot_num -> Cursor
+        self.due = math.inf  # earliest switch or warm-up
+
+    def _cursor(self, playlist, now):
+        entry, left = locate(playlist, now)
+        return Cursor(entry, now + left)
+
+    def _update_due(self):
+        self.due = min((cursor.switch_at if cursor.warmed else cursor.switch_at - self.warm_ahead
+                        for cursor in self.cursors.values()), default=math.inf)
+
+    def load(self, playlists):
+        """Follow the playlists saved in slots.json ({slot_num: record}).
+        Cursors of playlists that did not change are kept"""
+        now = self._clock()
+        self.cursors = {slot_num: (self.cursors[slot_num] if self.playlists.get(slot_num) == playlist
+                                   else self._cursor(playlist, now))
+                        for slot_num, playlist in playlists.items()}
+        self.playlists = dict(playlists)
+        self._update_due()
+
+    def video(self, slot_num):
+        """Clip a playlist slot shows now, or None for other slots"""
+        cursor = self.cursors.get(slot_num)
+        if cursor is None:
+            return None
+        playlist = self.playlists[slot_num]
+        return playlist['videos'][playlist['clips'][cursor.entry]]
+
+    def upcoming(self, slot_num):
+        """Clip a playlist slot switches to next, or None for other slots"""
+        cursor = self.cursors.get(slot_num)
+        if cursor is None:
+            return None
+        playlist = self.playlists[slot_num]
+        clips = playlist['clips']
+        return playlist['videos'][clips[(cursor.entry + 1) % len(clips)]]
+
+    def tick(self):
+        """(slots whose clip or next clip changed, slots whose next clip is
+        due to be warmed). A single comparison until something is due"""
+        now = self._clock()
+        if now < self.due:
+            return [], []
+        switched, warm = [], []
+        for slot_num, cursor in list(self.cursors.items()):
+            if now >= cursor.switch_at:
+                before = (self.video(slot_num), self.upcoming(slot_num))
+                self.cursors[slot_num] = cursor = self._cursor(self.playlists[slot_num], now)
+                if (self.video(slot_num), self.upcoming(slot_num)) != before:
+                    switched.append(slot_num)
+            if not cursor.warmed and now >= cursor.switch_at - self.warm_ahead:
+                cursor.warmed = True
+                warm.append(slot_num)
+        self._update_due()
+        return sorted(switched), sorted(warm)
@@ -0,0 +1,738 @@
+# -*- coding: utf-8 -*-
+
+"""
+VB Kontrol - Universal Video Background Interface
+Configurable video background slots (20 by default) for any skin.
+Kodi starts a fresh interpreter for every click, so each action only
+loads, imports and touches what it needs.
+"""
+
+import xbmc
+import xbmcaddon
+import xbmcgui
+import xbmcplugin
+import xbmcvfs
+import sys
+import os
+import time
+from urllib.parse import parse_qsl, urlencode
+
+from resources.lib.slotstore import VIDEO_FOLDER, SlotStore, format_slot_range, parse_slot_range, slot_count
+
+VIDEO_MASK = '.mp4|.mkv|.avi|.mov|.wmv|.flv|.webm|.m4v|.ts'
+
+class VBKontrol:
+    def __init__(self):
+        self.addon = xbmcaddon.Addon()
+        self.addon_handle = int(sys.argv[1])
+        self.num_slots = slot_count(self.addon)  # 20 by default for maximum skin compatibility
+        self._store = None
+        self._video_folder_ready = False
+    
+    def log(self, message, level=xbmc.LOGINFO):
+        """Log messages with VBKontrol prefix"""
+        xbmc.log(f"[VBKontrol] {message}", level)
+    
+    @property
+    def store(self):
+        """Slot store, read from disk the first time an action needs it"""
+        if self._store is None:
+            # The profile bound to the skin Kodi shows, as the service uses
+            self._store = SlotStore(log=self.log, skin=xbmc.getSkinDir())
+        return self._store
+    
+    @property
+    def video_folder(self):
+        """special:// path of the video_backgrounds folder for the file browser.
+
+        The service creates the folder when it starts, so this normally
+        costs one existence check, and only for actions that browse.
+        """
+        if not self._video_folder_ready:
+            real_path = xbmcvfs.translatePath(VIDEO_FOLDER)
+            if not xbmcvfs.exists(real_path):
+                xbmcvfs.mkdirs(real_path)
+                self.log("Created video_backgrounds folder")
+            self._video_folder_ready = True
+        return VIDEO_FOLDER
+    
+    def get_slot_name(self, slot_num):
+        """Get the name for a slot - with universal defaults"""
+        return self.store.get_name(slot_num)
+    
+    def get_slot_video(self, slot_num):
+        """Get the video file for a slot"""
+        try:
+            video_path = self.store.get_video(slot_num)
+            if video_path and xbmcvfs.exists(video_path):
+                return video_path
+        except:
+            pass
+        return None
+    
+    def notify_slots_changed(self, slots):
+        """Tell the service which slots changed"""
+        from resources.lib.events import notify_slots_changed
+        notify_slots_changed(slots)
+    
+    def set_slot_name(self, slot_num, name):
+        """Save custom name for a slot"""
+        return self.store.set_name(slot_num, name)
+    
+    def set_slot_video(self, slot_num, video_path):
+        """Save video file for a slot"""
+        return self.apply_videos([slot_num], video_path) is not None
+    
+    def apply_videos(self, slots, video_path):
+        """Assign `video_path` to several slots at once, or clear them for None.
+
+        One atomic write of slots.json, one pass over the window properties
+        and one change notification, however many slots change. Returns the
+        number of slots changed, or None if the change could not be saved.
+        """
+        video_path = video_path or None
+        changed = [i for i in slots
+                   if 1 <= i <= self.num_slots
+                   and (self.store.get_video(i) != video_path or self.store.get_playlist(i))]
+        if not changed:
+            return 0
+        try:
+            with self.store.transaction():
+                for i in changed:
+                    if video_path:
+                        self.store.set_video(i, video_path)
+                    else:
+                        self.store.clear_video(i)
+        except Exception as e:
+            self.log(f"Error saving slot videos: {e}", xbmc.LOGERROR)
+            return None
+        
+        window = xbmcgui.Window(10000)
+        for i in changed:
+            slot_name = self.get_slot_name(i)
+            for key in (f'VBKontrol.{slot_name}.Video', f'VBKontrol.Slot{i}.Video'):
+                if video_path:
+                    window.setProperty(key, video_path)
+                else:
+                    window.clearProperty(key)
+        self.notify_slots_changed(changed)
+        
+        target = os.path.basename(video_path) if video_path else "nothing"
+        self.log(f"Set {len(changed)} slots to {target}")
+        return len(changed)
+    
+    def select_slots(self, dialog):
+        """Ask which slots a bulk operation applies to. Returns slot numbers or None"""
+        choice = dialog.select("Apply to", [
+            "All Slots",
+            "Slot Range (e.g. 1-5, 8, 12-)",
+            "Slots Whose Name Matches (e.g. Custom*)",
+        ])
+        if choice == 0:
+            return list(range(1, self.num_slots + 1))
+        if choice == 1:
+            text = dialog.input("Slot range", type=xbmcgui.INPUT_ALPHANUM)
+            if not text:
+                return None
+            try:
+                return parse_slot_range(text, self.num_slots)
+            except ValueError:
+                dialog.notification("VB Kontrol", f"Invalid slot range: {text}", xbmcgui.NOTIFICATION_ERROR, 3000)
+                return None
+        if choice == 2:
+            pattern = dialog.input("Slot name pattern", type=xbmcgui.INPUT_ALPHANUM)
+            return self.store.match_names(pattern, self.num_slots) if pattern else None
+        return None
+    
+    def show_main_menu(self, page=1):
+        """Show the main VBKontrol menu with one page of slots"""
+        from resources.lib.mediainfo import MediaIndex, describe, is_heavy
+        from resources.lib.playlist import summary
+        
+        listing = []
+        slots_per_page = max(self.addon.getSettingInt('slots_per_page'), 10)
+        pages = (self.num_slots - 1) // slots_per_page + 1
+        page = min(max(page, 1), pages)
+        
+        # Add header
+        item = xbmcgui.ListItem("=== VB Kontrol - Universal Video Backgrounds ===")
+        item.setInfo('video', {'title': "VB Kontrol", 'plot': "Configure video backgrounds for any skin"})
+        listing.append((None, item, False))
+        
+        # Global video option
+        item = xbmcgui.ListItem("🌍 Global Video Background")
+        item.setInfo('video', {'title': "Global Video", 'plot': "Set one video for all menus"})
+        url = f"plugin://plugin.program.vbkontrol/?action=global_video"
+        listing.append((url, item, False))
+        
+        # Bulk changes by slot range or name pattern
+        item = xbmcgui.ListItem("📦 Bulk Assign or Clear")
+        item.setInfo('video', {'title': "Bulk Assign or Clear", 'plot': "Set or clear the video of a range of slots, or of slots whose name matches a pattern"})
+        url = f"plugin://plugin.program.vbkontrol/?action=bulk"
+        listing.append((url, item, False))
+        
+        # Separator
+        if pages > 1:
+            item = xbmcgui.ListItem(f"--- Video Background Slots ({self.num_slots} Total, Page {page}/{pages}) ---")
+        else:
+            item = xbmcgui.ListItem(f"--- Video Background Slots ({self.num_slots} Total) ---")
+        listing.append((None, item, False))
+        
+        if page > 1:
+            item = xbmcgui.ListItem(f"⬅️ Previous Page ({page - 1}/{pages})")
+            url = f"plugin://plugin.program.vbkontrol/?page={page - 1}"
+            listing.append((url, item, True))
+        
+        # Metadata written by the service's media index
+        media = MediaIndex(log=self.log)
+        
+        # Only the slots on this page are read
+        first = (page - 1) * slots_per_page + 1
+        for i in range(first, min(first + slots_per_page, self.num_slots + 1)):
+            slot_name = self.get_slot_name(i)
+            slot_video = self.get_slot_video(i)
+            playlist = self.store.get_playlist(i)
+            
+            if playlist:
+                label = f"🔁 {slot_name} → {summary(playlist)}"
+                plot = "Playlist: " + ", ".join(os.path.basename(video) for video in playlist['videos'])
+                plot += "\nClick to edit or clear"
+            elif slot_video:
+                video_name = os.path.basename(slot_video)
+                label = f"📹 {slot_name} → {video_name}"
+                plot = f"Current video: {video_name}\nClick to change or clear"
+                info = media.lookup(slot_video)
+                if info:
+                    plot += f"\n{describe(info)}"
+                    if is_heavy(info):
+                        label += " ⚠️"
+                        plot += "\nWarning: 4K or high-bitrate clips may stutter on low-end devices"
+            else:
+                label = f"⭕ {slot_name}"
+                plot = "No video selected\nClick to select video file"
+            
+            item = xbmcgui.ListItem(label)
+            item.setInfo('video', {'title': slot_name, 'plot': plot})
+            url = f"plugin://plugin.program.vbkontrol/?action=configure_slot&slot={i}"
+            listing.append((url, item, False))
+        
+        if page < pages:
+            item = xbmcgui.ListItem(f"➡️ Next Page ({page + 1}/{pages})")
+            url = f"plugin://plugin.program.vbkontrol/?page={page + 1}"
+            listing.append((url, item, True))
+        
+        # Separator and utilities
+        item = xbmcgui.ListItem("--- Utilities ---")
+        listing.append((None, item, False))
+        
+        # Slot profiles per skin
+        item = xbmcgui.ListItem(f"👤 Slot Profiles ({self.store.profile or 'Default'})")
+        item.setInfo('video', {'title': "Slot Profiles", 'plot': "Give each skin its own slot names and videos"})
+        url = f"plugin://plugin.program.vbkontrol/?action=profiles"
+        listing.append((url, item, False))
+        
+        # Clear all
+        item = xbmcgui.ListItem("🗑️ Clear All Video Backgrounds")
+        item.setInfo('video', {'title': "Clear All", 'plot': "Remove all video background assignments"})
+        url = f"plugin://plugin.program.vbkontrol/?action=clear_all"
+        listing.append((url, item, False))
+        
+        # Cancel a running faststart optimization
+        window = xbmcgui.Window(10000)
+        if window.getProperty('VBKontrol.Faststart.Running') == 'true':
+            item = xbmcgui.ListItem("⏹️ Cancel Video Optimization")
+            item.setInfo('video', {'title': "Cancel Optimization", 'plot': "Stop moving the moov atom of the video being optimized"})
+            url = f"plugin://plugin.program.vbkontrol/?action=cancel_optimize"
+            listing.append((url, item, False))
+        
+        # Service status
+        service_running = window.getProperty('VBKontrol.Service.Running') == 'true'
+        
+        # cProfile capture of the service, for debugging slow menus
+        if service_running and self.addon.getSettingBool('debug_logging'):
+            item = xbmcgui.ListItem("🩺 Profile the Service")
+            item.setInfo('video', {'title': "Profile the Service", 'plot': "Record a cProfile of the next service cycles into the addon_data folder"})
+            url = f"plugin://plugin.program.vbkontrol/?action=profile"
+            listing.append((url, item, False))
+        status = "✅ Service Running" if service_running else "❌ Service Stopped"
+        
+        item = xbmcgui.ListItem(f"ℹ️ {status}")
+        item.setInfo('video', {'title': "Service Status", 'plot': f"Background service status: {status}"})
+        listing.append((None, item, False))
+        
+        # Add items to directory
+        xbmcplugin.addDirectoryItems(self.addon_handle, listing, len(listing))
+        xbmcplugin.endOfDirectory(self.addon_handle)
+    
+    def configure_slot(self, slot_num):
+        """Configure a specific slot"""
+        slot_name = self.get_slot_name(slot_num)
+        slot_video = self.get_slot_video(slot_num)
+        
+        # Create menu for slot configuration
+        dialog = xbmcgui.Dialog()
+        
+        playlist = self.store.get_playlist(slot_num)
+        options = [("Select Video File", self.select_video_for_slot)]
+        if slot_video:
+            options.append(("Clear Video", self.clear_slot_video))
+        options.append(("Edit Playlist" if playlist else "Rotate a Playlist of Videos", self.edit_playlist))
+        if playlist:
+            options.append(("Clear Playlist", self.clear_slot_video))
+        options.append(("Rename Slot", self.rename_slot))
+        
+        choice = dialog.select(f"Configure: {slot_name}", [label for label, _ in options])
+        if choice >= 0:
+            options[choice][1](slot_num)
+    
+    def edit_playlist(self, slot_num):
+        """Build or change the rotation playlist of a slot. The schedule is
+        computed once here, when the playlist is saved"""
+        from resources.lib.mediainfo import VIDEO_EXTENSIONS
+        from resources.lib.playlist import MODES, ORDERS, build, summary
+        
+        dialog = xbmcgui.Dialog()
+        playlist = self.store.get_playlist(slot_num) or {}
+        slot_video = self.store.get_video(slot_num)
+        videos = list(playlist.get('videos') or ([slot_video] if slot_video else []))
+        order = playlist.get('order', ORDERS[0])
+        mode = playlist.get('mode', MODES[0])
+        every = playlist.get('every', 30)
+        
+        while True:
+            names = [os.path.basename(video) for video in videos]
+            options = [
+                f"Add Videos ({len(videos)} in the Playlist)",
+                "Remove Videos",
+                "Move a Video",
+                f"Order: {order.title()}",
+                f"Rotate Every {every} {mode.title()}",
+                "Save Playlist",
+            ]
+            choice = dialog.select(f"Playlist: {self.get_slot_name(slot_num)}", options)
+            if choice == 0:
+                picked = dialog.browse(1, "Add videos", 'video', VIDEO_MASK, False, False, self.video_folder, True)
+                if isinstance(picked, str):
+                    picked = [picked]
+                # Cancelling returns the start folder
+                videos += [path for path in picked or ()
+                           if path.lower().endswith(VIDEO_EXTENSIONS) and path not in videos]
+            elif choice == 1 and videos:
+                remove = dialog.multiselect("Remove videos", names) or []
+                videos = [video for i, video in enumerate(videos) if i not in remove]
+            elif choice == 2 and len(videos) > 1:
+                moved = dialog.select("Move which video?", names)
+                if moved < 0:
+                    continue
+                video = videos.pop(moved)
+                places = [f"Before {os.path.basename(other)}" for other in videos] + ["To the End"]
+                place = dialog.select(f"Move {names[moved]}", places)
+                videos.insert(place if place >= 0 else moved, video)
+            elif choice == 3:
+                order = ORDERS[(ORDERS.index(order) + 1) % len(ORDERS)]
+            elif choice == 4:
+                picked = dialog.select("Rotate", ["Every N Minutes (Same Times Each Day)", "Every N Loops of the Video"])
+                if picked < 0:
+                    continue
+                text = dialog.input(f"Rotate every how many {MODES[picked]}?", str(every), type=xbmcgui.INPUT_NUMERIC)
+                try:
+                    every, mode = max(int(text), 1), MODES[picked]
+                except ValueError:
+                    pass
+            elif choice == 5:
+                break
+            elif choice < 0:
+                return
+        
+        if not videos:
+            # An empty playlist leaves the slot without a video
+            saved = self.store.set_playlist(slot_num, None)
+            message = f"Playlist cleared for {self.get_slot_name(slot_num)}"
+        else:
+            durations = {}
+            if mode == 'loops':
+                from resources.lib.mediainfo import MediaIndex
+                media = MediaIndex(log=self.log)
+                for video in videos:
+                    info = media.lookup(video)
+                    durations[video] = info.get('duration') if info else None
+            playlist = build(videos, order, mode, every, durations)
+            saved = self.store.set_playlist(slot_num, playlist)
+            message = f"Playlist of {summary(playlist)}"
+        if not saved:
+            dialog.notification("VB Kontrol", "Error saving playlist", xbmcgui.NOTIFICATION_ERROR, 3000)
+            return
+        self.notify_slots_changed([slot_num])
+        dialog.notification("VB Kontrol", message, xbmcgui.NOTIFICATION_INFO, 3000)
+    
+    def select_video_for_slot(self, slot_num):
+        """Select a video file for a specific slot"""
+        self.open_picker([slot_num])
+    
+    def plugin_url(self, **params):
+        """plugin:// URL of an action of this addon"""
+        return "plugin://plugin.program.vbkontrol/?" + urlencode(params)
+    
+    def open_picker(self, slots, **params):
+        """Show the video picker for `slots` in place of the current listing"""
+        url = self.plugin_url(action='pick', slots=format_slot_range(slots), **params)
+        xbmc.executebuiltin(f"Container.Update({url})")
+    
+    def picker_target(self, slots):
+        """What a picker for `slots` assigns to, for headings"""
+        if len(slots) == 1:
+            return self.get_slot_name(slots[0])
+        if len(slots) == self.num_slots:
+            return f"all {len(slots)} slots"
+        return f"{len(slots)} slots"
+    
+    def open_library(self):
+        """Library pages of the video_backgrounds folder, brought up to date if
+        the folder changed since the service last wrote them"""
+        from resources.lib.library import LibraryPages
+        library = LibraryPages(log=self.log)
+        try:
+            folder_mtime = os.stat(xbmcvfs.translatePath(self.video_folder)).st_mtime_ns
+        except OSError:
+            folder_mtime = None
+        if library.stale(folder_mtime):
+            from resources.lib.mediainfo import MediaIndex
+            MediaIndex(log=self.log, library=library).rescan(full=True)
+        return library
+    
+    def pick_video(self, params):
+        """Video picker: one page of the video_backgrounds folder, sorted or
+        filtered by a name prefix, read from the library pages"""
+        from resources.lib.library import ADDED, DURATION, NAME, SIZE, SORT_LABELS, SORTS, SUMMARY
+        
+        slots = params.get('slots', '')
+        sort = params.get('sort') if params.get('sort') in SORTS else 'name'
+        prefix = params.get('prefix', '')
+        try:
+            page = max(int(params.get('page', 1)), 1)
+        except ValueError:
+            page = 1
+        try:
+            target = self.picker_target(parse_slot_range(slots, self.num_slots))
+        except ValueError:
+            self.log(f"Invalid slot range: {slots}", xbmc.LOGERROR)
+            return
+        
+        library = self.open_library()
+        if prefix:
+            rows, more = library.search(prefix, page)
+            title = f"--- Videos Starting With \"{prefix}\" for {target} (Page {page}) ---"
+        else:
+            rows = library.page(sort, page)
+            pages = library.pages()
+            more = page < pages
+            title = f"--- Select Video for {target} ({library.count} Videos, Page {page}/{pages}) ---"
+        
+        listing = [(None, xbmcgui.ListItem(title), False)]
+        
+        item = xbmcgui.ListItem("🔎 Search by Name")
+        item.setInfo('video', {'title': "Search by Name", 'plot': "List the videos whose name starts with what you type"})
+        listing.append((self.plugin_url(action='pick_search', slots=slots), item, False))
+        
+        if prefix:
+            item = xbmcgui.ListItem("✖️ Clear Search")
+            listing.append((self.plugin_url(action='pick', slots=slots), item, True))
+        else:
+            next_sort = SORTS[(SORTS.index(sort) + 1) % len(SORTS)]
+            item = xbmcgui.ListItem(f"↕️ Sorted by {SORT_LABELS[sort]} (Switch to {SORT_LABELS[next_sort]})")
+            listing.append((self.plugin_url(action='pick', slots=slots, sort=next_sort), item, True))
+        
+        if page > 1:
+            item = xbmcgui.ListItem(f"⬅️ Previous Page ({page - 1})")
+            listing.append((self.plugin_url(action='pick', slots=slots, sort=sort, prefix=prefix, page=page - 1), item, True))
+        
+        for row in rows:
+            plot = [row[SUMMARY]] if row[SUMMARY] else []
+            plot.append(f"{row[SIZE] / 1e6:.1f} MB")
+            if row[ADDED]:
+                plot.append(time.strftime("Added %Y-%m-%d", time.localtime(row[ADDED])))
+            item = xbmcgui.ListItem(f"📹 {row[NAME]}")
+            item.setInfo('video', {'title': row[NAME], 'plot': "\n".join(plot), 'duration': int(row[DURATION])})
+            url = self.plugin_url(action='assign', slots=slots, video=self.video_folder + row[NAME])
+            listing.append((url, item, False))
+        
+        if more:
+            item = xbmcgui.ListItem(f"➡️ Next Page ({page + 1})")
+            listing.append((self.plugin_url(action='pick', slots=slots, sort=sort, prefix=prefix, page=page + 1), item, True))
+        
+        # Clips kept anywhere else
+        item = xbmcgui.ListItem("📂 Browse Other Folders...")
+        item.setInfo('video', {'title': "Browse", 'plot': "Pick a video with Kodi's file browser"})
+        listing.append((self.plugin_url(action='pick_browse', slots=slots), item, False))
+        
+        xbmcplugin.addDirectoryItems(self.addon_handle, listing, len(listing))
+        xbmcplugin.endOfDirectory(self.addon_handle)
+    
+    def search_videos(self, params):
+        """Ask for a name prefix and show the matching videos in the picker"""
+        prefix = xbmcgui.Dialog().input("Video name starts with", type=xbmcgui.INPUT_ALPHANUM)
+        if prefix:
+            url = self.plugin_url(action='pick', slots=params.get('slots', ''), prefix=prefix)
+            xbmc.executebuiltin(f"Container.Update({url})")
+    
+    def browse_videos(self, params):
+        """Assign a video picked with Kodi's file browser"""
+        try:
+            slots = parse_slot_range(params.get('slots', ''), self.num_slots)
+        except ValueError:
+            return
+        video_path = xbmcgui.Dialog().browse(
+            1,  # Browse for file
+            f"Select video for {self.picker_target(slots)}",
+            'video',
+            VIDEO_MASK,
+            False,  # Use thumbs
+            False,  # Treat as folder
+            self.video_folder  # Default path
+        )
+        if video_path:
+            self.assign_video({'slots': params.get('slots', ''), 'video': video_path})
+    
+    def assign_video(self, params):
+        """Assign the video picked in the picker, then go back to the slots"""
+        dialog = xbmcgui.Dialog()
+        try:
+            slots = parse_slot_range(params.get('slots', ''), self.num_slots)
+        except ValueError:
+            self.log(f"Invalid slot range: {params.get('slots')}", xbmc.LOGERROR)
+            return
+        if not slots or not params.get('video'):
+            return
+        
+        count = self.apply_videos(slots, params['video'])
+        if count is None:
+            dialog.notification("VB Kontrol", "Error setting video file", xbmcgui.NOTIFICATION_ERROR, 3000)
+            return
+        if len(slots) == 1:
+            message = f"Video set for {self.get_slot_name(slots[0])}"
+        else:
+            message = f"Video set for {count} slots"
+        dialog.notification("VB Kontrol", message, xbmcgui.NOTIFICATION_INFO, 3000)
+        xbmc.executebuiltin(f"Container.Update({self.plugin_url()},replace)")
+    
+    def clear_slot_video(self, slot_num):
+        """Clear video for a slot"""
+        try:
+            dialog = xbmcgui.Dialog()
+            # False from clear_video also means there was nothing to clear
+            assigned = self.store.get_video(slot_num) or self.store.get_playlist(slot_num)
+            if assigned and not self.store.clear_video(slot_num):
+                dialog.notification("VB Kontrol", "Error clearing video", xbmcgui.NOTIFICATION_ERROR, 3000)
+                return
+            
+            # Clear window properties
+            slot_name = self.get_slot_name(slot_num)
+            window = xbmcgui.Window(10000)
+            window.clearProperty(f'VBKontrol.{slot_name}.Video')
+            window.clearProperty(f'VBKontrol.Slot{slot_num}.Video')
+            self.notify_slots_changed([slot_num])
+            
+            dialog.notification(
+                "VB Kontrol",
+                f"Video cleared for {slot_name}",
+                xbmcgui.NOTIFICATION_INFO,
+                3000
+            )
+        except Exception as e:
+            self.log(f"Error clearing slot video: {e}", xbmc.LOGERROR)
+    
+    def rename_slot(self, slot_num):
+        """Rename a slot"""
+        dialog = xbmcgui.Dialog()
+        current_name = self.get_slot_name(slot_num)
+        
+        new_name = dialog.input(
+            f"Rename slot (currently: {current_name})",
+            current_name,
+            type=xbmcgui.INPUT_ALPHANUM
+        )
+        
+        if new_name and new_name != current_name:
+            if self.set_slot_name(slot_num, new_name):
+                # Update window property with new name
+                slot_video = self.get_slot_video(slot_num)
+                if slot_video:
+                    window = xbmcgui.Window(10000)
+                    # Clear old property
+                    window.clearProperty(f'VBKontrol.{current_name}.Video')
+                    # Set new property
+                    window.setProperty(f'VBKontrol.{new_name}.Video', slot_video)
+                self.notify_slots_changed([slot_num])
+                
+                dialog.notification(
+                    "VB Kontrol",
+                    f"Renamed to: {new_name}",
+                    xbmcgui.NOTIFICATION_INFO,
+                    3000
+                )
+    
+    def set_global_video(self):
+        """Set global video for all slots"""
+        self.open_picker(range(1, self.num_slots + 1))
+    
+    def clear_all_videos(self):
+        """Clear all video backgrounds"""
+        dialog = xbmcgui.Dialog()
+        
+        if dialog.yesno("VB Kontrol", "Clear all video backgrounds?"):
+            count = self.apply_videos(range(1, self.num_slots + 1), None)
+            if count is None:
+                dialog.notification("VB Kontrol", "Error clearing video backgrounds", xbmcgui.NOTIFICATION_ERROR, 3000)
+                return
+            
+            dialog.notification(
+                "VB Kontrol",
+                f"Cleared {count} video backgrounds",
+                xbmcgui.NOTIFICATION_INFO,
+                3000
+            )
+    
+    def bulk_videos(self, params):
+        """Set or clear the video of many slots.
+
+        Skins and scripts can pass `slots` (a range) or `names` (a pattern)
+        together with `video` or `clear=true`; otherwise the user is asked.
+        """
+        dialog = xbmcgui.Dialog()
+        if 'slots' in params or 'names' in params:
+            try:
+                if 'slots' in params:
+                    slots = parse_slot_range(params['slots'], self.num_slots)
+                else:
+                    slots = self.store.match_names(params['names'], self.num_slots)
+            except ValueError:
+                self.log(f"Invalid slot range: {params['slots']}", xbmc.LOGERROR)
+                return
+            if params.get('clear') == 'true':
+                video_path = None
+            elif params.get('video'):
+                video_path = params['video']
+            else:
+                self.log("Bulk change needs video or clear=true", xbmc.LOGERROR)
+                return
+            self.apply_videos(slots, video_path)
+            return
+        
+        slots = self.select_slots(dialog)
+        if not slots:
+            return
+        choice = dialog.select(f"{len(slots)} slots", ["Assign a Video", "Clear Videos"])
+        if choice == 0:
+            self.open_picker(slots)
+            return
+        if choice == 1:
+            count = self.apply_videos(slots, None)
+            message = f"Cleared {count} video backgrounds"
+        else:
+            return
+        
+        if count is None:
+            dialog.notification("VB Kontrol", "Error saving slot videos", xbmcgui.NOTIFICATION_ERROR, 3000)
+        else:
+            dialog.notification("VB Kontrol", message, xbmcgui.NOTIFICATION_INFO, 3000)
+    
+    def manage_profiles(self):
+        """Create, assign or delete the slot profile of the current skin"""
+        from resources.lib.events import PROFILES_CHANGED, notify
+        dialog = xbmcgui.Dialog()
+        skin = xbmc.getSkinDir()
+        current = self.store.profile
+        names = self.store.profile_names()
+        
+        options = [(f"New Profile for {skin} (Copy of {current or 'Default'})", 'create', None)]
+        for name in [None] + names:
+            if name != current:
+                options.append((f"Use {name or 'the Default Slots'} for {skin}", 'bind', name))
+        for name in names:
+            skins = ', '.join(self.store.profile_skins(name)) or "no skin"
+            options.append((f"Delete {name} ({skins})", 'delete', name))
+        
+        choice = dialog.select(f"Slot Profiles: {skin} uses {current or 'Default'}", [label for label, _, _ in options])
+        if choice < 0:
+            return
+        _, action, name = options[choice]
+        if action == 'create':
+            name = (dialog.input("Profile name", type=xbmcgui.INPUT_ALPHANUM) or '').strip()
+            if not name:
+                return
+            if name in names:
+                dialog.notification("VB Kontrol", f"A profile named {name} already exists", xbmcgui.NOTIFICATION_ERROR, 3000)
+                return
+            saved = self.store.create_profile(name, skin)
+            message = f"{skin} now uses {name}"
+        elif action == 'bind':
+            saved = self.store.bind_skin(name, skin)
+            message = f"{skin} now uses {name or 'the default slots'}"
+        else:
+            if not dialog.yesno("VB Kontrol", f"Delete slot profile {name}? Its skins go back to the default slots."):
+                return
+            saved = self.store.delete_profile(name)
+            message = f"Deleted {name}"
+        
+        if not saved:
+            dialog.notification("VB Kontrol", "Error saving slot profiles", xbmcgui.NOTIFICATION_ERROR, 3000)
+            return
+        notify(PROFILES_CHANGED)
+        dialog.notification("VB Kontrol", message, xbmcgui.NOTIFICATION_INFO, 3000)
+        xbmc.executebuiltin(f"Container.Update({self.plugin_url()},replace)")
+    
+    def profile_service(self, params):
+        """Ask the service to profile its next cycles into addon_data"""
+        from resources.lib.events import PROFILE_SERVICE, notify
+        from resources.lib.stats import PROFILE_CYCLES
+        try:
+            cycles = max(int(params.get('cycles', PROFILE_CYCLES)), 1)
+        except ValueError:
+            cycles = PROFILE_CYCLES
+        notify(PROFILE_SERVICE, {'cycles': cycles})
+        xbmcgui.Dialog().notification("VB Kontrol", f"Profiling the next {cycles} service cycles", xbmcgui.NOTIFICATION_INFO, 3000)
+    
+    def router(self, paramstring):
+        """Route addon calls to appropriate functions"""
+        params = dict(parse_qsl(paramstring))
+        action = params.get('action')
+        
+        if action == 'configure_slot':
+            slot_num = int(params.get('slot', 1))
+            self.configure_slot(slot_num)
+        elif action == 'global_video':
+            self.set_global_video()
+        elif action == 'clear_all':
+            self.clear_all_videos()
+        elif action == 'bulk':
+            self.bulk_videos(params)
+        elif action == 'cancel_optimize':
+            from resources.lib.events import CANCEL_FASTSTART, notify
+            notify(CANCEL_FASTSTART)
+        elif action == 'profile':
+            self.profile_service(params)
+        elif action == 'profiles':
+            self.manage_profiles()
+        elif action == 'pick':
+            self.pick_video(params)
+        elif action == 'pick_search':
+            self.search_videos(params)
+        elif action == 'pick_browse':
+            self.browse_videos(params)
+        elif action == 'assign':
+            self.assign_video(params)
+        else:
+            # Show main menu
+            try:
+                page = int(params.get('page', 1))
+            except ValueError:
+                page = 1
+            self.show_main_menu(page)
+
+def main():
+    """Main entry point"""
+    try:
+        vbk = VBKontrol()
+        vbk.router(sys.argv[2][1:])  # Remove the leading '?'
+    except Exception as e:
+        xbmc.log(f"[VBKontrol] Error: {e}", xbmc.LOGERROR)
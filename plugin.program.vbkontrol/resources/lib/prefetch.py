@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+
+"""
+VB Kontrol - Background video prefetch
+Warms the first few MB of the videos next to the focused menu item so the
+player does not start them from a cold SD card or NAS. Local files use
+posix_fadvise(WILLNEED) where available, everything else is read ahead on
+a worker thread. Moving focus cancels work queued for the old position.
+"""
+
+import collections
+import os
+import queue
+import threading
+import time
+
+import xbmc
+import xbmcvfs
+
+READ_CHUNK = 256 * 1024
+
+
+class Prefetcher:
+    """Single read-ahead worker with a per-file size cap and an IO budget"""
+
+    def __init__(self, head_bytes=8 * 1024 * 1024, budget_per_minute=64 * 1024 * 1024,
+                 warm_ttl=300.0, log=None, clock=time.monotonic, gate=None):
+        self.head_bytes = head_bytes
+        self.budget_per_minute = budget_per_minute
+        self.warm_ttl = warm_ttl
+        self._log = log
+        self._clock = clock
+        self._gate = gate  # IOGate pausing read-ahead, e.g. during playback
+
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._warm = {}  # path -> time it was last warmed or played
+        self._tokens = float(budget_per_minute)
+        self._refilled = clock()
+        self._queue = queue.Queue()
+
+        self.hits = 0
+        self.misses = 0
+        self.bytes_read = 0
+        self.cancelled = 0
+        self.io_counts = collections.Counter()  # path -> files read ahead
+
+        self._thread = threading.Thread(target=self._run, name="VBKontrolPrefetch", daemon=True)
+        self._thread.start()
+
+    def log(self, message, level=xbmc.LOGDEBUG):
+        if self._log:
+            self._log(message, level)
+
+    def focus(self, current, neighbours):
+        """Focus moved to a slot playing `current`; warm `neighbours` next.
+
+        Counts a hit if `current` was warmed in time, a miss otherwise, and
+        cancels whatever was still queued for the previous focus.
+        """
+        now = self._clock()
+        with self._lock:
+            if current:
+                if self._is_warm(current, now):
+                    self.hits += 1
+                else:
+                    self.misses += 1
+                # The player is reading it now, no need to prefetch it
+                self._warm[current] = now
+            self._generation += 1
+            generation = self._generation
+        self._queue.put((generation, [path for path in neighbours if path and path != current]))
+
+    def warm(self, paths):
+        """Read ahead `paths` about to be shown, e.g. the next clip of a
+        playlist; a later focus change cancels it like any prefetch"""
+        with self._lock:
+            generation = self._generation
+        self._queue.put((generation, [path for path in paths if path]))
+
+    def cancel(self):
+        """Abandon queued and in-flight prefetches"""
+        with self._lock:
+            self._generation += 1
+
+    def stop(self):
+        self.cancel()
+        self._queue.put(None)
+
+    def _is_warm(self, path, now):
+        warmed = self._warm.get(path)
+        return warmed is not None and now - warmed < self.warm_ttl
+
+    def _take_budget(self, size):
+        # Token bucket refilled at budget_per_minute
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.budget_per_minute,
+                               self._tokens + (now - self._refilled) * self.budget_per_minute / 60.0)
+            self._refilled = now
+            if self._tokens < size:
+                return False
+            self._tokens -= size
+            return True
+
+    def _current(self, generation):
+        return generation == self._generation
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            generation, paths = job
+            for path in paths:
+                if self._gate:
+                    self._gate.wait()
+                if not self._current(generation):
+                    self.cancelled += 1
+                    break
+                with self._lock:
+                    if self._is_warm(path, self._clock()):
+                        continue
+                if not self._take_budget(self.head_bytes):
+                    self.log(f"Prefetch budget exhausted, skipping {path}")
+                    break
+                try:
+                    if not self._prefetch(path, generation):
+                        break
+                    with self._lock:
+                        self._warm[path] = self._clock()
+                except Exception as e:
+                    self.log(f"Prefetch failed for {path}: {e}", xbmc.LOGWARNING)
+
+    def _prefetch(self, path, generation):
+        """Warm the head of one file. Returns False if cancelled"""
+        self.io_counts[path] += 1
+        local = xbmcvfs.translatePath(path)
+        if os.path.isfile(local):
+            fd = os.open(local, os.O_RDONLY)
+            try:
+                if hasattr(os, 'posix_fadvise'):
+                    # Kernel read-ahead; returns immediately
+                    size = min(self.head_bytes, os.fstat(fd).st_size)
+                    os.posix_fadvise(fd, 0, size, os.POSIX_FADV_WILLNEED)
+                    self.bytes_read += size
+                    return True
+                return self._read_ahead(lambda size: os.read(fd, size), generation)
+            finally:
+                os.close(fd)
+
+        # Network paths go through Kodi's VFS
+        f = xbmcvfs.File(path)
+        try:
+            return self._read_ahead(lambda size: f.readBytes(size), generation)
+        finally:
+            f.close()
+
+    def _read_ahead(self, read, generation):
+        remaining = self.head_bytes
+        while remaining > 0:
+            if self._gate:
+                self._gate.wait()
+            if not self._current(generation):
+                self.cancelled += 1
+                return False
+            data = read(min(READ_CHUNK, remaining))
+            if not data:
+                break
+            self.bytes_read += len(data)
+            remaining -= len(data)
+        return True
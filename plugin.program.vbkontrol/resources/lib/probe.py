@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+
+"""
+VB Kontrol - Non-blocking existence probes
+Video paths are stat'ed on a small pool of daemon worker threads. Results
+go into a TTL cache keyed by path, so the service loop only ever reads
+cached answers and never blocks on an unreachable smb:// or nfs:// share.
+Local paths have a worker of their own and each share probes one path at
+a time, so a dead NAS cannot hold up the others.
+"""
+
+import collections
+import queue
+import threading
+import time
+from urllib.parse import urlparse
+
+import xbmc
+import xbmcvfs
+
+
+def share_host(path):
+    """Host part of a network path, or '' for local files"""
+    if '://' not in path:
+        return ''
+    parsed = urlparse(path)
+    if parsed.scheme in ('special', 'file'):
+        return ''
+    return f"{parsed.scheme}://{parsed.netloc}"
+
+
+class ExistenceProbe:
+    """TTL cache of path existence filled by background workers"""
+
+    def __init__(self, workers=2, timeout=5.0, ttl=60.0, negative_ttl=15.0,
+                 max_backoff=300.0, per_host=1, log=None, clock=time.monotonic, gate=None):
+        self.timeout = timeout
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_backoff = max_backoff
+        self.per_host = per_host
+        self._log = log
+        self._clock = clock
+        self._gate = gate  # IOGate holding the workers while I/O is paused
+
+        self._lock = threading.Lock()
+        self._cache = {}        # path -> (exists, expires_at)
+        self._in_flight = {}    # path -> started_at, or None while it waits for a worker
+        self._backoff = {}      # share host -> (failures, retry_at)
+        self._changed = set()   # paths whose cached answer changed
+        self._running = collections.Counter()  # share host -> paths handed to workers
+        self._waiting = collections.defaultdict(collections.deque)  # share host -> paths over per_host
+        self.io_counts = collections.Counter()  # path -> existence checks made
+        self._local_queue = queue.Queue()
+        self._queue = queue.Queue()
+        self._workers = []
+        for i, work in enumerate([self._local_queue] + [self._queue] * max(workers, 1)):
+            worker = threading.Thread(target=self._run, args=(work,), name=f"VBKontrolProbe{i}", daemon=True)
+            worker.start()
+            self._workers.append((worker, work))
+
+    def log(self, message, level=xbmc.LOGINFO):
+        if self._log:
+            self._log(message, level)
+
+    def exists(self, path):
+        """Cached existence of `path`: True, False, or None if not known yet.
+
+        Never blocks. Expired or missing entries are queued for a refresh
+        and the last known answer is returned meanwhile.
+        """
+        now = self._clock()
+        with self._lock:
+            entry = self._cache.get(path)
+            if entry and entry[1] > now:
+                return entry[0]
+            self._schedule(path, now)
+            return entry[0] if entry else None
+
+    def invalidate(self, path):
+        """Forget the cached answer for `path` so it is probed again"""
+        with self._lock:
+            self._cache.pop(path, None)
+
+    def take_changed(self):
+        """Paths whose answer changed since the last call"""
+        self.check_timeouts()
+        with self._lock:
+            changed, self._changed = self._changed, set()
+        return changed
+
+    def check_timeouts(self):
+        """Treat probes running longer than `timeout` as unreachable. Paths
+        still waiting for a worker are not timed out"""
+        if self._gate and self._gate.paused:
+            return
+        now = self._clock()
+        with self._lock:
+            for path, started in list(self._in_flight.items()):
+                if started is None:
+                    continue
+                if self._gate:
+                    # Time spent held at the gate does not count
+                    started = max(started, self._gate.resumed_at)
+                if now - started >= self.timeout and path in self._in_flight:
+                    del self._in_flight[path]
+                    self._record(path, False, now)
+                    host = share_host(path)
+                    self._host_failed(host, now)
+                    self.log(f"Probe timed out after {self.timeout:.0f}s: {path}", xbmc.LOGWARNING)
+                    # The rest of that share's paths would only queue behind it
+                    for waiting in self._waiting.pop(host, ()):
+                        self._in_flight.pop(waiting, None)
+                        self._record(waiting, False, now)
+
+    def stop(self):
+        for _, work in self._workers:
+            work.put(None)
+
+    def _schedule(self, path, now):
+        # Caller holds the lock
+        if path in self._in_flight:
+            return
+        host = share_host(path)
+        backoff = self._backoff.get(host)
+        if backoff and backoff[1] > now:
+            return
+        self._in_flight[path] = None
+        if not host:
+            self._local_queue.put(path)
+        elif self._running[host] < self.per_host:
+            self._running[host] += 1
+            self._queue.put(path)
+        else:
+            self._waiting[host].append(path)
+
+    def _release(self, host):
+        # Caller holds the lock: hand the share's slot to its next waiting path
+        waiting = self._waiting.get(host)
+        if waiting:
+            self._queue.put(waiting.popleft())
+            if not waiting:
+                del self._waiting[host]
+        else:
+            self._running[host] -= 1
+            if self._running[host] <= 0:
+                del self._running[host]
+
+    def _record(self, path, exists, now):
+        # Caller holds the lock
+        previous = self._cache.get(path)
+        ttl = self.ttl if exists else self.negative_ttl
+        self._cache[path] = (exists, now + ttl)
+        if previous is None or previous[0] != exists:
+            self._changed.add(path)
+
+    def _host_failed(self, host, now):
+        # Caller holds the lock; local paths never back off
+        if not host:
+            return
+        failures = self._backoff.get(host, (0, 0))[0] + 1
+        delay = min(self.negative_ttl * 2 ** (failures - 1), self.max_backoff)
+        self._backoff[host] = (failures, now + delay)
+        self.log(f"Share {host} unreachable, retrying in {delay:.0f}s", xbmc.LOGWARNING)
+
+    def _run(self, work):
+        while True:
+            path = work.get()
+            if path is None:
+                return
+            if self._gate:
+                self._gate.wait()
+            with self._lock:
+                # The timeout runs from here, not from when it was queued
+                if path in self._in_flight:
+                    self._in_flight[path] = self._clock()
+            try:
+                exists = bool(xbmcvfs.exists(path))
+                failed = False
+            except Exception:
+                exists = False
+                failed = True
+
+            now = self._clock()
+            with self._lock:
+                # A probe that already timed out still updates the cache
+                # when it finally returns, so a recovered share shows up
+                self._in_flight.pop(path, None)
+                self.io_counts[path] += 1
+                self._record(path, exists, now)
+                host = share_host(path)
+                if host:
+                    self._release(host)
+                if failed:
+                    self._host_failed(host, now)
+                else:
+                    self._backoff.pop(host, None)
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+
+"""
+VB Kontrol - Window property publisher
+Keeps the last published VBKontrol.* map and only pushes the difference
+"""
+
+import contextlib
+
+import xbmcgui
+
+
+class PropertyPublisher:
+    """Diff-applies property maps onto a Kodi window"""
+
+    def __init__(self, window_id=10000, stats=None):
+        self.window_id = window_id
+        self.stats = stats  # CycleStats timing the Diff and Publish phases
+        # Kodi property keys are case-insensitive, so the map is keyed lowercase
+        self.published = {}
+        self.last_writes = 0
+        self.last_skipped = 0
+        self.total_writes = 0
+        self.total_skipped = 0
+
+    def publish(self, properties, replaces=None):
+        """Make the window match `properties`, touching only changed keys.
+
+        By default `properties` is the complete map and anything else that
+        was published is cleared. Pass `replaces` (the keys a previous
+        partial update owned, e.g. one slot's map) to limit removals to
+        those keys and leave the rest of the window alone.
+        """
+        with self._phase('Diff'):
+            desired = {key.lower(): value for key, value in properties.items()}
+            if replaces is None:
+                stale = self.published.keys() - desired.keys()
+            else:
+                stale = {key.lower() for key in replaces} - desired.keys()
+            updates = [(key, value) for key, value in desired.items() if self.published.get(key) != value]
+        skipped = len(desired) - len(updates)
+        writes = len(updates) + len(stale)
+
+        if writes:
+            with self._phase('Publish'):
+                window = xbmcgui.Window(self.window_id)
+                for key, value in updates:
+                    window.setProperty(key, value)
+                # Keys no longer wanted, e.g. the old name after a rename
+                for key in stale:
+                    window.clearProperty(key)
+
+        self.last_writes = writes
+        self.last_skipped = skipped
+        self.total_writes += writes
+        self.total_skipped += skipped
+        if replaces is None:
+            self.published = desired
+        else:
+            for key in stale:
+                self.published.pop(key, None)
+            self.published.update(desired)
+        return writes
+
+    def forget(self, keys):
+        """Treat `keys` as unknown, e.g. after another process wrote them, so
+        the next publish sets them again"""
+        for key in keys:
+            self.published.pop(key.lower(), None)
+    
+    def _phase(self, name):
+        return self.stats.phase(name) if self.stats else contextlib.nullcontext()
+
+    def clear(self):
+        """Clear every property this publisher has set"""
+        return self.publish({})
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+
+"""
+VB Kontrol - Adaptive I/O scheduling
+Decides when the service may touch storage. Background work pauses while
+foreground media plays or the screensaver is up, the safety-net refresh
+backs off while Kodi sits idle and nothing changes, and skipped work
+catches up as soon as the user is back in the menus.
+"""
+
+import random
+import threading
+import time
+
+import xbmc
+
+ACTIVE = 'active'
+IDLE = 'idle'
+PLAYBACK = 'playback'
+SCREENSAVER = 'screensaver'
+PAUSED_STATES = (PLAYBACK, SCREENSAVER)
+
+# Seconds without input before Kodi counts as idle
+IDLE_AFTER = 120
+# Longest idle refresh interval, as a multiple of the configured one
+MAX_BACKOFF = 16
+# Seconds the menus must stay in view before paused work catches up, so
+# the hop between two playlist items is not taken for a return
+RESUME_DELAY = 1.0
+
+
+class IOGate:
+    """Holds background workers while storage I/O is paused"""
+
+    def __init__(self, clock=time.monotonic):
+        self._clock = clock
+        self._open = threading.Event()
+        self._open.set()
+        self.resumed_at = clock()
+
+    @property
+    def paused(self):
+        return not self._open.is_set()
+
+    def pause(self):
+        self._open.clear()
+
+    def resume(self):
+        if self.paused:
+            self.resumed_at = self._clock()
+            self._open.set()
+
+    def wait(self):
+        """Block while paused. Returns True if it had to wait"""
+        if self._open.is_set():
+            return False
+        self._open.wait()
+        return True
+
+
+class AdaptiveScheduler:
+    """Safety-net refresh timing and the I/O gate, following Kodi's state"""
+
+    def __init__(self, interval, jitter=0, log=None, clock=time.monotonic):
+        self.interval = interval
+        self.jitter = jitter
+        self._log = log
+        self._clock = clock
+        self.gate = IOGate(clock=clock)
+
+        self.state = ACTIVE
+        self.playing = False      # foreground media, set by PlaybackWatcher
+        self.screensaver = False  # set from xbmc.Monitor callbacks
+        self.backoff = 1          # refresh interval multiplier while idle
+        self.changed = False      # something changed since the last refresh
+        self.last_refresh = clock()
+        self.next_refresh = self.last_refresh + self._delay()
+        self._leave_at = None
+
+    def log(self, message, level=xbmc.LOGDEBUG):
+        if self._log:
+            self._log(message, level)
+
+    @property
+    def paused(self):
+        return self.state in PAUSED_STATES
+
+    def _delay(self):
+        jitter = random.uniform(-self.jitter, self.jitter)
+        return max(self.interval * self.backoff + jitter, 1)
+
+    def _wanted(self):
+        if self.playing:
+            return PLAYBACK
+        if self.screensaver:
+            return SCREENSAVER
+        if xbmc.getGlobalIdleTime() >= IDLE_AFTER:
+            return IDLE
+        return ACTIVE
+
+    def update(self):
+        """Follow Kodi's state; call once per service tick. Returns the state"""
+        wanted = self._wanted()
+        now = self._clock()
+        if self.paused and wanted not in PAUSED_STATES:
+            if self._leave_at is None:
+                self._leave_at = now + RESUME_DELAY
+            if now < self._leave_at:
+                return self.state
+        self._leave_at = None
+        if wanted != self.state:
+            self._enter(wanted, now)
+        return self.state
+
+    def _enter(self, state, now):
+        previous, self.state = self.state, state
+        if state in PAUSED_STATES:
+            self.gate.pause()
+            self.log(f"Kodi is in {state}, background I/O paused")
+            return
+        if previous in PAUSED_STATES:
+            self.gate.resume()
+            self.next_refresh = now
+            self.log(f"Kodi is {state} again, catching up on background I/O")
+        elif state == ACTIVE and self.backoff > 1:
+            # Back from idle: return to the configured interval
+            self.backoff = 1
+            self.next_refresh = min(self.next_refresh, self.last_refresh + self._delay())
+
+    def due(self):
+        """True when the safety-net refresh should run now"""
+        return not self.paused and self._clock() >= self.next_refresh
+
+    def note_change(self):
+        """Something changed; keep refreshing at the configured interval"""
+        self.changed = True
+
+    def refreshed(self):
+        """Schedule the next refresh, doubling the interval while idle and unchanged"""
+        if self.state == IDLE and not self.changed:
+            self.backoff = min(self.backoff * 2, MAX_BACKOFF)
+        else:
+            self.backoff = 1
+        self.changed = False
+        self.last_refresh = self._clock()
+        self.next_refresh = self.last_refresh + self._delay()
+
+
+class PlaybackWatcher(xbmc.Player):
+    """Tells the scheduler whether foreground media is playing"""
+
+    def __init__(self, scheduler, is_background=None):
+        super().__init__()
+        self.scheduler = scheduler
+        self.is_background = is_background  # our own loop video is not foreground
+        # Media may already be playing when the service starts
+        self.scheduler.playing = self._foreground()
+
+    def _foreground(self):
+        try:
+            path = self.getPlayingFile() if self.isPlaying() else None
+        except RuntimeError:
+            path = None
+        return path is not None and not (self.is_background and self.is_background(path))
+
+    def onAVStarted(self):
+        self.scheduler.playing = self._foreground()
+
+    def onPlayBackStopped(self):
+        self.scheduler.playing = False
+
+    def onPlayBackEnded(self):
+        self.scheduler.playing = False
+
+    def onPlayBackError(self):
+        self.scheduler.playing = False
@@ -0,0 +1,431 @@
+# -*- coding: utf-8 -*-
+
+"""
+VB Kontrol - Slot store
+Single versioned JSON file holding every slot name and video assignment,
+shared by the plugin and the background service. Besides the default
+slots it can hold named profiles, each a complete set of slots bound to
+one or more skins
+"""
+
+import contextlib
+import fnmatch
+import json
+import os
+import re
+
+import xbmc
+import xbmcvfs
+
+ADDON_ID = "plugin.program.vbkontrol"
+ADDON_DATA = f"special://home/userdata/addon_data/{ADDON_ID}/"
+VIDEO_FOLDER = ADDON_DATA + "video_backgrounds/"
+STORE_FILE = "slots.json"
+STORE_VERSION = 1
+
+# Slot count when the num_slots setting is unset, and the supported maximum
+DEFAULT_SLOTS = 20
+MAX_SLOTS = 2000
+
+# Universal default names, used when a slot has no custom name
+DEFAULT_NAMES = [
+    "Home", "Movies", "TV Shows", "Music", "Pictures",
+    "Videos", "Favourites", "Add-ons", "Settings", "Weather",
+    "Programs", "Games", "System", "Live TV", "Radio",
+    "Files", "Playlists", "Custom 1", "Custom 2", "Custom 3"
+]
+
+# Per-slot text files written by VB Kontrol 1.0.x (compiled on first
+# use; most plugin runs never need it)
+LEGACY_FILE_PATTERN = r"^slot_(\d+)_(name|video)\.txt$"
+
+
+def default_slot_name(slot_num):
+    """Universal default name for a slot"""
+    if 1 <= slot_num <= len(DEFAULT_NAMES):
+        return DEFAULT_NAMES[slot_num - 1]
+    return f"Slot {slot_num}"
+
+
+def slot_count(addon):
+    """Number of slots configured in the addon settings"""
+    count = addon.getSettingInt('num_slots')
+    return min(max(count, 1), MAX_SLOTS) if count else DEFAULT_SLOTS
+
+
+def parse_slot_range(text, num_slots):
+    """Slot numbers for a range like "1-5, 8, 12-" (open ends allowed).
+
+    Numbers outside 1..num_slots are dropped. Raises ValueError on
+    anything that is not a number or range.
+    """
+    slots = set()
+    for part in text.replace(' ', '').split(','):
+        if not part:
+            continue
+        if '-' in part:
+            start, _, end = part.partition('-')
+            first = int(start) if start else 1
+            last = int(end) if end else num_slots
+        else:
+            first = last = int(part)
+        slots.update(range(max(first, 1), min(last, num_slots) + 1))
+    return sorted(slots)
+
+
+def format_slot_range(slots):
+    """Compact range text for slot numbers, e.g. "1-5,8"; parse_slot_range reads it back"""
+    parts = []
+    for slot in sorted(set(slots)):
+        if parts and parts[-1][1] == slot - 1:
+            parts[-1][1] = slot
+        else:
+            parts.append([slot, slot])
+    return ','.join(str(first) if first == last else f"{first}-{last}" for first, last in parts)
+
+
+class Slot:
+    """Compact per-slot record; unset fields are None"""
+
+    __slots__ = ('name', 'video', 'playlist')
+
+    def __init__(self, name=None, video=None, playlist=None):
+        self.name = name or None
+        self.video = video or None
+        self.playlist = playlist or None  # rotation playlist record, see playlist.build
+
+    def to_json(self):
+        return {key: getattr(self, key) for key in self.__slots__ if getattr(self, key)}
+
+
+def parse_slots(data):
+    """{slot_num: Slot} from the "slots" object of slots.json"""
+    return {int(key): Slot(value.get('name'), value.get('video'), value.get('playlist'))
+            for key, value in data.items()}
+
+
+def iter_clips(slots, num_slots):
+    """(slot_num, video path) for every video a slot up to `num_slots` can
+    show: its assigned video or each clip of its playlist"""
+    for num, slot in slots.items():
+        if num > num_slots:
+            continue
+        if slot.video:
+            yield num, slot.video
+        if slot.playlist:
+            for video_path in slot.playlist['videos']:
+                yield num, video_path
+
+
+def slots_to_json(slots):
+    """The "slots" object of slots.json for {slot_num: Slot}"""
+    return {str(num): slot.to_json() for num, slot in sorted(slots.items())
+            if slot.name or slot.video or slot.playlist}
+
+
+def copy_slots(slots):
+    """Independent copy of {slot_num: Slot}"""
+    return {num: Slot(slot.name, slot.video, slot.playlist) for num, slot in slots.items()}
+
+
+class SlotStore:
+    """In-memory view of slots.json, reloaded only when the file changes.
+
+    `slots` are those of the selected profile: the one bound to `skin`
+    when given, else the default slots (profile None).
+    """
+
+    def __init__(self, log=None, skin=None):
+        self._log = log
+        self.data_dir = xbmcvfs.translatePath(ADDON_DATA)
+        self.path = os.path.join(self.data_dir, STORE_FILE)
+        self.default_slots = {}  # slot_num -> Slot, for skins without a profile
+        self.profiles = {}  # profile name -> {'skins': [skin IDs], 'slots': {slot_num: Slot}}
+        self.profile = None  # name of the selected profile, None for the default slots
+        self.slots = self.default_slots  # slot_num -> Slot of the selected profile
+        self.generation = 0  # bumped whenever slots change
+        self._signature = None
+        self._transaction = False
+        self._dirty = False
+        self.load()
+        if skin:
+            self._select(self.profile_for_skin(skin))
+
+    def log(self, message, level=xbmc.LOGINFO):
+        if self._log:
+            self._log(message, level)
+
+    def _stat_signature(self):
+        """(mtime, size) of the store file, or None if it does not exist"""
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def load(self):
+        """Load the store from disk, migrating legacy txt files on first run"""
+        signature = self._stat_signature()
+        self.generation += 1
+        if signature is None:
+            self.default_slots, self.profiles = {}, {}
+            self._select(self.profile)
+            if self.migrate_legacy_files():
+                signature = self._stat_signature()
+            self._signature = signature
+            return
+
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.default_slots = parse_slots(data.get('slots', {}))
+            self.profiles = {
+                name: {'skins': list(record.get('skins', [])), 'slots': parse_slots(record.get('slots', {}))}
+                for name, record in data.get('profiles', {}).items()
+            }
+        except Exception as e:
+            self.log(f"Error reading slot store: {e}", xbmc.LOGERROR)
+            self.default_slots, self.profiles = {}, {}
+        # A deleted profile falls back to the default slots
+        self._select(self.profile)
+        self._signature = signature
+
+    def refresh(self):
+        """Reload if slots.json changed on disk. Returns True if reloaded"""
+        if self._stat_signature() == self._signature:
+            return False
+        self.load()
+        return True
+
+    def save(self):
+        """Write the store atomically (temp file + rename)"""
+        data = {'version': STORE_VERSION, 'slots': slots_to_json(self.default_slots)}
+        if self.profiles:
+            data['profiles'] = {
+                name: {'skins': record['skins'], 'slots': slots_to_json(record['slots'])}
+                for name, record in sorted(self.profiles.items())
+            }
+        try:
+            if not os.path.isdir(self.data_dir):
+                xbmcvfs.mkdirs(self.data_dir)
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=1)
+            os.replace(tmp_path, self.path)
+            self._signature = self._stat_signature()
+            return True
+        except Exception as e:
+            self.log(f"Error saving slot store: {e}", xbmc.LOGERROR)
+            return False
+
+    def migrate_legacy_files(self):
+        """Fold slot_N_name.txt / slot_N_video.txt into slots.json"""
+        try:
+            names = os.listdir(self.data_dir)
+        except OSError:
+            return False
+
+        legacy = []
+        for filename in names:
+            match = re.match(LEGACY_FILE_PATTERN, filename)
+            if not match:
+                continue
+            try:
+                with open(os.path.join(self.data_dir, filename), 'r', encoding='utf-8') as f:
+                    value = f.read().strip()
+            except Exception:
+                continue
+            legacy.append(filename)
+            if value:
+                setattr(self._slot(int(match.group(1))), match.group(2), value)
+
+        if not legacy:
+            return False
+
+        if not self.save():
+            return False
+
+        for filename in legacy:
+            try:
+                os.remove(os.path.join(self.data_dir, filename))
+            except OSError:
+                pass
+        self.log(f"Migrated {len(legacy)} legacy slot files into {STORE_FILE}")
+        return True
+
+    def _select(self, name):
+        if name not in self.profiles:
+            name = None
+        self.profile = name
+        self.slots = self.profiles[name]['slots'] if name else self.default_slots
+
+    def profile_names(self):
+        return sorted(self.profiles)
+
+    def profile_for_skin(self, skin):
+        """Name of the profile bound to a skin ID, or None for the default slots"""
+        for name, record in self.profiles.items():
+            if skin in record['skins']:
+                return name
+        return None
+
+    def profile_skins(self, name):
+        """Skin IDs bound to a profile"""
+        record = self.profiles.get(name)
+        return list(record['skins']) if record else []
+
+    def profile_json(self, name):
+        """A profile's slots as saved, to tell whether they changed"""
+        record = self.profiles.get(name)
+        return slots_to_json(record['slots'] if record else self.default_slots)
+
+    def use(self, name):
+        """Select another profile (None: the default slots), in memory only"""
+        self._select(name)
+        self.generation += 1
+
+    def create_profile(self, name, skin=None):
+        """New profile starting as a copy of the selected slots, optionally
+        bound to `skin`. Does not change the selection"""
+        self.profiles[name] = {
+            'skins': [],
+            'slots': copy_slots(self.slots),
+        }
+        if skin:
+            return self.bind_skin(name, skin)
+        return self._changed()
+
+    def bind_skin(self, name, skin):
+        """Use profile `name` (None: the default slots) whenever `skin` is active"""
+        for record in self.profiles.values():
+            if skin in record['skins']:
+                record['skins'].remove(skin)
+        if name:
+            self.profiles[name]['skins'].append(skin)
+        return self._changed()
+
+    def delete_profile(self, name):
+        """Remove a profile; its skins go back to the default slots"""
+        if name not in self.profiles:
+            return False
+        del self.profiles[name]
+        if self.profile == name:
+            self._select(None)
+        return self._changed()
+
+    def _slot(self, slot_num):
+        slot = self.slots.get(slot_num)
+        if slot is None:
+            slot = self.slots[slot_num] = Slot()
+        return slot
+
+    def get_name(self, slot_num):
+        """Custom name for a slot, or its universal default"""
+        slot = self.slots.get(slot_num)
+        return (slot and slot.name) or default_slot_name(slot_num)
+
+    def get_video(self, slot_num):
+        """Assigned video path for a slot, or None"""
+        slot = self.slots.get(slot_num)
+        return slot.video if slot else None
+
+    def videos(self, num_slots):
+        """{slot_num: video path} for assigned slots up to `num_slots`"""
+        return {num: slot.video for num, slot in self.slots.items()
+                if slot.video and num <= num_slots}
+
+    def get_playlist(self, slot_num):
+        """Rotation playlist record of a slot, or None"""
+        slot = self.slots.get(slot_num)
+        return slot.playlist if slot else None
+
+    def playlists(self, num_slots):
+        """{slot_num: playlist record} for slots up to `num_slots` that rotate"""
+        return {num: slot.playlist for num, slot in self.slots.items()
+                if slot.playlist and num <= num_slots}
+
+    def clips(self, num_slots):
+        """(slot_num, video path) for every video a selected slot up to
+        `num_slots` can show"""
+        return iter_clips(self.slots, num_slots)
+
+    def every_clip(self, num_slots):
+        """Every video path the slots up to `num_slots` of any profile can show"""
+        clips = set()
+        for slots in [self.default_slots] + [record['slots'] for record in self.profiles.values()]:
+            clips.update(video_path for _, video_path in iter_clips(slots, num_slots))
+        return clips
+
+    def match_names(self, pattern, num_slots):
+        """Slots up to `num_slots` whose name matches a wildcard pattern, e.g. "Custom*" """
+        pattern = pattern.lower()
+        return [i for i in range(1, num_slots + 1)
+                if fnmatch.fnmatchcase(self.get_name(i).lower(), pattern)]
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """Group changes into a single atomic write.
+
+        Changes made inside the block are saved once when it ends. If the
+        block raises, or the save fails (OSError), the changes are rolled
+        back and slots.json is left as it was.
+        """
+        if self._transaction:
+            # Nested blocks join the outer transaction
+            yield self
+            return
+        # Every profile and skin binding, not just the selected slots
+        default_slots = copy_slots(self.default_slots)
+        profiles = {name: {'skins': list(record['skins']), 'slots': copy_slots(record['slots'])}
+                    for name, record in self.profiles.items()}
+        selected = self.profile
+        self._transaction = True
+        self._dirty = False
+        try:
+            yield self
+            if self._dirty and not self.save():
+                raise OSError(f"Could not write {STORE_FILE}")
+        except BaseException:
+            self.default_slots = default_slots
+            self.profiles = profiles
+            self._select(selected)
+            self.generation += 1
+            raise
+        finally:
+            self._transaction = False
+            self._dirty = False
+
+    def _changed(self):
+        self.generation += 1
+        if self._transaction:
+            self._dirty = True
+            return True
+        return self.save()
+
+    def set_name(self, slot_num, name):
+        self._slot(slot_num).name = name or None
+        return self._changed()
+
+    def set_video(self, slot_num, video_path):
+        """Assign a single video, replacing a playlist"""
+        slot = self._slot(slot_num)
+        slot.video = video_path or None
+        slot.playlist = None
+        return self._changed()
+
+    def set_playlist(self, slot_num, playlist):
+        """Give a slot a rotation playlist in place of its video, or remove it with None"""
+        slot = self._slot(slot_num)
+        slot.playlist = playlist or None
+        if playlist:
+            slot.video = None
+        return self._changed()
+
+    def clear_video(self, slot_num):
+        """Remove a slot's video or playlist. Returns True if there was one"""
+        slot = self.slots.get(slot_num)
+        if not slot or not (slot.video or slot.playlist):
+            return False
+        slot.video = None
+        slot.playlist = None
+        return self._changed()
@@ -0,0 +1,254 @@
+# -*- coding: utf-8 -*-
+
+"""
+VB Kontrol - Local staging cache
+Mirrors assigned slot videos from a NAS or slow SD card into a fast local
+folder (tmpfs, internal storage) under a byte budget with LRU eviction.
+Copies are keyed by (path hash, size, mtime), so every slot pointing at
+the same file shares one copy.
+"""
+
+import collections
+import hashlib
+import os
+import queue
+import threading
+
+import xbmc
+import xbmcvfs
+
+DEFAULT_FOLDER = "special://temp/vbkontrol_staging/"
+COPY_CHUNK = 1024 * 1024
+
+
+def _source_stat(path):
+    """(size, mtime) of a local or VFS path"""
+    local = xbmcvfs.translatePath(path)
+    if os.path.exists(local):
+        st = os.stat(local)
+        return st.st_size, int(st.st_mtime)
+    st = xbmcvfs.Stat(path)
+    return st.st_size(), st.st_mtime()
+
+
+def staging_key(path, size, mtime):
+    path_hash = hashlib.sha1(path.encode('utf-8')).hexdigest()[:16]
+    return f"{path_hash}-{size}-{mtime}{os.path.splitext(path)[1].lower()}"
+
+
+class StagingCache:
+    """Byte-bounded LRU mirror of slot videos, filled by a background copier"""
+
+    def __init__(self, folder=DEFAULT_FOLDER, budget_bytes=1024 * 1024 * 1024, log=None, gate=None):
+        self._log = log
+        self._gate = gate  # IOGate pausing copies, e.g. during playback
+        self.folder = xbmcvfs.translatePath(folder or DEFAULT_FOLDER)
+        self.budget_bytes = budget_bytes
+
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict()  # key -> size, least recently used first
+        self._staged = {}     # source path -> staged copy
+        self._queue = queue.Queue()
+        self._queued = set()
+        self._pinned = set()  # sources assigned to a slot; evicted last
+        self._changed = set()
+        self._stopping = threading.Event()
+
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+
+        self._load()
+        self._thread = threading.Thread(target=self._run, name="VBKontrolStaging", daemon=True)
+        self._thread.start()
+
+    def log(self, message, level=xbmc.LOGINFO):
+        if self._log:
+            self._log(message, level)
+
+    @property
+    def used_bytes(self):
+        return sum(self._entries.values())
+
+    def _load(self):
+        """Pick up copies left by a previous run, oldest first"""
+        if not os.path.isdir(self.folder):
+            xbmcvfs.mkdirs(self.folder)
+            return
+        found = []
+        for name in os.listdir(self.folder):
+            path = os.path.join(self.folder, name)
+            if name.endswith('.part'):
+                os.remove(path)
+                continue
+            st = os.stat(path)
+            found.append((st.st_mtime, name, st.st_size))
+        for _, name, size in sorted(found):
+            self._entries[name] = size
+
+    def resolve(self, source, count=False):
+        """Staged copy of `source` if it is ready, else None.
+
+        With `count`, the lookup is recorded as a hit or miss; the service
+        passes it when it points a skin at a (new) video.
+        """
+        with self._lock:
+            staged = self._staged.get(source)
+            if staged:
+                key = os.path.basename(staged)
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    if count:
+                        self.hits += 1
+                        self.bytes_saved += self._entries[key]
+                    return staged
+                del self._staged[source]
+            if count:
+                self.misses += 1
+        return None
+
+    def request(self, source):
+        """Queue `source` to be mirrored (no-op if queued). A staged source is
+        checked again: if it was overwritten the copy is dropped and redone"""
+        with self._lock:
+            if source in self._queued:
+                return
+            self._queued.add(source)
+        self._queue.put(source)
+
+    def retain(self, sources):
+        """Drop queued copies of videos no longer assigned and pin the rest"""
+        with self._lock:
+            self._pinned = set(sources)
+            self._queued &= self._pinned
+
+    def take_changed(self):
+        """Sources whose staged copy became ready"""
+        with self._lock:
+            changed, self._changed = self._changed, set()
+        return changed
+
+    def stop(self):
+        self._stopping.set()
+        self._queue.put(None)
+
+    def _run(self):
+        while True:
+            source = self._queue.get()
+            if source is None:
+                return
+            with self._lock:
+                if source not in self._queued:
+                    continue
+                self._queued.discard(source)
+            if self._gate:
+                self._gate.wait()
+            try:
+                self._stage(source)
+            except Exception as e:
+                self.log(f"Staging failed for {source}: {e}", xbmc.LOGWARNING)
+
+    def _stage(self, source):
+        with self._lock:
+            staged = self._staged.get(source)
+        try:
+            size, mtime = _source_stat(source)
+        except Exception:
+            if staged:
+                # Source unreachable: serving the copy is what staging is for
+                return
+            raise
+        key = staging_key(source, size, mtime)
+        destination = os.path.join(self.folder, key)
+        if staged == destination:
+            return
+        if staged:
+            # The source changed size or mtime since it was copied
+            self._drop(source, staged)
+
+        with self._lock:
+            cached = key in self._entries
+        if not cached:
+            if size > self.budget_bytes or not self._make_room(size):
+                self.log(f"Not staging {os.path.basename(source)}: over the {self.budget_bytes} byte budget")
+                return
+            if not self._copy(source, destination):
+                return
+            self.log(f"Staged {os.path.basename(source)} ({size} bytes)")
+
+        with self._lock:
+            self._entries[key] = size
+            self._entries.move_to_end(key)
+            self._staged[source] = destination
+            self._changed.add(source)
+
+    def _drop(self, source, staged):
+        key = os.path.basename(staged)
+        with self._lock:
+            if self._staged.get(source) == staged:
+                del self._staged[source]
+                self._changed.add(source)
+            self._entries.pop(key, None)
+        try:
+            os.remove(staged)
+        except OSError:
+            pass
+        self.log(f"Dropped the staged copy of {os.path.basename(source)}: the source changed")
+
+    def _make_room(self, size):
+        """Evict least recently used copies until `size` more bytes fit.
+
+        Copies of videos still assigned to a slot are never evicted, so an
+        over-budget set of assignments does not thrash the cache.
+        """
+        with self._lock:
+            pinned_keys = {os.path.basename(path) for source, path in self._staged.items()
+                           if source in self._pinned}
+            order = [key for key in self._entries if key not in pinned_keys]
+            used = self.used_bytes
+            victims = []
+            for key in order:
+                if used + size <= self.budget_bytes:
+                    break
+                victims.append(key)
+                used -= self._entries[key]
+            if used + size > self.budget_bytes:
+                return False
+            for key in victims:
+                del self._entries[key]
+            for source in [s for s, path in self._staged.items() if os.path.basename(path) in victims]:
+                del self._staged[source]
+                self._changed.add(source)
+
+        for key in victims:
+            try:
+                os.remove(os.path.join(self.folder, key))
+            except OSError:
+                pass
+        return True
+
+    def _copy(self, source, destination):
+        tmp_path = destination + '.part'
+        src = xbmcvfs.File(source)
+        try:
+            with open(tmp_path, 'wb') as dst:
+                while not self._stopping.is_set():
+                    if self._gate:
+                        self._gate.wait()
+                    data = src.readBytes(COPY_CHUNK)
+                    if not data:
+                        break
+                    dst.write(data)
+            if self._stopping.is_set():
+                os.remove(tmp_path)
+                return False
+            os.replace(tmp_path, destination)
+            return True
+        except Exception:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+        finally:
+            src.close()
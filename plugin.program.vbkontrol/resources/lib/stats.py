@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+
+"""
+VB Kontrol - Service cycle statistics
+Times the phases of each service cycle (store read, existence probing,
+property diff, property publish) over a rolling window, and captures
+cProfile runs of the service loop on request
+"""
+
+import collections
+import contextlib
+import os
+import time
+
+PHASES = ('Store', 'Probe', 'Diff', 'Publish')
+
+# Service cycles profiled when the request does not say
+PROFILE_CYCLES = 100
+
+
+class CycleStats:
+    """Rolling p50/p95/max per phase of the service cycles"""
+
+    def __init__(self, window=500, clock=time.perf_counter):
+        self.samples = {phase: collections.deque(maxlen=window) for phase in PHASES}
+        self.cycles = 0
+        self._clock = clock
+        self._current = None  # phase -> seconds spent so far in the open cycle
+
+    @contextlib.contextmanager
+    def cycle(self):
+        """One service cycle; a cycle opened inside another joins it"""
+        if self._current is not None:
+            yield
+            return
+        self._current = {}
+        try:
+            yield
+        finally:
+            current, self._current = self._current, None
+            # Idle ticks that touched nothing are not samples
+            if current:
+                self.cycles += 1
+                for phase, seconds in current.items():
+                    self.samples[phase].append(seconds * 1000)
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """Add the time spent in the block to phase `name` of the open cycle"""
+        start = self._clock()
+        try:
+            yield
+        finally:
+            if self._current is not None:
+                self._current[name] = self._current.get(name, 0) + self._clock() - start
+
+    def percentile(self, phase, fraction):
+        ordered = sorted(self.samples[phase])
+        if not ordered:
+            return None
+        return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+    def summary(self):
+        """phase -> (p50, p95, max) in ms, for phases with samples"""
+        return {
+            phase: (self.percentile(phase, 0.5), self.percentile(phase, 0.95), max(samples))
+            for phase, samples in self.samples.items() if samples
+        }
+
+    def properties(self, slot_io, prefix='VBKontrol.Stats'):
+        """Window properties for the timings and the per-slot I/O counts"""
+        properties = {f'{prefix}.Cycles': str(self.cycles)}
+        for phase, (p50, p95, worst) in self.summary().items():
+            properties[f'{prefix}.{phase}.P50'] = f"{p50:.2f}"
+            properties[f'{prefix}.{phase}.P95'] = f"{p95:.2f}"
+            properties[f'{prefix}.{phase}.Max'] = f"{worst:.2f}"
+        properties[f'{prefix}.IO.Total'] = str(sum(slot_io.values()))
+        properties[f'{prefix}.IO.Slots'] = str(len(slot_io))
+        if slot_io:
+            slot, ops = slot_io.most_common(1)[0]
+            properties[f'{prefix}.IO.BusiestSlot'] = str(slot)
+            properties[f'{prefix}.IO.BusiestSlotOps'] = str(ops)
+        return properties
+
+    def describe(self, slot_io, top=5):
+        """One log line with the timings and the busiest slots"""
+        phases = ', '.join(
+            f"{phase} {p50:.2f}/{p95:.2f}/{worst:.2f}"
+            for phase, (p50, p95, worst) in self.summary().items()
+        )
+        busiest = ', '.join(f"slot {slot}: {ops}" for slot, ops in slot_io.most_common(top))
+        return (f"{self.cycles} cycles, ms p50/p95/max: {phases or 'no samples'}; "
+                f"I/O {sum(slot_io.values())} ops on {len(slot_io)} slots"
+                + (f" ({busiest})" if busiest else ""))
+
+
+class ProfileCapture:
+    """cProfile of the next `cycles` service cycles, saved to a folder"""
+
+    def __init__(self, cycles, folder):
+        import cProfile
+        self.remaining = max(cycles, 1)
+        self.folder = folder
+        self.profiler = cProfile.Profile()
+
+    @property
+    def done(self):
+        return self.remaining <= 0
+
+    @contextlib.contextmanager
+    def cycle(self):
+        self.profiler.enable()
+        try:
+            yield
+        finally:
+            self.profiler.disable()
+            self.remaining -= 1
+
+    def save(self):
+        """Write profile-<time>.prof (pstats) and a .txt summary. Returns the .prof path"""
+        import pstats
+        base = os.path.join(self.folder, time.strftime("profile-%Y%m%d-%H%M%S"))
+        self.profiler.dump_stats(base + '.prof')
+        with open(base + '.txt', 'w', encoding='utf-8') as f:
+            pstats.Stats(self.profiler, stream=f).sort_stats('cumulative').print_stats(40)
+        return base + '.prof'
@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+
+"""
+VB Kontrol - Resolution variants
+A slot video can come in several resolutions side by side in
+video_backgrounds, told apart by a filename suffix: rain.mp4,
+rain_1080p.mp4, rain-720p.mkv... The service publishes the heaviest
+variant the device profile allows, and steps down to lighter ones when
+background playback shows the device cannot keep up.
+"""
+
+import collections
+import os
+import re
+
+import xbmc
+import xbmcvfs
+
+# rain_720p, rain-1080p, rain.2160p, "rain 480p"
+VARIANT_PATTERN = r'^(.+?)[ ._-](\d{3,4})p$'
+
+# Device profile setting -> tallest variant to publish; None = no limit,
+# 0 = the screen height
+PROFILE_HEIGHTS = [0, None, 2160, 1440, 1080, 720, 480]
+
+# Software decoding above this height is taken as a sign to step down
+SOFTWARE_DECODE_MAX_HEIGHT = 1080
+
+
+def split_variant(path):
+    """(family key, height from the suffix or None) of a real video path"""
+    folder, name = os.path.split(path)
+    stem = os.path.splitext(name)[0]
+    match = re.match(VARIANT_PATTERN, stem, re.IGNORECASE)
+    if match:
+        return os.path.join(folder, match.group(1)).lower(), int(match.group(2))
+    return os.path.join(folder, stem).lower(), None
+
+
+def _number(label):
+    try:
+        return float(label.split()[0])
+    except (ValueError, IndexError):
+        return None
+
+
+def profile_height(profile):
+    """Tallest variant the device profile setting allows, None for no limit"""
+    height = PROFILE_HEIGHTS[profile] if 0 <= profile < len(PROFILE_HEIGHTS) else 0
+    if height == 0:
+        screen = _number(xbmc.getInfoLabel('System.ScreenHeight'))
+        return int(screen) if screen else None
+    return height
+
+
+class DecodeMonitor:
+    """Decode-performance readings of the playing video, from Kodi info labels"""
+
+    def __init__(self, window=10):
+        self.samples = collections.deque(maxlen=window)  # share of frames not rendered
+        self.decoder = ''
+        self.hardware = None
+
+    def reset(self):
+        self.samples.clear()
+
+    def sample(self):
+        """Take one reading; call every few seconds while the video plays"""
+        self.decoder = xbmc.getInfoLabel('Player.Process(videodecoder)')
+        hardware = xbmc.getInfoLabel('Player.Process(videohwdecoder)')
+        self.hardware = hardware.lower() == 'true' if hardware else None
+        # Frames the renderer dropped show up as a frame rate below the video's
+        video_fps = _number(xbmc.getInfoLabel('Player.Process(videofps)'))
+        render_fps = _number(xbmc.getInfoLabel('System.FPS'))
+        if video_fps and render_fps is not None:
+            self.samples.append(max(video_fps - render_fps, 0.0) / video_fps)
+
+    def dropped(self):
+        """Average share of dropped frames over a full window, else None"""
+        if len(self.samples) < self.samples.maxlen:
+            return None
+        return sum(self.samples) / len(self.samples)
+
+
+class VariantSelector:
+    """Picks the variant of each video to publish"""
+
+    def __init__(self, max_height=None, measure=True, drop_threshold=0.05, log=None):
+        self.ceiling = max_height  # tallest variant allowed, None = any
+        self.measure = measure
+        self.drop_threshold = drop_threshold
+        self._log = log
+        self.monitor = DecodeMonitor()
+        self.families = {}  # family key -> [(height, real path)], tallest first
+        self.generation = 0  # bumped whenever a selection may have changed
+        self._selected = {}  # video path -> (height, path) picked for it, or None
+
+    def log(self, message, level=xbmc.LOGINFO):
+        if self._log:
+            self._log(message, level)
+
+    def rebuild(self, entries):
+        """Group media index entries (real path, info) into variant families"""
+        families = {}
+        for path, info in entries:
+            key, height = split_variant(path)
+            height = height or info.get('height')
+            if height:
+                families.setdefault(key, []).append((int(height), path))
+        # A video without siblings has nothing to choose from
+        families = {key: sorted(variants, reverse=True)
+                    for key, variants in families.items() if len(variants) > 1}
+        if families != self.families:
+            self.families = families
+            self._changed()
+
+    def _changed(self):
+        self.generation += 1
+        self._selected = {}
+
+    def variants(self, video_path):
+        """[(height, real path)] of `video_path` and its siblings, tallest first"""
+        if not self.families:
+            return []
+        return self.families.get(split_variant(xbmcvfs.translatePath(video_path))[0], [])
+
+    def pick(self, video_path):
+        """(height, path) of the tallest variant under the ceiling (else the
+        lightest), or None if `video_path` has no variants"""
+        if video_path not in self._selected:
+            variants = self.variants(video_path)
+            picked = None
+            if variants:
+                picked = next((variant for variant in variants
+                               if self.ceiling is None or variant[0] <= self.ceiling), variants[-1])
+            self._selected[video_path] = picked
+        return self._selected[video_path]
+
+    def select(self, video_path):
+        """Path to publish for an assigned video"""
+        picked = self.pick(video_path)
+        return picked[1] if picked else video_path
+
+    def observe(self, playing_path):
+        """Sample decoding of the background video. True if the ceiling dropped"""
+        if not self.measure:
+            return False
+        variants = self.variants(playing_path)
+        if not variants:
+            return False
+        heights = [height for height, _ in variants]
+        playing = next((height for height, path in variants
+                        if path == xbmcvfs.translatePath(playing_path)), None)
+        if playing is None or playing == heights[-1]:
+            # Unknown or already the lightest variant: nothing to step down to
+            return False
+
+        self.monitor.sample()
+        name = os.path.basename(playing_path)
+        if self.monitor.hardware is False and playing > SOFTWARE_DECODE_MAX_HEIGHT:
+            reason = f"software decoding ({self.monitor.decoder or 'unknown decoder'})"
+        else:
+            dropped = self.monitor.dropped()
+            if dropped is None or dropped <= self.drop_threshold:
+                return False
+            reason = f"{dropped:.0%} dropped frames ({self.monitor.decoder or 'unknown decoder'})"
+
+        self.ceiling = max(height for height in heights if height < playing)
+        self._changed()
+        self.monitor.reset()
+        self.log(f"{name} at {playing}p: {reason}, switching to {self.ceiling}p variants")
+        return True
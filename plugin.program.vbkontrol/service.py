@@ -10,25 +10,250 @@ import xbmc
 import xbmcaddon
 import xbmcgui
 import xbmcvfs
+import collections
+import contextlib
 import os
 import time
 
+from resources.lib.active import HOME_WINDOW, ActiveMap
+from resources.lib.events import CANCEL_FASTSTART, PROFILE_SERVICE, PROFILES_CHANGED, SLOTS_CHANGED, parse_notification
+from resources.lib.faststart import FaststartManager
+from resources.lib.focus import DwellScheduler, FocusTracker
+from resources.lib.library import LibraryPages
+from resources.lib.loopserver import LoopServer
+from resources.lib.mediainfo import MediaIndex, is_heavy
+from resources.lib.player import LoopPlayer
+from resources.lib.playlist import Rotation
+from resources.lib.prefetch import Prefetcher
+from resources.lib.staging import StagingCache
+from resources.lib.probe import ExistenceProbe
+from resources.lib.properties import PropertyPublisher
+from resources.lib.scheduler import AdaptiveScheduler, PlaybackWatcher
+from resources.lib.slotstore import ADDON_DATA, SlotStore, slot_count
+from resources.lib.stats import PROFILE_CYCLES, CycleStats, ProfileCapture
+from resources.lib.variants import VariantSelector, profile_height, split_variant
+
+# Slots whose video existence is revalidated per safety-net refresh
+SWEEP_BATCH = 100
+
+# Loop period while background I/O is paused
+PAUSED_TICK = 0.5
+
+# Loop period away from Home with no dwell pending: nothing needs the short tick
+IDLE_TICK = 1.0
+
+# Seconds between decode-performance samples of the background video
+DECODE_SAMPLE_INTERVAL = 2.0
+
+class ServiceMonitor(xbmc.Monitor):
+    """Receives change notifications broadcast by the plugin"""
+    def __init__(self, service):
+        super().__init__()
+        self.service = service
+        self.skin = xbmc.getSkinDir()
+    
+    def skin_changed(self):
+        """The new skin ID if Kodi switched skins since the last call, else None.
+        
+        Kodi broadcasts no notification for a skin change, so the monitor
+        compares xbmc.getSkinDir() (an in-memory lookup) every service tick.
+        """
+        skin = xbmc.getSkinDir()
+        if skin == self.skin:
+            return None
+        self.skin = skin
+        return skin
+    
+    def onNotification(self, sender, method, data):
+        message, payload = parse_notification(sender, method, data)
+        if message == SLOTS_CHANGED:
+            try:
+                slots = [int(slot) for slot in payload.get('slots', [])]
+            except (ValueError, TypeError):
+                return
+            with self.service.cycle():
+                self.service.update_slots(slots, reload=True)
+        elif message == CANCEL_FASTSTART and self.service.faststart:
+            self.service.faststart.cancel()
+        elif message == PROFILE_SERVICE:
+            self.service.start_profile(payload.get('cycles'))
+        elif message == PROFILES_CHANGED:
+            with self.service.cycle():
+                self.service.refresh(reload=True)
+    
+    def onScreensaverActivated(self):
+        self.service.scheduler.screensaver = True
+    
+    def onScreensaverDeactivated(self):
+        self.service.scheduler.screensaver = False
+
+class ProfileState:
+    """What the service keeps for one slot profile; switching skins swaps it as a whole"""
+    def __init__(self, name, rotation):
+        self.name = name  # None for the default slots
+        self.properties = None  # complete base and slot property map
+        self.revision = None  # the profile's slots the map was compiled from
+        self.slot_keys = {}  # slot_num -> property keys last published for it
+        self.slot_names = {}  # lowercase slot name -> slot_num
+        self.slot_name_of = {}  # slot_num -> its key in slot_names
+        self.loop_paths = {}  # slot_num -> file the loop server serves for it
+        self.rotation = rotation  # cursors of the profile's playlists
+
 class VBKontrolService:
-    def __init__(self):
+    def __init__(self, clock=time.monotonic, wall_clock=time.time):
+        self.clock = clock
         self.addon = xbmcaddon.Addon()
         self.addon_name = self.addon.getAddonInfo('name')
         self.addon_version = self.addon.getAddonInfo('version')
-        self.monitor = xbmc.Monitor()
+        self.monitor = ServiceMonitor(self)
         self.running = False
-        self.num_slots = 20
+        self.num_slots = slot_count(self.addon)
+        
+        # Full refresh is only a safety net; changes arrive as notifications.
+        # The scheduler stretches it while idle and pauses all background
+        # I/O during foreground playback and the screensaver
+        self.scheduler = AdaptiveScheduler(
+            interval=max(self.addon.getSettingInt('poll_interval'), 10),
+            jitter=max(self.addon.getSettingInt('poll_jitter'), 0),
+            log=self.log,
+            clock=clock
+        )
+        gate = self.scheduler.gate
+        
+        # Phase timings, published and (with debug logging) logged periodically
+        self.debug_logging = self.addon.getSettingBool('debug_logging')
+        self.stats_interval = max(self.addon.getSettingInt('stats_interval'), 10)
+        self.stats = CycleStats()
+        self.capture = None  # ProfileCapture requested from the plugin
+        self._cycle_depth = 0
         
         # Set up folders
         self.setup_folders()
+        self.store = SlotStore(log=self.log, skin=self.monitor.skin)
+        self.publisher = PropertyPublisher(stats=self.stats)
+        self.probe = ExistenceProbe(
+            timeout=max(self.addon.getSettingInt('probe_timeout'), 1),
+            ttl=max(self.addon.getSettingInt('probe_cache_ttl'), 10),
+            log=self.log,
+            clock=clock,
+            gate=gate
+        )
+        # Metadata of the clips, and the sorted pages the plugin's video
+        # picker reads, both updated when the folder changes
+        self.media = MediaIndex(log=self.log, gate=gate, library=LibraryPages(log=self.log))
+        
+        # Resolution variants (rain_1080p.mp4, rain_720p.mp4...) picked by
+        # device profile and by decode performance during background playback
+        self.variants = VariantSelector(
+            max_height=profile_height(self.addon.getSettingInt('variant_profile')),
+            measure=self.addon.getSettingBool('variant_measure'),
+            drop_threshold=max(self.addon.getSettingInt('variant_drop_threshold'), 1) / 100.0,
+            log=self.log
+        )
+        self.variants.rebuild(self.media.items())
+        self.next_decode_sample = 0
+        if self.variants.families:
+            limit = f"{self.variants.ceiling}p" if self.variants.ceiling else "any resolution"
+            self.log(f"{len(self.variants.families)} videos have resolution variants, publishing up to {limit}")
+        
+        # Optional moov-first copies of assigned MP4 backgrounds
+        self.faststart = None
+        if self.addon.getSettingBool('faststart_enabled'):
+            self.faststart = FaststartManager(log=self.log, gate=gate)
+        
+        # Optional local mirror of slot videos on fast storage
+        self.staging = None
+        if self.addon.getSettingBool('staging_enabled'):
+            self.staging = StagingCache(
+                folder=self.addon.getSetting('staging_folder'),
+                budget_bytes=max(self.addon.getSettingInt('staging_budget_mb'), 16) * 1024 * 1024,
+                log=self.log,
+                gate=gate
+            )
+        
+        # Optional read-ahead of the videos next to the focused menu item
+        self.prefetcher = None
+        if self.addon.getSettingBool('prefetch_enabled'):
+            self.prefetcher = Prefetcher(
+                head_bytes=max(self.addon.getSettingInt('prefetch_mb'), 1) * 1024 * 1024,
+                budget_per_minute=max(self.addon.getSettingInt('prefetch_budget_mb'), 1) * 1024 * 1024,
+                log=self.log,
+                clock=clock,
+                gate=gate
+            )
+        
+        # Optional HTTP server on 127.0.0.1 serving slot videos from memory
+        self.loop_server = None
+        if self.addon.getSettingBool('loop_server_enabled'):
+            try:
+                self.loop_server = LoopServer(
+                    port=self.addon.getSettingInt('loop_server_port'),
+                    cache_bytes=max(self.addon.getSettingInt('loop_server_cache_mb'), 16) * 1024 * 1024,
+                    loop_ts=self.addon.getSettingBool('video_loop'),
+                    log=self.log
+                )
+                self.log(f"Loop server listening on 127.0.0.1:{self.loop_server.port}")
+            except OSError as e:
+                self.log(f"Could not start the loop server: {e}", xbmc.LOGERROR)
+        
+        # Optional looping playback of the focused slot's video behind Home
+        self.player = None
+        if self.addon.getSettingBool('background_playback'):
+            self.player = LoopPlayer(
+                loop=self.addon.getSettingBool('video_loop'),
+                volume=self.addon.getSettingInt('video_volume'),
+                log=self.log,
+                clock=clock
+            )
+        self.watcher = PlaybackWatcher(self.scheduler, is_background=self.is_background_video)
+        
+        # Focus tracking drives VBKontrol.Current.*, prefetch, staging
+        # statistics and playback. Switches wait until focus has rested for
+        # dwell_ms, so scrolling through the menu does not open every video
+        self.focus = FocusTracker(
+            container_id=self.addon.getSettingInt('menu_container_id'),
+            depth=max(self.addon.getSettingInt('prefetch_neighbours'), 1)
+        )
+        dwell = max(self.addon.getSettingInt('dwell_ms'), 0) / 1000.0
+        self.dwell = DwellScheduler(dwell=dwell, clock=clock)
+        # Loop period on Home: fine enough to honour the dwell time within a few ticks
+        self.tick = min(max(dwell / 4, 0.05), 0.25)
+        self.sweep_slot = 1  # next slot the safety-net refresh revalidates
+        self.retained_generation = None  # store/variant generations background jobs were pruned at
+        self._path_index = {}
+        self._path_index_generation = None
+        self.group_properties = {}  # group -> properties published outside slot updates
+        
+        # Window / home menu item -> slot table behind VBKontrol.Active.*
+        try:
+            self.active_map = ActiveMap(self.addon.getSetting('active_window_map'))
+        except ValueError as e:
+            self.log(f"Invalid active background rule '{e}', using the defaults", xbmc.LOGERROR)
+            self.active_map = ActiveMap()
+        self.active_slot = None
+        self.slot_names_generation = 0  # bumped whenever a slot name changes
+        self.active_map_generation = None
+        
+        # Playlists rotate on the wall clock since schedules follow the time of day
+        self.warm_ahead = max(self.addon.getSettingInt('playlist_warm_seconds'), 10)
+        self.wall_clock = wall_clock
+        
+        # Slot profiles bound to skins. Each keeps a precompiled property
+        # map, so a skin change is one diff against what is published
+        self.profile_states = {}  # profile name (None: default slots) -> ProfileState
+        self.profile_switches = 0
+        self.profile_switch_ms = None  # duration of the last switch
+        self.enter_profile(self.store.profile)
+        if self.loop_server:
+            self.loop_server.paths = self.loop_paths
         
         self.log(f"VB Kontrol v{self.addon_version} - Universal Video Background Service")
     
     def log(self, message, level=xbmc.LOGINFO):
         """Log messages with VBKontrol prefix"""
+        # Debug Logging shows our debug messages without Kodi's debug log
+        if level == xbmc.LOGDEBUG and self.debug_logging:
+            level = xbmc.LOGINFO
         xbmc.log(f"[VBKontrol Service] {message}", level)
     
     def setup_folders(self):
@@ -48,90 +273,662 @@ class VBKontrolService:
     
     def get_slot_name(self, slot_num):
         """Get the name for a slot - with universal defaults"""
+        return self.store.get_name(slot_num)
+    
+    def slot_source(self, slot_num):
+        """Video a slot shows now: the active clip of its playlist, else its assigned video"""
+        return self.rotation.video(slot_num) or self.store.get_video(slot_num)
+    
+    def get_slot_video(self, slot_num):
+        """Get the video file for a slot, unless it is known to be missing"""
+        video_path = self.slot_source(slot_num)
+        # Cached answer only - never stats storage from the service loop
+        if video_path and self.probe.exists(video_path) is not False:
+            return video_path
+        return None
+    
+    def assigned_videos(self):
+        """Every video path currently assigned to a slot of any profile, playlist clips included"""
+        return self.store.every_clip(self.num_slots)
+    
+    def sync_rotation(self):
+        """Follow playlist changes in slots.json"""
+        if self.rotation_generation != self.store.generation:
+            self.rotation.load(self.store.playlists(self.num_slots))
+            self.rotation_generation = self.store.generation
+    
+    def enter_profile(self, name):
+        """Point the per-profile state (slot lookups, published keys, playlist
+        cursors) and the store at profile `name`, in memory only"""
+        state = self.profile_states.get(name)
+        if state is None:
+            state = self.profile_states[name] = ProfileState(
+                name, Rotation(warm_ahead=self.warm_ahead, clock=self.wall_clock))
+        self.store.use(name)
+        self.profile_state = state
+        self.slot_keys = state.slot_keys
+        self.slot_names = state.slot_names
+        self.slot_name_of = state.slot_name_of
+        self.loop_paths = state.loop_paths
+        self.rotation = state.rotation
+        self.rotation_generation = None
+        # The active background follows the profile's slot names
+        self.slot_names_generation += 1
+    
+    def compile_profile(self, name):
+        """Build the complete property map of a profile that is not active"""
+        active = self.profile_state.name
+        self.enter_profile(name)
         try:
-            # Try to get custom name first using special:// path
-            custom_name_path = f"special://home/userdata/addon_data/plugin.program.vbkontrol/slot_{slot_num}_name.txt"
-            custom_name = xbmcvfs.translatePath(custom_name_path)
-            if xbmcvfs.exists(custom_name):
-                with open(custom_name, 'r', encoding='utf-8') as f:
-                    name = f.read().strip()
-                    if name:
-                        return name
-        except:
-            pass
-        
-        # Return universal defaults if no custom name
-        defaults = [
-            "Home", "Movies", "TV Shows", "Music", "Pictures", 
-            "Videos", "Favourites", "Add-ons", "Settings", "Weather",
-            "Programs", "Games", "System", "Live TV", "Radio",
-            "Files", "Playlists", "Custom 1", "Custom 2", "Custom 3"
-        ]
-        
-        if 1 <= slot_num <= len(defaults):
-            return defaults[slot_num - 1]
+            self.sync_rotation()
+            self.profile_state.properties = self.build_profile_properties()
+            self.profile_state.revision = self.store.profile_json(name)
+        finally:
+            self.enter_profile(active)
+    
+    def compile_profiles(self):
+        """Precompile the maps of the inactive profiles saved since they were last compiled"""
+        names = [None] + self.store.profile_names()
+        for name in list(self.profile_states):
+            if name not in names and name != self.profile_state.name:
+                del self.profile_states[name]
+        for name in names:
+            if name == self.profile_state.name:
+                continue
+            state = self.profile_states.get(name)
+            if state is None or state.revision != self.store.profile_json(name):
+                self.compile_profile(name)
+                self.log(f"Compiled slot profile {name or 'Default'}", xbmc.LOGDEBUG)
+    
+    def sync_profiles(self):
+        """After slots.json was reloaded: recompile the profiles that changed and
+        follow the profile bound to the skin. Returns True if it switched"""
+        self.compile_profiles()
+        target = self.store.profile_for_skin(self.monitor.skin)
+        if target == self.profile_state.name and self.store.profile == target:
+            return False
+        self.switch_profile(target)
+        return True
+    
+    def update_skin(self):
+        """Switch slot profiles when Kodi changes skins"""
+        skin = self.monitor.skin_changed()
+        if skin is None:
+            return
+        target = self.store.profile_for_skin(skin)
+        self.log(f"Skin changed to {skin}, slot profile {target or 'Default'}")
+        if target != self.profile_state.name:
+            self.switch_profile(target)
+    
+    def switch_profile(self, name):
+        """Publish another profile's precompiled map in one diff-applied pass"""
+        try:
+            started = time.perf_counter()
+            previous = self.profile_state
+            state = self.profile_states.get(name)
+            if state is None or state.properties is None or state.revision is None:
+                # Never compiled, or outdated by probe answers since
+                self.compile_profile(name)
+                state = self.profile_states[name]
+            self.enter_profile(name)
+            if self.loop_server:
+                self.loop_server.paths = self.loop_paths
+            writes = self.publisher.publish(state.properties, replaces=previous.properties or ())
+            self.profile_switch_ms = (time.perf_counter() - started) * 1000
+            self.profile_switches += 1
+            self.log(f"Switched to slot profile {name or 'Default'} in {self.profile_switch_ms:.1f} ms: "
+                     f"{writes} properties written")
+            
+            # What the map cannot hold: the previous profile's revision,
+            # playlist cursors, focus, background jobs and the counters
+            if previous.name in self.profile_states and previous is not state:
+                previous.revision = self.store.profile_json(previous.name)
+            self.sync_rotation()
+            self.update_current()
+            self.update_active(force=True)
+            self.request_background_jobs(range(1, self.num_slots + 1))
+            self.publish_group('stats', self.stats_properties())
+        except Exception as e:
+            self.log(f"Error switching to slot profile {name or 'Default'}: {e}", xbmc.LOGERROR)
+    
+    def request_background_jobs(self, slots, upcoming=False):
+        """Queue faststart and staging work for the given slots and drop stale jobs.
+        With `upcoming`, for the clip their playlists switch to next"""
+        # Pruning looks at every assignment, so only do it when they changed
+        generation = (self.store.generation, self.variants.generation)
+        retain = self.retained_generation != generation
+        self.retained_generation = generation
+        # Work on the variant that is published, not the one assigned
+        source = self.rotation.upcoming if upcoming else self.slot_source
+        videos = [self.variants.select(video) for video in map(source, slots) if video]
+        if retain:
+            assigned = {self.variants.select(video) for video in self.assigned_videos()}
+        
+        if self.faststart:
+            for video_path in videos:
+                self.faststart.request(video_path)
+            if retain:
+                self.faststart.retain(assigned)
+        
+        if self.staging:
+            # Stage whatever skins would otherwise open, e.g. the faststart copy
+            resolve = self.faststart.resolve if self.faststart else (lambda path: path)
+            for video_path in videos:
+                self.staging.request(resolve(video_path))
+            if retain:
+                self.staging.retain({resolve(video) for video in assigned})
+    
+    def warm_upcoming(self, slots):
+        """Get the next clip of playlist slots ready before they switch to it"""
+        self.request_background_jobs(slots, upcoming=True)
+        upcoming = [video for video in map(self.rotation.upcoming, slots) if video]
+        for video_path in upcoming:
+            # Refreshes a stale existence answer before the switch relies on it
+            self.probe.exists(video_path)
+        if self.prefetcher:
+            self.prefetcher.warm([self.resolve_video(video_path) for video_path in upcoming])
+        self.log(f"Warming the next playlist clip of slots {slots}", xbmc.LOGDEBUG)
+    
+    def update_slot_name(self, slot_num, slot_name):
+        """Keep the name -> slot lookup in step with slot renames"""
+        name = slot_name.lower()
+        old = self.slot_name_of.get(slot_num)
+        if old == name:
+            return
+        self.slot_names[name] = slot_num
+        self.slot_name_of[slot_num] = name
+        if old is not None and self.slot_names.get(old) == slot_num:
+            # Another slot may share the old name (the last one wins, as
+            # when the names are first built)
+            others = [i for i, key in self.slot_name_of.items() if key == old]
+            if others:
+                self.slot_names[old] = max(others)
+            else:
+                del self.slot_names[old]
+        self.slot_names_generation += 1
+    
+    def resolve_video(self, video_path, count=False):
+        """Path skins should open for an assigned video: staged, optimized or as-is"""
+        video_path = self.variants.select(video_path)
+        if self.faststart:
+            video_path = self.faststart.resolve(video_path)
+        if self.staging:
+            video_path = self.staging.resolve(video_path, count=count) or video_path
+        return video_path
+    
+    def playable_video(self, slot_num):
+        """The path a skin will actually open for a slot, or None"""
+        slot_video = self.get_slot_video(slot_num)
+        return self.resolve_video(slot_video) if slot_video else None
+    
+    def slot_url(self, slot_num, video_path):
+        """What skins and the loop player open for a slot playing `video_path`:
+        its loop server URL when the server runs, else the path itself"""
+        if self.loop_server and video_path:
+            return self.loop_server.url(slot_num, video_path, self.loop_paths)
+        return video_path
+    
+    def update_focus(self):
+        """Follow the focused menu item: debounce it and prefetch its neighbours"""
+        focused = self.focus.poll()
+        if focused is None:
+            return
+        label, neighbours = focused
+        current = self.slot_names.get(label.lower()) if label else None
+        self.dwell.propose(current)
+        if not label:
+            if self.prefetcher:
+                self.prefetcher.cancel()
+            return
+        
+        # The skin is about to open this slot's video
+        if self.staging and current and self.get_slot_video(current):
+            self.resolve_video(self.get_slot_video(current), count=True)
+        
+        if not self.prefetcher:
+            return
+        neighbour_slots = [self.slot_names.get(name.lower()) for name in neighbours]
+        if not neighbours and current:
+            # Skin gave no neighbour labels; assume menu order follows slot order
+            neighbour_slots = [current + offset for offset in self.focus.neighbour_offsets()]
+        
+        self.prefetcher.focus(
+            self.playable_video(current) if current else None,
+            [self.playable_video(i) for i in neighbour_slots if i and 1 <= i <= self.num_slots]
+        )
+    
+    def is_background_video(self, path):
+        """True if `path` is the loop player's own video rather than foreground media"""
+        target = self.player.target if self.player else None
+        return bool(target) and path in (target, xbmcvfs.translatePath(target))
+    
+    def update_current(self):
+        """Publish VBKontrol.Current.* once focus has rested on a new slot"""
+        slot = self.dwell.current
+        properties = {}
+        video = self.playable_video(slot) if slot else None
+        if video:
+            properties = {
+                'VBKontrol.Current.Video': self.slot_url(slot, video),
+                'VBKontrol.Current.Slot': str(slot),
+                'VBKontrol.Current.Name': self.get_slot_name(slot),
+            }
+        self.publish_group('current', properties)
+    
+    def update_active(self, force=False):
+        """Publish VBKontrol.Active.* for the window Kodi shows: the focused
+        slot on Home, else the slot the active map gives the window"""
+        if self.active_map_generation != self.slot_names_generation:
+            self.active_map.rebuild(self.slot_names)
+            self.active_map_generation = self.slot_names_generation
+            force = True
+        window = xbmcgui.getCurrentWindowId()
+        if window == HOME_WINDOW:
+            slot = self.dwell.current or self.active_map.lookup(window)
         else:
-            return f"Slot {slot_num}"
+            content = None
+            if window in self.active_map.content_windows:
+                content = xbmc.getInfoLabel('Container.Content').lower() or None
+            slot = self.active_map.lookup(window, content)
+        if slot == self.active_slot and not force:
+            return
+        self.active_slot = slot
+        properties = {}
+        video = self.playable_video(slot) if slot else None
+        if video:
+            properties = {
+                'VBKontrol.Active.Video': self.slot_url(slot, video),
+                'VBKontrol.Active.Slot': str(slot),
+                'VBKontrol.Active.Name': self.get_slot_name(slot),
+            }
+        self.publish_group('active', properties)
     
-    def get_slot_video(self, slot_num):
-        """Get the video file for a slot"""
+    def update_background(self):
+        """Point the loop player at the current slot's video while Home is active"""
+        self.player.tick()
+        
+        slot_video = target = None
+        if self.focus.label:
+            # Fall back to the first slot when the focused item is not a slot
+            slot = self.dwell.current or 1
+            slot_video = self.get_slot_video(slot)
+            target = self.slot_url(slot, self.resolve_video(slot_video)) if slot_video else None
+        if target != self.player.target:
+            # Decode readings belong to the video they were taken from
+            self.variants.monitor.reset()
+        self.player.set_target(target)
+        
+        now = self.clock()
+        if (self.player.active and slot_video and not self.scheduler.paused
+                and now >= self.next_decode_sample):
+            self.next_decode_sample = now + DECODE_SAMPLE_INTERVAL
+            if self.variants.observe(self.variants.select(slot_video)):
+                self.update_slots(sorted({i for i, video_path in self.store.clips(self.num_slots)
+                                      if self.variants.pick(video_path)}))
+        
+        if self.player.updated:
+            self.player.updated = False
+            self.publish_group('loop', self.player.histogram.properties())
+    
+    def publish_group(self, group, properties):
+        """Publish a self-contained group of properties, e.g. loop statistics"""
+        self.publisher.publish(properties, replaces=self.group_properties.get(group, {}))
+        self.group_properties[group] = properties
+    
+    def path_index(self):
+        """Video path (as stored, translated and the published variant) -> slots,
+        rebuilt when the store or the variants change"""
+        generation = (self.store.generation, self.variants.generation)
+        if self._path_index_generation != generation:
+            index = {}
+            for i, video_path in self.store.clips(self.num_slots):
+                for path in {video_path, xbmcvfs.translatePath(video_path), self.variants.select(video_path)}:
+                    slots = index.setdefault(path, [])
+                    if i not in slots:
+                        slots.append(i)
+            self._path_index = index
+            self._path_index_generation = generation
+        return self._path_index
+    
+    def slots_in_families(self, paths):
+        """Slots whose video shares a variant family (rain, rain_720p...) with one of `paths`"""
+        keys = {split_variant(path)[0] for path in paths}
+        return sorted({i for i, video_path in self.store.clips(self.num_slots)
+                       if split_variant(xbmcvfs.translatePath(video_path))[0] in keys})
+    
+    def slots_for_paths(self, paths):
+        """Slots whose video is one of `paths` (as stored, translated or optimized)"""
+        if self.faststart:
+            paths = paths | self.faststart.sources(paths)
+        index = self.path_index()
+        slots = set()
+        for path in paths:
+            slots.update(index.get(path, ()))
+        return sorted(slots)
+    
+    def build_slot_properties(self, slot_num):
+        """Build the VBKontrol.* properties belonging to one slot"""
+        properties = {}
+        slot_name = self.get_slot_name(slot_num)
+        slot_video = self.get_slot_video(slot_num)
+        
+        if slot_video:
+            # Set properties for both slot name and slot number
+            video_filename = os.path.basename(slot_video)
+            # VideoExists is left unset until the first probe has answered
+            exists = self.probe.exists(slot_video)
+            # Point skins at the staged / moov-first copy once it is ready
+            published_video = self.slot_url(slot_num, self.resolve_video(slot_video))
+            # The clip a playlist rotates to next, as a path: the loop
+            # server serves a slot's current clip only
+            upcoming = self.rotation.upcoming(slot_num)
+            if upcoming and self.probe.exists(upcoming) is not False:
+                upcoming = self.resolve_video(upcoming)
+            else:
+                upcoming = None
+            for prefix in (f'VBKontrol.{slot_name}', f'VBKontrol.Slot{slot_num}'):
+                properties[f'{prefix}.Video'] = published_video
+                properties[f'{prefix}.VideoFilename'] = video_filename
+                if exists:
+                    properties[f'{prefix}.VideoExists'] = "true"
+                if upcoming:
+                    properties[f'{prefix}.NextVideo'] = upcoming
+            
+            # Container metadata of the published variant, when known
+            info = self.media.lookup(self.variants.select(slot_video))
+            variant = self.variants.pick(slot_video)
+            if variant:
+                for prefix in (f'VBKontrol.{slot_name}', f'VBKontrol.Slot{slot_num}'):
+                    properties[f'{prefix}.Variant'] = f"{variant[0]}p"
+            if info:
+                media_properties = {
+                    'Width': str(info.get('width', '')),
+                    'Height': str(info.get('height', '')),
+                    'Duration': str(int(round(info['duration']))) if info.get('duration') else '',
+                    'Codec': info.get('codec', ''),
+                    'Heavy': "true" if is_heavy(info) else '',
+                }
+                for prefix in (f'VBKontrol.{slot_name}', f'VBKontrol.Slot{slot_num}'):
+                    for key, value in media_properties.items():
+                        if value:
+                            properties[f'{prefix}.{key}'] = value
+        
+        elif self.loop_server:
+            self.loop_server.forget(slot_num, self.loop_paths)
+        
+        # Always set the slot name property
+        properties[f'VBKontrol.Slot{slot_num}.Name'] = slot_name
+        self.update_slot_name(slot_num, slot_name)
+        return properties
+    
+    def build_profile_properties(self):
+        """Base and slot properties of the selected profile: all but the groups"""
+        properties = {
+            'VBKontrol.Service.Running': 'true',
+            'VBKontrol.Service.Version': self.addon_version,
+            'VBKontrol.TotalSlots': str(self.num_slots),
+        }
+        
+        for i in range(1, self.num_slots + 1):
+            slot_properties = self.build_slot_properties(i)
+            self.slot_keys[i] = tuple(slot_properties)
+            properties.update(slot_properties)
+        return properties
+    
+    def build_properties(self):
+        """Build the complete VBKontrol.* property map for skins"""
+        properties = self.build_profile_properties()
+        self.profile_state.properties = dict(properties)
+        
+        self.group_properties['stats'] = self.stats_properties()
+        if self.player:
+            self.group_properties['loop'] = self.player.histogram.properties()
+        for group in self.group_properties.values():
+            properties.update(group)
+        
+        return properties
+    
+    def stats_properties(self):
+        """Prefetch, staging and loop server counters"""
+        properties = {}
+        if self.prefetcher:
+            properties['VBKontrol.Prefetch.Hits'] = str(self.prefetcher.hits)
+            properties['VBKontrol.Prefetch.Misses'] = str(self.prefetcher.misses)
+            properties['VBKontrol.Prefetch.BytesRead'] = str(self.prefetcher.bytes_read)
+        if self.staging:
+            properties['VBKontrol.Staging.Hits'] = str(self.staging.hits)
+            properties['VBKontrol.Staging.Misses'] = str(self.staging.misses)
+            properties['VBKontrol.Staging.BytesSaved'] = str(self.staging.bytes_saved)
+            properties['VBKontrol.Staging.BytesUsed'] = str(self.staging.used_bytes)
+        if self.loop_server:
+            properties.update(self.loop_server.properties())
+        properties['VBKontrol.Profile.Name'] = self.profile_state.name or 'Default'
+        properties['VBKontrol.Profile.Switches'] = str(self.profile_switches)
+        if self.profile_switch_ms is not None:
+            properties['VBKontrol.Profile.SwitchMs'] = f"{self.profile_switch_ms:.2f}"
+        return properties
+    
+    def slot_io_counts(self):
+        """slot_num -> existence checks, header reads and prefetches of its video"""
+        sources = [self.probe.io_counts, self.media.io_counts]
+        if self.prefetcher:
+            sources.append(self.prefetcher.io_counts)
+        index = self.path_index()
+        counts = collections.Counter()
+        for source in sources:
+            for path, ops in list(source.items()):
+                for i in index.get(path, ()):
+                    counts[i] += ops
+        return counts
+    
+    def report_stats(self):
+        """Publish VBKontrol.Stats.* and, with debug logging on, log them"""
         try:
-            video_file_path = f"special://home/userdata/addon_data/plugin.program.vbkontrol/slot_{slot_num}_video.txt"
-            video_file = xbmcvfs.translatePath(video_file_path)
-            if xbmcvfs.exists(video_file):
-                with open(video_file, 'r', encoding='utf-8') as f:
-                    video_path = f.read().strip()
-                    if video_path and xbmcvfs.exists(video_path):
-                        return video_path
-        except:
-            pass
-        return None
+            slot_io = self.slot_io_counts()
+            properties = self.stats.properties(slot_io)
+            properties['VBKontrol.Stats.PropertyWrites'] = str(self.publisher.total_writes)
+            properties['VBKontrol.Stats.PropertySkipped'] = str(self.publisher.total_skipped)
+            if self.capture:
+                properties['VBKontrol.Stats.Profiling'] = 'true'
+            self.publish_group('timings', properties)
+            if self.debug_logging:
+                self.log(f"Cycle stats: {self.stats.describe(slot_io)}; properties "
+                         f"{self.publisher.total_writes} written, {self.publisher.total_skipped} unchanged")
+        except Exception as e:
+            self.log(f"Error reporting statistics: {e}", xbmc.LOGERROR)
+    
+    def start_profile(self, cycles):
+        """Profile the next `cycles` service cycles with cProfile"""
+        try:
+            cycles = int(cycles or PROFILE_CYCLES)
+        except (ValueError, TypeError):
+            cycles = PROFILE_CYCLES
+        self.capture = ProfileCapture(cycles, xbmcvfs.translatePath(ADDON_DATA))
+        self.log(f"Profiling the next {cycles} service cycles")
+    
+    @contextlib.contextmanager
+    def cycle(self):
+        """One service cycle: phases inside it are timed and, on request, profiled"""
+        capture = self.capture if self._cycle_depth == 0 else None
+        self._cycle_depth += 1
+        try:
+            with self.stats.cycle(), capture.cycle() if capture else contextlib.nullcontext():
+                yield
+        finally:
+            self._cycle_depth -= 1
+        if capture and capture.done:
+            self.capture = None
+            try:
+                self.log(f"Service profile written to {capture.save()}")
+            except Exception as e:
+                self.log(f"Error writing service profile: {e}", xbmc.LOGERROR)
     
     def update_window_properties(self):
-        """Update all window properties for skins to use"""
+        """Publish changed window properties for skins to use"""
         try:
-            window = xbmcgui.Window(10000)
+            # Pick up changes saved by the plugin (single stat when unchanged)
+            with self.stats.phase('Store'):
+                self.store.refresh()
+                self.sync_rotation()
             
-            # Service status
-            window.setProperty('VBKontrol.Service.Running', 'true')
-            window.setProperty('VBKontrol.Service.Version', self.addon_version)
+            with self.stats.phase('Diff'):
+                properties = self.build_properties()
+            self.publisher.publish(properties)
+            self.request_background_jobs(range(1, self.num_slots + 1))
+            self.log(
+                f"Published properties: {self.publisher.last_writes} written, "
+                f"{self.publisher.last_skipped} unchanged",
+                xbmc.LOGDEBUG
+            )
+            # Ready for the skins of the other profiles
+            self.compile_profiles()
             
-            # Update all slot properties
-            for i in range(1, self.num_slots + 1):
-                slot_name = self.get_slot_name(i)
-                slot_video = self.get_slot_video(i)
-                
-                if slot_video:
-                    # Set properties for both slot name and slot number
-                    window.setProperty(f'VBKontrol.{slot_name}.Video', slot_video)
-                    window.setProperty(f'VBKontrol.Slot{i}.Video', slot_video)
-                    
-                    # Additional properties for convenience
-                    video_filename = os.path.basename(slot_video)
-                    window.setProperty(f'VBKontrol.{slot_name}.VideoFilename', video_filename)
-                    window.setProperty(f'VBKontrol.Slot{i}.VideoFilename', video_filename)
-                    
-                    # Check if file exists
-                    exists = "true" if xbmcvfs.exists(slot_video) else "false"
-                    window.setProperty(f'VBKontrol.{slot_name}.VideoExists', exists)
-                    window.setProperty(f'VBKontrol.Slot{i}.VideoExists', exists)
-                else:
-                    # Clear properties if no video
-                    window.clearProperty(f'VBKontrol.{slot_name}.Video')
-                    window.clearProperty(f'VBKontrol.Slot{i}.Video')
-                    window.clearProperty(f'VBKontrol.{slot_name}.VideoFilename')
-                    window.clearProperty(f'VBKontrol.Slot{i}.VideoFilename')
-                    window.clearProperty(f'VBKontrol.{slot_name}.VideoExists')
-                    window.clearProperty(f'VBKontrol.Slot{i}.VideoExists')
-                
-                # Always set the slot name property
-                window.setProperty(f'VBKontrol.Slot{i}.Name', slot_name)
+        except Exception as e:
+            self.log(f"Error updating window properties: {e}", xbmc.LOGERROR)
+    
+    def update_slots(self, slots, reload=False):
+        """Republish only the given slots after a change notification.
+        
+        With `reload`, slots.json is read again even if its mtime and size
+        look unchanged: an edit of the same size within the filesystem's
+        mtime granularity (2 s on FAT) cannot be told apart otherwise.
+        """
+        try:
+            with self.stats.phase('Store'):
+                if reload:
+                    self.store.load()
+                reloaded = reload or self.store.refresh()
+                if reloaded and self.sync_profiles():
+                    # Switched profiles: every slot was published
+                    return
+                self.sync_rotation()
+            self.scheduler.note_change()
             
-            # Set total slots property
-            window.setProperty('VBKontrol.TotalSlots', str(self.num_slots))
+            writes = skipped = 0
+            for i in slots:
+                if not 1 <= i <= self.num_slots:
+                    continue
+                with self.stats.phase('Diff'):
+                    properties = self.build_slot_properties(i)
+                # The plugin writes the Video keys itself when it saves a
+                # change; what the service publishes (or clears) wins
+                plugin_keys = (f'VBKontrol.{self.get_slot_name(i)}.Video', f'VBKontrol.Slot{i}.Video')
+                self.publisher.forget(plugin_keys)
+                writes += self.publisher.publish(properties, replaces=self.slot_keys.get(i, ()) + plugin_keys)
+                skipped += self.publisher.last_skipped
+                # Keep the profile's map current for when its skin comes back
+                compiled = self.profile_state.properties
+                if compiled is not None:
+                    for key in self.slot_keys.get(i, ()):
+                        compiled.pop(key, None)
+                    compiled.update(properties)
+                self.slot_keys[i] = tuple(properties)
+            
+            if self.dwell.current in slots:
+                self.update_current()
+            if self.active_slot in slots:
+                self.update_active(force=True)
+            
+            self.log(f"Slots {slots} changed: {writes} properties written, {skipped} unchanged", xbmc.LOGDEBUG)
+            self.request_background_jobs(slots)
             
         except Exception as e:
-            self.log(f"Error updating window properties: {e}", xbmc.LOGERROR)
+            self.log(f"Error updating slots {slots}: {e}", xbmc.LOGERROR)
+    
+    def refresh(self, reload=False):
+        """Safety-net pass for changes no notification announced. With
+        `reload` (a ProfilesChanged notification) slots.json is read again
+        whatever its mtime and size say.
+
+        Costs one stat of slots.json plus a fixed batch of cached existence
+        checks, however many slots there are; slots that did change are
+        republished through update_slots.
+        """
+        try:
+            previous = self.store.slots
+            writes, skipped = self.publisher.total_writes, self.publisher.total_skipped
+            with self.stats.phase('Store'):
+                if reload:
+                    self.store.load()
+                reloaded = reload or self.store.refresh()
+            if reloaded and self.sync_profiles():
+                # Switched profiles: every slot was published
+                reloaded = False
+            elif any(state.revision is None for state in self.profile_states.values()
+                     if state is not self.profile_state):
+                self.compile_profiles()
+            if reloaded:
+                def fields(slots, i):
+                    slot = slots.get(i)
+                    return (slot.name, slot.video, slot.playlist) if slot else (None, None, None)
+                changed = [
+                    i for i in previous.keys() | self.store.slots.keys()
+                    if i <= self.num_slots and fields(previous, i) != fields(self.store.slots, i)
+                ]
+                if changed:
+                    self.update_slots(sorted(changed))
+            
+            # Revalidate the next batch of slots; stale probe answers are
+            # refreshed in the background and come back through take_changed
+            swept = []
+            with self.stats.phase('Probe'):
+                for _ in range(min(SWEEP_BATCH, self.num_slots)):
+                    self.get_slot_video(self.sweep_slot)
+                    swept.append(self.sweep_slot)
+                    self.sweep_slot = self.sweep_slot % self.num_slots + 1
+            # The workers check that optimized and staged copies still match
+            # their sources, in case a file was overwritten in place
+            if self.faststart or self.staging:
+                self.request_background_jobs(swept)
+            
+            self.publish_group('stats', self.stats_properties())
+            writes = self.publisher.total_writes - writes
+            if writes:
+                self.log(f"Refresh: {writes} properties written, "
+                         f"{self.publisher.total_skipped - skipped} unchanged", xbmc.LOGDEBUG)
+        except Exception as e:
+            self.log(f"Error refreshing properties: {e}", xbmc.LOGERROR)
+    
+    def run_cycle(self):
+        """One pass of the loop's work while background I/O is allowed"""
+        if self.scheduler.due():
+            self.refresh()
+            self.media.rescan_async()
+            self.scheduler.refreshed()
+        
+        # Republish slots whose video appeared, went missing or
+        # was (re)indexed
+        with self.stats.phase('Probe'):
+            indexed = self.media.take_changed()
+            changed = self.probe.take_changed() | indexed
+            if self.faststart:
+                changed |= self.faststart.take_changed()
+            if self.staging:
+                changed |= self.staging.take_changed()
+        if changed:
+            slots = set(self.slots_for_paths(changed))
+            if indexed:
+                # A variant may have been added, removed or re-measured
+                self.variants.rebuild(self.media.items())
+                slots.update(self.slots_in_families(indexed))
+            self.update_slots(sorted(slots))
+            # Probe and index answers may concern the other profiles' maps too:
+            # recompile those at the next refresh
+            for state in self.profile_states.values():
+                if state is not self.profile_state:
+                    state.revision = None
+        
+        # Playlist slots due to switch clips, or to warm the next one
+        switched, warm = self.rotation.tick()
+        if switched:
+            self.update_slots(switched)
+        if warm:
+            self.warm_upcoming(warm)
+        
+        self.update_focus()
+        if self.dwell.tick():
+            self.update_current()
+        self.update_active()
     
     def start(self):
         """Start the service"""
@@ -139,25 +936,37 @@ class VBKontrolService:
         self.running = True
         
         # Initial property update
-        self.update_window_properties()
+        with self.cycle():
+            self.update_window_properties()
+        self.media.rescan_async()
         
         self.log("VB Kontrol service started - monitoring for changes")
         
-        # Main service loop
-        last_update = 0
-        update_interval = 10  # Update every 10 seconds
+        # Main service loop - slot changes are handled in ServiceMonitor,
+        # this runs the slow safety-net refresh and background results
+        next_stats = self.clock() + self.stats_interval
         
         while self.running and not self.monitor.abortRequested():
             try:
-                current_time = time.time()
+                current_time = self.clock()
+                
+                # Foreground playback or screensaver: leave storage alone
+                # and pick up what was missed once the menus are back
+                self.scheduler.update()
+                with self.cycle():
+                    # Skin changes need no I/O, so they apply even when paused
+                    self.update_skin()
+                    if not self.scheduler.paused:
+                        self.run_cycle()
+                    if self.player:
+                        self.update_background()
                 
-                # Update window properties periodically
-                if current_time - last_update >= update_interval:
-                    self.update_window_properties()
-                    last_update = current_time
+                if current_time >= next_stats:
+                    self.report_stats()
+                    next_stats = current_time + self.stats_interval
                 
-                # Wait 1 second before next check
-                if self.monitor.waitForAbort(1):
+                # Wait before next check
+                if self.monitor.waitForAbort(self.next_tick()):
                     break
                     
             except Exception as e:
@@ -168,29 +977,36 @@ class VBKontrolService:
         
         self.stop()
     
+    def next_tick(self):
+        """Seconds to wait before the next loop pass"""
+        if self.scheduler.paused:
+            return PAUSED_TICK
+        # Focus only moves on Home; a pending dwell must commit on time
+        if self.focus.label or self.dwell.pending:
+            return self.tick
+        return IDLE_TICK
+    
     def stop(self):
         """Stop the service and cleanup"""
         self.log("Stopping VB Kontrol service...")
         self.running = False
+        # Let workers held at the I/O gate see their stop request
+        self.scheduler.gate.resume()
+        self.probe.stop()
+        if self.faststart:
+            self.faststart.stop()
+        if self.prefetcher:
+            self.prefetcher.stop()
+        if self.staging:
+            self.staging.stop()
+        if self.player:
+            self.player.stop_background()
+        if self.loop_server:
+            self.loop_server.stop()
         
         try:
-            # Clear all window properties
-            window = xbmcgui.Window(10000)
-            window.clearProperty('VBKontrol.Service.Running')
-            window.clearProperty('VBKontrol.Service.Version')
-            window.clearProperty('VBKontrol.TotalSlots')
-            
-            # Clear all slot properties
-            for i in range(1, self.num_slots + 1):
-                slot_name = self.get_slot_name(i)
-                window.clearProperty(f'VBKontrol.{slot_name}.Video')
-                window.clearProperty(f'VBKontrol.Slot{i}.Video')
-                window.clearProperty(f'VBKontrol.{slot_name}.VideoFilename')
-                window.clearProperty(f'VBKontrol.Slot{i}.VideoFilename')
-                window.clearProperty(f'VBKontrol.{slot_name}.VideoExists')
-                window.clearProperty(f'VBKontrol.Slot{i}.VideoExists')
-                window.clearProperty(f'VBKontrol.Slot{i}.Name')
-            
+            # Clear every property the service published
+            self.publisher.clear()
         except Exception as e:
             self.log(f"Error during cleanup: {e}", xbmc.LOGERROR)
         
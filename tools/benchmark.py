@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark the plugin and service against the stub Kodi modules.
+
+Each operation runs for several rounds on a fresh temporary Kodi home with
+every slot assigned. Timings are wall-clock; the I/O columns are the calls
+one round made: real file opens, stats and directory listings, xbmcvfs
+calls and window property writes. A latency profile slows those calls down
+to mimic a slow SD card or an SMB share.
+
+    python tools/benchmark.py [--slots 20 200 2000] [--rounds 5]
+                              [--profile none|flash|smb] [--only service]
+                              [--json results.json]
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+
+import harness
+import kodistate
+
+# Seconds per call
+PROFILES = {
+    'none': {},
+    'flash': {'os.open': 0.001, 'os.stat': 0.0002, 'os.listdir': 0.0005},
+    'smb': {'os.open': 0.01, 'os.stat': 0.003, 'os.listdir': 0.005},
+}
+
+CLIPS = 20
+
+COLUMNS = [
+    ('opens', ('os.open', 'xbmcvfs.File')),
+    ('stats', ('os.stat', 'xbmcvfs.Stat')),
+    ('listdirs', ('os.listdir', 'xbmcvfs.listdir')),
+    ('vfs', ('xbmcvfs.exists', 'xbmcvfs.mkdirs', 'xbmcvfs.delete')),
+    ('writes', ('xbmcgui.Window.setProperty', 'xbmcgui.Window.clearProperty')),
+]
+
+
+def populate(num_slots):
+    """Fresh Kodi home with every slot assigned one of a few dummy clips"""
+    harness.setup({'num_slots': num_slots, 'slots_per_page': 50})
+    clips = [harness.make_video(f"clip{i}.mp4") for i in range(CLIPS)]
+    from resources.lib.slotstore import Slot, SlotStore
+    store = SlotStore()
+    for i in range(1, num_slots + 1):
+        store.slots[i] = Slot(video=clips[i % CLIPS])
+    store.save()
+    return clips
+
+
+def purge_modules():
+    """Forget imported addon code so the next import is a cold one"""
+    for name in list(sys.modules):
+        if name in ('addon', 'service') or name == 'resources' or name.startswith('resources.'):
+            del sys.modules[name]
+
+
+def service():
+    return harness.ServiceThread().service
+
+
+# Each operation takes the slot count and returns (run, cleanup): `run`
+# is what gets timed, the setup before it is not.
+
+def op_plugin_cold_start(num_slots):
+    purge_modules()
+    return lambda: harness.plugin(), None
+
+
+def op_main_menu(num_slots):
+    vbk = harness.plugin()
+    return vbk.show_main_menu, None
+
+
+def op_bulk_assign(num_slots):
+    vbk = harness.plugin()
+    # populate() assigned clip0 to every 20th slot only
+    clip = harness.addon_data("video_backgrounds", "clip0.mp4")
+    return lambda: vbk.apply_videos(range(1, num_slots + 1), clip), None
+
+
+def op_service_full_cycle(num_slots):
+    instance = service()
+    return instance.update_window_properties, instance.stop
+
+
+def settle(instance):
+    """Publish, then wait for the existence probes to answer and publish again"""
+    instance.update_window_properties()
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline and any(
+            instance.probe.exists(video) is None for video in instance.assigned_videos()):
+        time.sleep(0.005)
+    instance.update_window_properties()
+
+
+def op_service_refresh(num_slots):
+    instance = service()
+    settle(instance)
+    return instance.refresh, instance.stop
+
+
+def op_service_slot_change(num_slots):
+    instance = service()
+    settle(instance)
+    instance.store.slots[1].video = harness.addon_data("video_backgrounds", "clip2.mp4")
+    instance.store.save()
+    return lambda: instance.update_slots([1]), instance.stop
+
+
+OPERATIONS = [
+    ('plugin cold start', op_plugin_cold_start),
+    ('main menu', op_main_menu),
+    ('bulk assign', op_bulk_assign),
+    ('service full cycle', op_service_full_cycle),
+    ('service refresh', op_service_refresh),
+    ('service slot change', op_service_slot_change),
+]
+
+
+def measure(operation, num_slots, rounds, latency):
+    timings = []
+    counts = None
+    for _ in range(rounds):
+        populate(num_slots)
+        try:
+            run, cleanup = operation(num_slots)
+            kodistate.calls.clear()
+            kodistate.latency.update(latency)
+            with harness.count_filesystem() as calls:
+                start = time.perf_counter()
+                run()
+                timings.append(time.perf_counter() - start)
+                counts = dict(calls)
+            kodistate.latency.clear()
+            if cleanup:
+                cleanup()
+        finally:
+            harness.teardown()
+    result = {
+        'min_ms': min(timings) * 1000,
+        'median_ms': statistics.median(timings) * 1000,
+        'max_ms': max(timings) * 1000,
+    }
+    for column, names in COLUMNS:
+        result[column] = sum(counts.get(name, 0) for name in names)
+    result['calls'] = counts
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--slots', type=int, nargs='+', default=[20, 200, 2000])
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--profile', choices=sorted(PROFILES), default='none')
+    parser.add_argument('--only', help="run operations whose name contains this text")
+    parser.add_argument('--json', help="also write the results to this file")
+    args = parser.parse_args()
+
+    header = f"{'operation':22s} {'slots':>5s} {'median':>9s} {'min':>9s} {'max':>9s}"
+    header += ''.join(f" {column:>8s}" for column, _ in COLUMNS)
+    print(f"profile: {args.profile}, rounds: {args.rounds}")
+    print(header)
+    results = []
+    for name, operation in OPERATIONS:
+        if args.only and args.only not in name:
+            continue
+        for num_slots in args.slots:
+            result = measure(operation, num_slots, args.rounds, PROFILES[args.profile])
+            line = (f"{name:22s} {num_slots:5d} {result['median_ms']:7.1f}ms "
+                    f"{result['min_ms']:7.1f}ms {result['max_ms']:7.1f}ms")
+            line += ''.join(f" {result[column]:8d}" for column, _ in COLUMNS)
+            print(line, flush=True)
+            results.append(dict(result, operation=name, slots=num_slots, profile=args.profile))
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=1)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Time plugin cold starts, one fresh interpreter per action like Kodi does.
+
+Every router action runs addon.py as __main__ in a new Python process
+against a shared stub Kodi home with every slot assigned. The time from
+running addon.py to the end of the action is recorded together with the
+file opens, stats and xbmcvfs calls it made. Interpreter start-up and
+the stub xbmc* modules (built into Kodi) are not counted; addon modules
+load from cached bytecode as in Kodi, after one warm-up run per action. Exits non-zero
+if an action's median is over --budget-ms or, with --baseline, more than
+--tolerance times its baseline.
+
+    python tools/coldstart.py [--runs 7] [--slots 200] [--budget-ms 50]
+                              [--baseline coldstart.json] [--save-baseline coldstart.json]
+"""
+
+import argparse
+import json
+import os
+import runpy
+import statistics
+import subprocess
+import sys
+import time
+from urllib.parse import quote
+
+import harness
+import kodistate
+
+# name -> (paramstring, scripted dialog responses)
+ACTIONS = {
+    'main menu': ('', []),
+    'main menu page 2': ('page=2', []),
+    'configure slot': ('action=configure_slot&slot=3', [-1]),
+    'global video': ('action=global_video', []),
+    # {clip} alternates between two clips so every run changes every slot
+    'global assign': ('action=assign&slots=1-&video={clip}', []),
+    'video picker': ('action=pick&slots=1-', []),
+    'clear all (declined)': ('action=clear_all', [False]),
+    'cancel optimize': ('action=cancel_optimize', []),
+}
+
+
+def child(home, num_slots, paramstring, responses):
+    """Run one action in this (fresh) interpreter and print its cost as JSON"""
+    harness.setup({'num_slots': num_slots, 'slots_per_page': 50}, home=home)
+    # The xbmc* modules are built into Kodi; do not time importing the stubs
+    import xbmc, xbmcaddon, xbmcgui, xbmcplugin, xbmcvfs  # noqa: E401,F401
+    kodistate.dialog_responses.extend(responses)
+    sys.argv = ["plugin://plugin.program.vbkontrol/", "1", f"?{paramstring}"]
+    with harness.count_filesystem() as calls:
+        start = time.perf_counter()
+        runpy.run_path(os.path.join(harness.ADDON_DIR, "addon.py"), run_name='__main__')
+        elapsed = time.perf_counter() - start
+        counts = dict(calls)
+    print(json.dumps({'ms': elapsed * 1000, 'calls': counts}))
+
+
+def run_action(home, num_slots, paramstring, responses):
+    # Kodi keeps compiled bytecode of addon modules, so allow it here too
+    env = {key: value for key, value in os.environ.items() if key != 'PYTHONDONTWRITEBYTECODE'}
+    output = subprocess.run(
+        [sys.executable, __file__, '--child', home, str(num_slots), paramstring, json.dumps(responses)],
+        check=True, capture_output=True, text=True, env=env
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == '--child':
+        home, num_slots, paramstring, responses = sys.argv[2:6]
+        child(home, int(num_slots), paramstring, json.loads(responses))
+        return 0
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=7)
+    parser.add_argument('--slots', type=int, default=200)
+    parser.add_argument('--budget-ms', type=float, default=50.0)
+    parser.add_argument('--baseline', help="JSON of per-action medians to compare against")
+    parser.add_argument('--tolerance', type=float, default=1.5)
+    parser.add_argument('--save-baseline', help="write this run's medians here")
+    args = parser.parse_args()
+
+    from benchmark import populate
+    populate(args.slots)
+    home = kodistate.home
+
+    def clip(run):
+        return harness.addon_data("video_backgrounds", f"clip{run % 2}.mp4")
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    failures = []
+    medians = {}
+    print(f"{'action':26s} {'median':>9s} {'max':>9s} {'opens':>6s} {'stats':>6s} {'vfs':>6s}")
+    try:
+        for name, (paramstring, responses) in ACTIONS.items():
+            # The first run is a warm-up that writes bytecode caches
+            results = [run_action(home, args.slots, paramstring.format(clip=quote(clip(run))), responses)
+                       for run in range(args.runs + 1)][1:]
+            timings = [result['ms'] for result in results]
+            calls = results[-1]['calls']
+            medians[name] = statistics.median(timings)
+            vfs = sum(count for call, count in calls.items() if call.startswith('xbmcvfs.'))
+            print(f"{name:26s} {medians[name]:7.1f}ms {max(timings):7.1f}ms "
+                  f"{calls.get('os.open', 0):6d} {calls.get('os.stat', 0):6d} {vfs:6d}")
+            if medians[name] > args.budget_ms:
+                failures.append(f"{name}: {medians[name]:.1f} ms is over the {args.budget_ms:.0f} ms budget")
+            if name in baseline and medians[name] > baseline[name] * args.tolerance:
+                failures.append(f"{name}: {medians[name]:.1f} ms regressed from {baseline[name]:.1f} ms")
+    finally:
+        harness.teardown()
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump(medians, f, indent=1)
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Simulate hours of Kodi use on a fake clock and report disk I/O per state.
+
+Runs service.py against the stub Kodi modules with a FakeClock driving
+waitForAbort through four phases: active in the menus (a key press every
+20 s), idle (no input), foreground playback of a film and the
+screensaver. Every file open, stat and listdir and every xbmcvfs call,
+from any thread, is counted and reported per simulated hour of each
+phase, next to the safety-net refreshes run. Exits non-zero if storage
+was touched during playback or the screensaver, if idle did not back off
+or if skipped work did not catch up within a few seconds of returning to
+the menus.
+
+    python tools/diskops.py [--hours 1] [--slots 20] [--poll-interval 60]
+"""
+
+import argparse
+import sys
+
+import harness
+import kodistate
+
+PHASES = ('active', 'idle', 'playback', 'screensaver')
+# Counting starts this long into a phase, once the switch has settled
+SETTLE = 10.0
+# Back in the menus, a refresh must run within this many seconds
+CATCH_UP = 3.0
+# Seconds spent in the menus after playback and after the screensaver
+MENUS = 60.0
+FILM = "/media/films/film.mkv"
+
+
+def disk_ops(calls):
+    return sum(count for name, count in calls.items() if name.startswith(('os.', 'xbmcvfs.')))
+
+
+def run(hours, num_slots, poll_interval):
+    from benchmark import populate
+    populate(num_slots)
+    kodistate.settings.update({'poll_interval': poll_interval, 'poll_jitter': 0})
+    clock = kodistate.clock = kodistate.FakeClock()
+    kodistate.durations[FILM] = hours * 3600 * 10
+
+    import xbmc
+    service = harness.ServiceThread(clock=clock).service
+    start = clock()
+    length = hours * 3600.0
+    refreshes = []
+    refresh = service.refresh
+
+    def counted_refresh():
+        refreshes.append(clock() - start)
+        refresh()
+    service.refresh = counted_refresh
+
+    def at(when, callback):
+        clock.at(start + when, callback)
+
+    def press():
+        kodistate.last_input = clock()
+
+    # Phase -> (start, end) in seconds from the start
+    spans = {
+        'active': (0.0, length),
+        'idle': (length, 2 * length),
+        'playback': (2 * length, 3 * length),
+        'screensaver': (3 * length + MENUS, 4 * length + MENUS),
+    }
+    for i in range(int(length // 20)):
+        at(i * 20.0, press)
+    at(spans['playback'][0], lambda: xbmc.Player().play(FILM))
+    at(spans['playback'][1], lambda: (xbmc.Player().stop(), press()))
+    at(spans['screensaver'][0], lambda: xbmc.sim_screensaver(True))
+    at(spans['screensaver'][1], lambda: (xbmc.sim_screensaver(False), press()))
+    at(spans['screensaver'][1] + MENUS, kodistate.abort.set)
+
+    marks = {}
+
+    def mark(name):
+        marks[name] = (clock() - start, disk_ops(kodistate.calls), len(refreshes))
+    for phase, (begin, end) in spans.items():
+        at(begin + SETTLE, lambda phase=phase: mark(f"{phase} start"))
+        at(end, lambda phase=phase: mark(f"{phase} end"))
+
+    with harness.count_filesystem(this_thread=False):
+        service.start()
+
+    results = {}
+    print(f"{'state':12s} {'disk ops/hour':>14s} {'refreshes/hour':>15s}")
+    for phase in PHASES:
+        t0, ops0, refreshes0 = marks[f"{phase} start"]
+        t1, ops1, refreshes1 = marks[f"{phase} end"]
+        scale = 3600.0 / (t1 - t0)
+        results[phase] = (ops1 - ops0) * scale
+        print(f"{phase:12s} {results[phase]:14.0f} {(refreshes1 - refreshes0) * scale:15.1f}")
+
+    failures = []
+    for phase in ('playback', 'screensaver'):
+        if results[phase]:
+            failures.append(f"{results[phase]:.0f} disk ops per hour during {phase}")
+        back = spans[phase][1]
+        first = min((t for t in refreshes if t >= back), default=None)
+        if first is None or first - back > CATCH_UP:
+            failures.append(f"no refresh within {CATCH_UP:.0f} s of leaving {phase}")
+        else:
+            print(f"caught up {first - back:.1f} s after leaving {phase}")
+    if results['idle'] >= results['active'] / 2:
+        failures.append("idle did not back off")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--hours', type=float, default=1.0, help="simulated hours per state")
+    parser.add_argument('--slots', type=int, default=20)
+    parser.add_argument('--poll-interval', type=int, default=60)
+    args = parser.parse_args()
+
+    try:
+        failures = run(args.hours, args.slots, args.poll_interval)
+    finally:
+        harness.teardown()
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
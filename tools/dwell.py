@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Replay a scripted menu scroll against the service on a fake clock.
+
+Runs service.py against the stub Kodi modules with a FakeClock driving
+waitForAbort, moves focus through the home menu (fast scrolls, rests and
+a bounce back) and checks that VBKontrol.Current.Video switched exactly
+once per rest, no earlier than the dwell time and no later than two ticks
+after it (one to notice the focus move, one to commit). Away from Home the
+service ticks once a second, so arriving on Home may take one such idle
+tick to notice. Fully deterministic; exits non-zero on a mismatch.
+
+    python tools/dwell.py [--dwell-ms 400]
+"""
+
+import argparse
+import os
+import sys
+
+import harness
+import kodistate
+
+LABEL = 'Container(9000).ListItem.Label'
+HOME = 'Window.IsActive(home)'
+
+
+def run(dwell_ms):
+    harness.setup({'dwell_ms': dwell_ms, 'menu_container_id': 9000})
+    clock = kodistate.clock = kodistate.FakeClock()
+
+    from resources.lib.slotstore import SlotStore
+    store = SlotStore()
+    store.load()
+    for slot in range(1, 7):
+        store.set_video(slot, harness.make_video(f"clip{slot}.mp4"))
+    store.save()
+    names = {slot: store.get_name(slot) for slot in range(1, 7)}
+
+    service = harness.ServiceThread(clock=clock).service
+    from service import IDLE_TICK
+    start = clock()
+    switches = []
+    update_current = service.update_current
+
+    def record():
+        update_current()
+        switches.append((clock() - start, harness.window_property('VBKontrol.Current.Video')))
+    service.update_current = record
+
+    focus_changes = []
+
+    def focus(when, slot):
+        def move():
+            kodistate.conditions[HOME] = slot is not None
+            kodistate.infolabels[LABEL] = names[slot] if slot else ''
+            focus_changes.append(clock() - start)
+        clock.at(start + when, move)
+
+    # Rest on slot 1, scroll fast to slot 6, step back to 4, bounce 5 -> 4, leave Home
+    focus(0.5, 1)
+    for i, slot in enumerate(range(2, 7)):
+        focus(1.5 + i * 0.15, slot)
+    focus(3.5, 5)
+    focus(3.6, 4)
+    focus(5.0, 5)
+    focus(5.2, 4)
+    focus(6.0, None)
+    clock.at(start + 7.0, kodistate.abort.set)
+
+    service.start()
+
+    # (rest start, slot, arrived from outside Home)
+    expected = [(0.5, 1, True), (2.1, 6, False), (3.6, 4, False), (6.0, None, False)]
+    dwell = dwell_ms / 1000.0
+    failures = []
+    if len(switches) != len(expected):
+        failures.append(f"expected {len(expected)} switches, got {len(switches)}")
+    for (at, video), (rest, slot, arrived) in zip(switches, expected):
+        want = os.path.basename(harness.addon_data("video_backgrounds", f"clip{slot}.mp4")) if slot else ''
+        delay = at - rest
+        print(f"t={at:5.2f}s  {os.path.basename(video) or '(none)':10s}  after {delay * 1000:4.0f} ms rest")
+        if os.path.basename(video) != want:
+            failures.append(f"t={at:.2f}s: expected {want or '(none)'}, got {video or '(none)'}")
+        notice = IDLE_TICK if arrived else service.tick
+        if not dwell - 1e-6 <= delay <= dwell + notice + service.tick + 1e-6:
+            failures.append(f"t={at:.2f}s: switched {delay * 1000:.0f} ms after the rest began")
+    print(f"{len(focus_changes)} focus changes, {len(switches)} switches, tick {service.tick * 1000:.0f} ms")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--dwell-ms', type=int, default=400)
+    args = parser.parse_args()
+    # The script scrolls one item per 150 ms and rests for at least 800 ms
+    if not 150 < args.dwell_ms < 800:
+        parser.error("--dwell-ms must be between 150 and 800 for this scenario")
+
+    failures = run(args.dwell_ms)
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+
+"""
+Helpers for running addon.py and service.py outside Kodi.
+
+Importing this module puts the stub xbmc* modules and the addon folder on
+sys.path. Call setup() before importing addon/service to get a clean
+temporary Kodi home.
+"""
+
+import builtins
+import contextlib
+import os
+import shutil
+import sys
+import threading
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+ADDON_DIR = os.path.normpath(os.path.join(TOOLS_DIR, os.pardir, "plugin.program.vbkontrol"))
+sys.path[:0] = [os.path.join(TOOLS_DIR, "kodistub"), ADDON_DIR]
+
+import kodistate  # noqa: E402
+
+ADDON_DATA = os.path.join("userdata", "addon_data", "plugin.program.vbkontrol")
+
+
+def setup(settings=None, home=None):
+    """Reset the stubs and return the (by default new, temporary) Kodi home"""
+    home = kodistate.reset(addon_dir=ADDON_DIR, kodi_home=home)
+    kodistate.settings.update(settings or {})
+    return home
+
+
+def teardown():
+    """Remove the temporary Kodi home created by setup()"""
+    if kodistate.home and os.path.basename(kodistate.home).startswith("kodistub-"):
+        shutil.rmtree(kodistate.home, ignore_errors=True)
+
+
+@contextlib.contextmanager
+def count_filesystem(this_thread=True):
+    """Count (and apply kodistate.latency to) real file opens, stats and listdirs.
+
+    Recorded as 'os.open', 'os.stat' and 'os.listdir' next to the stub calls;
+    os.path.exists/isfile/getsize go through os.stat and are included. With
+    `this_thread`, work done meanwhile by background threads is not counted.
+    """
+    patched = [(builtins, 'open', 'os.open'), (os, 'stat', 'os.stat'),
+               (os, 'listdir', 'os.listdir'), (os, 'scandir', 'os.listdir')]
+    originals = [getattr(module, attr) for module, attr, _ in patched]
+
+    def counted(function, name):
+        def wrapper(*args, **kwargs):
+            kodistate.record(name)
+            return function(*args, **kwargs)
+        return wrapper
+
+    for (module, attr, name), function in zip(patched, originals):
+        setattr(module, attr, counted(function, name))
+    kodistate.count_thread = threading.get_ident() if this_thread else None
+    try:
+        yield kodistate.calls
+    finally:
+        kodistate.count_thread = None
+        for (module, attr, _), function in zip(patched, originals):
+            setattr(module, attr, function)
+
+
+def addon_data(*parts):
+    return os.path.join(kodistate.home, ADDON_DATA, *parts)
+
+
+def make_video(name, size=1024):
+    """Create a dummy file in video_backgrounds and return its path"""
+    folder = addon_data("video_backgrounds")
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, name)
+    with open(path, 'wb') as f:
+        f.write(b'\0' * size)
+    return path
+
+
+def plugin(paramstring=''):
+    """Create a VBKontrol instance as a fresh plugin invocation would"""
+    from resources.lib import plugin as addon
+    sys.argv = ["plugin://plugin.program.vbkontrol/", "1", f"?{paramstring}"]
+    return addon.VBKontrol()
+
+
+def window_property(key, window_id=10000):
+    return kodistate.window_properties(window_id).get(key.lower(), '')
+
+
+class ServiceThread(threading.Thread):
+    """Runs VBKontrolService.start() until stop() is called"""
+
+    def __init__(self, clock=None, wall_clock=None):
+        super().__init__(daemon=True)
+        import service
+        clocks = {'clock': clock, 'wall_clock': wall_clock}
+        self.service = service.VBKontrolService(**{name: value for name, value in clocks.items() if value})
+        self.started = threading.Event()
+
+    def run(self):
+        self.started.set()
+        self.service.start()
+
+    def stop(self):
+        kodistate.abort.set()
+        self.join(10)
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+
+"""
+Shared state behind the stub Kodi modules.
+
+Everything the fake xbmc* modules read or write lives here so a harness
+can set up a profile directory, script dialogs, inspect window properties
+and deliver notifications without a running Kodi. Stub calls are counted
+in `calls` and can be slowed down per call through `latency`.
+"""
+
+import collections
+import heapq
+import os
+import tempfile
+import threading
+import time
+
+home = None
+addon_path = None
+settings = {}
+properties = {}  # window id -> {lowercase key: value}
+monitors = []
+abort = threading.Event()
+log_lines = []
+log_echo = False
+dialog_responses = []  # queued return values for Dialog.select/browse/...
+directory_items = []
+infolabels = {}  # info label -> value returned by xbmc.getInfoLabel
+conditions = {}  # condition -> value returned by xbmc.getCondVisibility
+last_input = None  # clock time of the last key press, for xbmc.getGlobalIdleTime
+window_id = 10000  # returned by xbmcgui.getCurrentWindowId
+skin = 'skin.estuary'  # returned by xbmc.getSkinDir
+players = []
+player_callbacks = []  # (player, callback name) waiting for a Monitor to dispatch
+playback = None  # simulated player state, see xbmc.sim_advance()
+repeat = 'off'
+durations = {}  # file -> simulated duration in seconds
+clock = None  # FakeClock driving Monitor.waitForAbort, or None for real time
+calls = collections.Counter()  # 'module.function' -> number of stub calls
+latency = {}  # 'module.function' -> seconds each call sleeps, to mimic slow storage
+count_thread = None  # thread ident to count calls from, or None for every thread
+
+
+def record(name):
+    """Count a stub call and apply any latency injected for it"""
+    if count_thread is None or count_thread == threading.get_ident():
+        calls[name] += 1
+    delay = latency.get(name)
+    if delay:
+        time.sleep(delay)
+
+
+class FakeClock:
+    """Deterministic monotonic clock; waitForAbort advances it instead of sleeping"""
+
+    def __init__(self, start=1000.0):
+        self.now = start
+        self._events = []
+        self._seq = 0
+
+    def __call__(self):
+        return self.now
+
+    def at(self, when, callback):
+        """Run `callback` once the clock reaches `when`"""
+        self._seq += 1
+        heapq.heappush(self._events, (when, self._seq, callback))
+
+    def after(self, delay, callback):
+        self.at(self.now + delay, callback)
+
+    def advance(self, seconds):
+        """Move time forward, running due callbacks at their own time"""
+        target = self.now + seconds
+        while self._events and self._events[0][0] <= target:
+            when, _, callback = heapq.heappop(self._events)
+            self.now = max(self.now, when)
+            callback()
+        self.now = target
+
+
+def reset(addon_dir=None, kodi_home=None):
+    """Start from a clean profile; returns the temporary Kodi home"""
+    global home, addon_path, clock, count_thread, last_input, window_id, skin
+    home = kodi_home or tempfile.mkdtemp(prefix="kodistub-")
+    addon_path = addon_dir
+    os.makedirs(os.path.join(home, "userdata", "addon_data"), exist_ok=True)
+    settings.clear()
+    properties.clear()
+    del monitors[:]
+    abort.clear()
+    del log_lines[:]
+    del dialog_responses[:]
+    del directory_items[:]
+    infolabels.clear()
+    conditions.clear()
+    del players[:]
+    del player_callbacks[:]
+    durations.clear()
+    calls.clear()
+    latency.clear()
+    count_thread = None
+    clock = None
+    last_input = None
+    window_id = 10000
+    skin = 'skin.estuary'
+    set_playback(None)
+    return home
+
+
+def set_playback(state, repeat_mode='off'):
+    global playback, repeat
+    playback = state
+    repeat = repeat_mode
+
+
+def window_properties(window_id=10000):
+    return properties.setdefault(window_id, {})
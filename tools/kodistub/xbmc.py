@@ -0,0 +1,258 @@
+# -*- coding: utf-8 -*-
+
+"""Stub of Kodi's xbmc module"""
+
+import collections
+import json
+import threading
+import time
+
+import kodistate
+
+LOGDEBUG = 0
+LOGINFO = 1
+LOGWARNING = 2
+LOGERROR = 3
+LOGFATAL = 4
+LOGNONE = 5
+
+# How often waitForAbort wakes up to dispatch queued callbacks
+CALLBACK_TICK = 0.01
+
+
+def log(msg, level=LOGDEBUG):
+    kodistate.log_lines.append((level, msg))
+    if kodistate.log_echo:
+        print(msg)
+
+
+def sleep(milliseconds):
+    time.sleep(milliseconds / 1000.0)
+
+
+def executeJSONRPC(request):
+    kodistate.record('xbmc.executeJSONRPC')
+    request = json.loads(request)
+    if request.get('method') == 'JSONRPC.NotifyAll':
+        params = request['params']
+        data = json.dumps(params.get('data')) if 'data' in params else ''
+        for monitor in list(kodistate.monitors):
+            monitor._queue(params['sender'], f"Other.{params['message']}", data)
+    return json.dumps({'jsonrpc': '2.0', 'id': request.get('id'), 'result': 'OK'})
+
+
+def getInfoLabel(infotag):
+    kodistate.record('xbmc.getInfoLabel')
+    return kodistate.infolabels.get(infotag, '')
+
+
+def getGlobalIdleTime():
+    """Whole seconds since kodistate.last_input (0 if it is unset)"""
+    kodistate.record('xbmc.getGlobalIdleTime')
+    if kodistate.last_input is None:
+        return 0
+    now = kodistate.clock() if kodistate.clock is not None else time.monotonic()
+    return int(now - kodistate.last_input)
+
+
+def sim_screensaver(active):
+    """Start or stop the screensaver, queueing the Monitor callbacks"""
+    for monitor in list(kodistate.monitors):
+        monitor._queue_callback('onScreensaverActivated' if active else 'onScreensaverDeactivated')
+
+
+def getSkinDir():
+    kodistate.record('xbmc.getSkinDir')
+    return kodistate.skin
+
+
+def getCondVisibility(condition):
+    kodistate.record('xbmc.getCondVisibility')
+    return bool(kodistate.conditions.get(condition, False))
+
+
+def executebuiltin(function, wait=False):
+    kodistate.record('xbmc.executebuiltin')
+    log(f"builtin: {function}", LOGDEBUG)
+    if function.startswith('PlayerControl(Repeat'):
+        mode = function[len('PlayerControl(Repeat'):-1].lower()
+        kodistate.repeat = mode if mode in ('one', 'all') else 'off'
+
+
+# --- Simulated player ---------------------------------------------------------
+
+PLAYLIST_MUSIC = 0
+PLAYLIST_VIDEO = 1
+DEFAULT_DURATION = 30.0
+
+
+class PlayList:
+    _lists = {}
+
+    def __new__(cls, playList):
+        if playList not in cls._lists:
+            cls._lists[playList] = super().__new__(cls)
+            cls._lists[playList].items = []
+        return cls._lists[playList]
+
+    def add(self, url, listitem=None, index=-1):
+        self.items.append(url)
+
+    def clear(self):
+        del self.items[:]
+
+    def size(self):
+        return len(self.items)
+
+    def getposition(self):
+        return kodistate.playback['index'] if kodistate.playback else -1
+
+
+def _fire(name):
+    for player in kodistate.players:
+        kodistate.player_callbacks.append((player, name))
+
+
+def dispatch_player_callbacks():
+    while kodistate.player_callbacks:
+        player, name = kodistate.player_callbacks.pop(0)
+        getattr(player, name)()
+
+
+def sim_advance(seconds, gap=0.0):
+    """Move simulated playback forward, wrapping playlists like Kodi does.
+
+    `gap` is the extra time between one item's end and the next item's
+    first frame. Returns the number of item transitions.
+    """
+    transitions = 0
+    state = kodistate.playback
+    while state and seconds > 0:
+        duration = kodistate.durations.get(state['files'][state['index']], DEFAULT_DURATION)
+        remaining = duration - state['position']
+        if seconds < remaining:
+            state['position'] += seconds
+            break
+        seconds -= remaining + gap
+        index = state['index'] + 1
+        if kodistate.repeat == 'one':
+            index = state['index']
+        elif index >= len(state['files']) and kodistate.repeat == 'all':
+            index = 0
+        if index >= len(state['files']):
+            kodistate.set_playback(None, kodistate.repeat)
+            _fire('onPlayBackEnded')
+            break
+        state['index'] = index
+        state['position'] = max(-gap, 0.0)
+        transitions += 1
+        _fire('onAVStarted')
+    return transitions
+
+
+class Player:
+    def __init__(self):
+        kodistate.players.append(self)
+
+    def play(self, item=None, listitem=None, windowed=False, startpos=-1):
+        files = list(item.items) if isinstance(item, PlayList) else [item]
+        if kodistate.playback:
+            _fire('onPlayBackStopped')
+        kodistate.set_playback({'files': files, 'index': 0, 'position': 0.0}, kodistate.repeat)
+        _fire('onPlayBackStarted')
+        _fire('onAVStarted')
+
+    def stop(self):
+        if kodistate.playback:
+            kodistate.set_playback(None, kodistate.repeat)
+            _fire('onPlayBackStopped')
+
+    def isPlaying(self):
+        return kodistate.playback is not None
+
+    def isPlayingVideo(self):
+        return kodistate.playback is not None
+
+    def getPlayingFile(self):
+        if not kodistate.playback:
+            raise RuntimeError("Kodi is not playing any media file")
+        return kodistate.playback['files'][kodistate.playback['index']]
+
+    def getTime(self):
+        if not kodistate.playback:
+            raise RuntimeError("Kodi is not playing any media file")
+        return kodistate.playback['position']
+
+    def getTotalTime(self):
+        return kodistate.durations.get(self.getPlayingFile(), DEFAULT_DURATION)
+
+    def onPlayBackStarted(self):
+        pass
+
+    def onAVStarted(self):
+        pass
+
+    def onPlayBackEnded(self):
+        pass
+
+    def onPlayBackStopped(self):
+        pass
+
+    def onPlayBackError(self):
+        pass
+
+
+class Monitor:
+    """Callbacks are queued and run on the waiting thread, as in Kodi"""
+
+    def __init__(self):
+        self._pending = collections.deque()
+        self._lock = threading.Lock()
+        kodistate.monitors.append(self)
+
+    def _queue(self, *notification):
+        self._queue_callback('onNotification', *notification)
+
+    def _queue_callback(self, name, *args):
+        with self._lock:
+            self._pending.append((name, args))
+
+    def _dispatch(self):
+        dispatch_player_callbacks()
+        while True:
+            with self._lock:
+                if not self._pending:
+                    return
+                name, args = self._pending.popleft()
+            getattr(self, name)(*args)
+
+    def abortRequested(self):
+        return kodistate.abort.is_set()
+
+    def waitForAbort(self, timeout=None):
+        if kodistate.clock is not None and timeout is not None:
+            self._dispatch()
+            kodistate.clock.advance(timeout)
+            self._dispatch()
+            return kodistate.abort.is_set()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not kodistate.abort.is_set():
+            self._dispatch()
+            remaining = CALLBACK_TICK if deadline is None else deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            kodistate.abort.wait(min(CALLBACK_TICK, remaining))
+        self._dispatch()
+        return kodistate.abort.is_set()
+
+    def onNotification(self, sender, method, data):
+        pass
+
+    def onSettingsChanged(self):
+        pass
+
+    def onScreensaverActivated(self):
+        pass
+
+    def onScreensaverDeactivated(self):
+        pass
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+
+"""Stub of Kodi's xbmcaddon module"""
+
+import kodistate
+
+ADDON_ID = "plugin.program.vbkontrol"
+
+
+class Addon:
+    def __init__(self, id=ADDON_ID):
+        self.id = id
+
+    def getAddonInfo(self, key):
+        return {
+            'id': self.id,
+            'name': "VB Kontrol - Universal Video Backgrounds",
+            'version': "1.0.4",
+            'path': kodistate.addon_path or '',
+            'profile': f"special://profile/addon_data/{self.id}/",
+        }.get(key, '')
+
+    def getSetting(self, key):
+        kodistate.record('xbmcaddon.Addon.getSetting')
+        return str(kodistate.settings.get(key, ''))
+
+    def getSettingBool(self, key):
+        kodistate.record('xbmcaddon.Addon.getSetting')
+        value = kodistate.settings.get(key, False)
+        return value if isinstance(value, bool) else str(value).lower() == 'true'
+
+    def getSettingInt(self, key):
+        kodistate.record('xbmcaddon.Addon.getSetting')
+        try:
+            return int(kodistate.settings.get(key, 0))
+        except ValueError:
+            return 0
+
+    def getSettingString(self, key):
+        return self.getSetting(key)
+
+    def setSetting(self, key, value):
+        kodistate.settings[key] = value
+
+    def getLocalizedString(self, id):
+        return ''
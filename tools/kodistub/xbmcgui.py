@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+
+"""Stub of Kodi's xbmcgui module"""
+
+import kodistate
+
+NOTIFICATION_INFO = 'info'
+NOTIFICATION_WARNING = 'warning'
+NOTIFICATION_ERROR = 'error'
+INPUT_ALPHANUM = 0
+INPUT_NUMERIC = 1
+
+
+def getCurrentWindowId():
+    kodistate.record('xbmcgui.getCurrentWindowId')
+    return kodistate.window_id
+
+
+class Window:
+    def __init__(self, existingWindowId=-1):
+        self._properties = kodistate.window_properties(existingWindowId)
+
+    def setProperty(self, key, value):
+        kodistate.record('xbmcgui.Window.setProperty')
+        self._properties[key.lower()] = value
+
+    def getProperty(self, key):
+        kodistate.record('xbmcgui.Window.getProperty')
+        return self._properties.get(key.lower(), '')
+
+    def clearProperty(self, key):
+        kodistate.record('xbmcgui.Window.clearProperty')
+        self._properties.pop(key.lower(), None)
+
+
+class ListItem:
+    def __init__(self, label='', label2='', path='', offscreen=False):
+        kodistate.record('xbmcgui.ListItem')
+        self.label = label
+        self.path = path
+        self.info = {}
+        self.properties = {}
+
+    def getLabel(self):
+        return self.label
+
+    def setInfo(self, type, infoLabels):
+        self.info.update(infoLabels)
+
+    def setProperty(self, key, value):
+        self.properties[key.lower()] = value
+
+
+class Dialog:
+    """Returns scripted responses queued in kodistate.dialog_responses"""
+
+    def _respond(self, default):
+        if kodistate.dialog_responses:
+            return kodistate.dialog_responses.pop(0)
+        return default
+
+    def select(self, heading, list, autoclose=0, preselect=-1, useDetails=False):
+        return self._respond(-1)
+
+    def multiselect(self, heading, options, autoclose=0, preselect=None, useDetails=False):
+        return self._respond(None)
+
+    def browse(self, type, heading, shares, mask='', useThumbs=False,
+               treatAsFolder=False, defaultt='', enableMultiple=False):
+        return self._respond(defaultt)
+
+    def input(self, heading, defaultt='', type=INPUT_ALPHANUM, option=0, autoclose=0):
+        return self._respond('')
+
+    def yesno(self, heading, message, *args, **kwargs):
+        return self._respond(False)
+
+    def notification(self, heading, message, icon=NOTIFICATION_INFO, time=5000, sound=True):
+        kodistate.log_lines.append((1, f"notification: {message}"))
+
+    def ok(self, heading, message):
+        return True
+
+
+class DialogProgressBG:
+    def create(self, heading, message=''):
+        self.percent = 0
+
+    def update(self, percent=0, heading='', message=''):
+        self.percent = percent
+
+    def isFinished(self):
+        return False
+
+    def close(self):
+        pass
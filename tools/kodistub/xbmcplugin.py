@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+
+"""Stub of Kodi's xbmcplugin module"""
+
+import kodistate
+
+
+def addDirectoryItem(handle, url, listitem, isFolder=False, totalItems=0):
+    kodistate.record('xbmcplugin.addDirectoryItem')
+    kodistate.directory_items.append((url, listitem, isFolder))
+    return True
+
+
+def addDirectoryItems(handle, items, totalItems=0):
+    kodistate.record('xbmcplugin.addDirectoryItems')
+    kodistate.directory_items.extend(items)
+    return True
+
+
+def endOfDirectory(handle, succeeded=True, updateListing=False, cacheToDisc=True):
+    kodistate.record('xbmcplugin.endOfDirectory')
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+
+"""Stub of Kodi's xbmcvfs module, backed by a temporary Kodi home"""
+
+import os
+import shutil
+
+import kodistate
+
+
+def translatePath(path):
+    if path.startswith("special://home/"):
+        return os.path.join(kodistate.home, path[len("special://home/"):])
+    if path.startswith("special://profile/"):
+        return os.path.join(kodistate.home, "userdata", path[len("special://profile/"):])
+    if path.startswith("special://temp/"):
+        return os.path.join(kodistate.home, "temp", path[len("special://temp/"):])
+    return path
+
+
+def exists(path):
+    kodistate.record('xbmcvfs.exists')
+    return os.path.exists(translatePath(path))
+
+
+def mkdirs(path):
+    kodistate.record('xbmcvfs.mkdirs')
+    os.makedirs(translatePath(path), exist_ok=True)
+    return True
+
+
+def mkdir(path):
+    return mkdirs(path)
+
+
+def delete(path):
+    kodistate.record('xbmcvfs.delete')
+    try:
+        os.remove(translatePath(path))
+        return True
+    except OSError:
+        return False
+
+
+def rmdir(path, force=False):
+    kodistate.record('xbmcvfs.rmdir')
+    try:
+        if force:
+            shutil.rmtree(translatePath(path))
+        else:
+            os.rmdir(translatePath(path))
+        return True
+    except OSError:
+        return False
+
+
+def listdir(path):
+    kodistate.record('xbmcvfs.listdir')
+    path = translatePath(path)
+    dirs, files = [], []
+    for name in os.listdir(path):
+        (dirs if os.path.isdir(os.path.join(path, name)) else files).append(name)
+    return dirs, files
+
+
+class Stat:
+    def __init__(self, path):
+        kodistate.record('xbmcvfs.Stat')
+        self._st = os.stat(translatePath(path))
+
+    def st_size(self):
+        return self._st.st_size
+
+    def st_mtime(self):
+        return int(self._st.st_mtime)
+
+
+class File:
+    def __init__(self, path, flags='r'):
+        kodistate.record('xbmcvfs.File')
+        self._f = open(translatePath(path), 'wb' if flags == 'w' else 'rb')
+
+    def readBytes(self, numBytes=0):
+        return self._f.read(numBytes) if numBytes else self._f.read()
+
+    def read(self, numBytes=0):
+        return self.readBytes(numBytes).decode('utf-8', 'replace')
+
+    def write(self, buffer):
+        self._f.write(buffer if isinstance(buffer, bytes) else buffer.encode('utf-8'))
+        return True
+
+    def size(self):
+        return os.fstat(self._f.fileno()).st_size
+
+    def seek(self, seekBytes, iWhence=0):
+        return self._f.seek(seekBytes, iWhence)
+
+    def close(self):
+        self._f.close()
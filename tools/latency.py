@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Measure change-to-property latency between the plugin and the service.
+
+Runs service.py in a thread against the stub Kodi modules, assigns videos
+through addon.py and times how long each change takes to appear in the
+service-published VBKontrol.SlotN.VideoFilename property. Exits non-zero
+if the p95 latency is over budget.
+
+    python tools/latency.py [--changes 50] [--budget-ms 100]
+"""
+
+import argparse
+import sys
+import time
+
+import harness
+
+
+def measure(changes):
+    harness.setup()
+    videos = [harness.make_video(f"clip{i}.mp4") for i in range(changes)]
+
+    service = harness.ServiceThread()
+    service.start()
+    service.started.wait()
+    # Let the initial full refresh finish
+    while harness.window_property('VBKontrol.Service.Running') != 'true':
+        time.sleep(0.001)
+
+    vbk = harness.plugin()
+    latencies = []
+    try:
+        for i, video in enumerate(videos):
+            slot = i % vbk.num_slots + 1
+            expected = video.rsplit('/', 1)[-1]
+            start = time.perf_counter()
+            vbk.set_slot_video(slot, video)
+            while harness.window_property(f'VBKontrol.Slot{slot}.VideoFilename') != expected:
+                if time.perf_counter() - start > 5:
+                    raise RuntimeError(f"slot {slot} was not published within 5s")
+                time.sleep(0.0005)
+            latencies.append((time.perf_counter() - start) * 1000)
+    finally:
+        service.stop()
+    return sorted(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--changes', type=int, default=50)
+    parser.add_argument('--budget-ms', type=float, default=100.0)
+    args = parser.parse_args()
+
+    latencies = measure(args.changes)
+    p50 = latencies[len(latencies) // 2]
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f"changes={len(latencies)} p50={p50:.1f}ms p95={p95:.1f}ms max={latencies[-1]:.1f}ms")
+    if p95 > args.budget_ms:
+        print(f"FAIL: p95 latency over {args.budget_ms:.0f}ms budget")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
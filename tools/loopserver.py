@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Check the loop server with a local HTTP client, no external network.
+
+Starts the service against the stub Kodi modules with the loop server
+enabled, checks that slot properties point at http://127.0.0.1, then
+talks to the server with http.client: HEAD, full GET, single, suffix and
+open-ended ranges, an unsatisfiable range, unknown slots, keep-alive,
+cache hits when a loop reopens the file, and the endless stream of an
+MPEG-TS slot, which must repeat the file byte for byte and end once the
+slot moves to another video. Exits non-zero on the first failed check.
+
+    python tools/loopserver.py [--size-mb 4] [--loops 3]
+"""
+
+import argparse
+import http.client
+import os
+import sys
+import time
+from urllib.parse import urlsplit
+
+import harness
+
+
+class Failed(Exception):
+    pass
+
+
+def check(condition, message):
+    if not condition:
+        raise Failed(message)
+    print(f"ok   {message}")
+
+
+def request(connection, method, url, headers=None):
+    connection.request(method, url, headers=headers or {})
+    response = connection.getresponse()
+    return response, response.read()
+
+
+def run(size, loops):
+    harness.setup({'num_slots': 3, 'loop_server_enabled': True, 'loop_server_cache_mb': 64,
+                   'video_loop': True})
+    data = os.urandom(size)
+    mp4 = harness.make_video("clip.mp4", size=0)
+    ts = harness.make_video("clip.ts", size=0)
+    for path in (mp4, ts):
+        with open(path, 'wb') as f:
+            f.write(data)
+    from resources.lib.slotstore import VIDEO_FOLDER, SlotStore
+    store = SlotStore()
+    store.set_video(1, VIDEO_FOLDER + "clip.mp4")
+    store.set_video(2, VIDEO_FOLDER + "clip.ts")
+
+    thread = harness.ServiceThread()
+    service = thread.service
+    thread.start()
+    try:
+        deadline = time.monotonic() + 10
+        while not harness.window_property('VBKontrol.Slot2.Video') and time.monotonic() < deadline:
+            time.sleep(0.05)
+        url = harness.window_property('VBKontrol.Slot1.Video')
+        check(url.startswith('http://127.0.0.1:'), f"slot 1 published as {url}")
+        check(harness.window_property('VBKontrol.Slot3.Video') == '', "slot without a video has no URL")
+        parts = urlsplit(url)
+        connection = http.client.HTTPConnection(parts.hostname, parts.port, timeout=10)
+        target = f"{parts.path}?{parts.query}"
+
+        response, body = request(connection, 'HEAD', target)
+        check(response.status == 200 and int(response.getheader('Content-Length')) == size
+              and response.getheader('Accept-Ranges') == 'bytes', "HEAD gives the size and Accept-Ranges")
+
+        cache = service.loop_server.cache
+        response, body = request(connection, 'GET', target)
+        check(response.status == 200 and body == data, "GET returns the whole file")
+
+        for header, first, last in (('bytes=100-4195', 100, 4195), ('bytes=-1000', size - 1000, size - 1),
+                                    (f'bytes={size - 10}-', size - 10, size - 1),
+                                    (f'bytes=5-{size * 2}', 5, size - 1)):
+            response, body = request(connection, 'GET', target, {'Range': header})
+            check(response.status == 206 and body == data[first:last + 1]
+                  and response.getheader('Content-Range') == f"bytes {first}-{last}/{size}",
+                  f"{header} is served as bytes {first}-{last}")
+
+        response, body = request(connection, 'GET', target, {'Range': f'bytes={size}-'})
+        check(response.status == 416 and response.getheader('Content-Range') == f"bytes */{size}",
+              "a range past the end is 416")
+        response, body = request(connection, 'GET', target, {'Range': 'lines=1-2'})
+        check(response.status == 200 and body == data, "an unknown range unit is ignored")
+        for missing in ('/slot/3', '/slot/99', '/other'):
+            response, body = request(connection, 'GET', missing)
+            check(response.status == 404, f"{missing} is 404")
+
+        # Each loop the player reopens the file: it must come from memory
+        misses = cache.misses
+        started = time.perf_counter()
+        for _ in range(loops):
+            response, body = request(connection, 'GET', target)
+        elapsed = (time.perf_counter() - started) / loops
+        check(body == data and cache.misses == misses,
+              f"{loops} reopens served from the cache ({elapsed * 1000:.1f} ms each, "
+              f"{cache.hits} hits, {cache.misses} misses)")
+        connection.close()
+
+        # MPEG-TS: one endless stream of the file back to back
+        ts_url = harness.window_property('VBKontrol.Slot2.Video')
+        parts = urlsplit(ts_url)
+        connection = http.client.HTTPConnection(parts.hostname, parts.port, timeout=10)
+        connection.request('GET', f"{parts.path}?{parts.query}")
+        response = connection.getresponse()
+        check(response.status == 200 and response.getheader('Content-Length') is None,
+              "MPEG-TS slot is an endless stream")
+        streamed = response.read(size * loops)
+        check(streamed == data * loops, f"the stream repeats the file {loops} times byte for byte")
+        store.set_video(2, VIDEO_FOLDER + "clip.mp4")
+        service.update_slots([2])
+        rest = response.read()
+        check(len(rest) <= size * 2 and service.loop_server.loops >= loops,
+              "the stream ends once the slot moves to another video")
+        connection.close()
+    finally:
+        thread.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--size-mb', type=float, default=4.0)
+    parser.add_argument('--loops', type=int, default=3)
+    args = parser.parse_args()
+
+    try:
+        run(int(args.size_mb * 1024 * 1024), args.loops)
+    except Failed as e:
+        print(f"FAIL: {e}")
+        return 1
+    finally:
+        harness.teardown()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
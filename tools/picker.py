@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Time the video picker against growing video_backgrounds folders.
+
+For each library size a stub Kodi home gets that many dummy clips, the
+media index and library pages are built once (as the service would), and
+picker pages are then opened the way coldstart.py runs actions: one fresh
+interpreter each, median of --runs. The first page by name, the last
+page by size and a name-prefix search are timed, with the file opens and
+stats they made. Exits non-zero if opening a page reads more than
+meta.json and two page files, or if a median is over --budget-ms.
+
+    python tools/picker.py [--sizes 100,1000,10000] [--runs 5] [--budget-ms 50]
+"""
+
+import argparse
+import statistics
+import sys
+
+import harness
+from coldstart import run_action
+
+SLOTS = 20
+# meta.json and the (at most two) page files a view straddles
+MAX_OPENS = 3
+
+
+def build(size):
+    """Fresh home with `size` clips and up to date library pages"""
+    home = harness.setup({'num_slots': SLOTS})
+    for i in range(size):
+        harness.make_video(f"clip{i:05d}.mp4", size=64 + i % 997)
+    from benchmark import purge_modules
+    purge_modules()
+    from resources.lib.library import LibraryPages
+    from resources.lib.mediainfo import MediaIndex
+    library = LibraryPages()
+    MediaIndex(library=library).rescan(full=True)
+    return home, library.pages()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default='100,1000,10000')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget-ms', type=float, default=50.0)
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(',')]
+
+    failures = []
+    print(f"{'videos':>7s} {'page':24s} {'median':>9s} {'opens':>6s} {'stats':>6s}")
+    try:
+        for size in sizes:
+            home, pages = build(size)
+            views = {
+                'first page by name': f"action=pick&slots=1-{SLOTS}",
+                f'page {pages} by size': f"action=pick&slots=1-{SLOTS}&sort=size&page={pages}",
+                'prefix "clip0009"': f"action=pick&slots=1-{SLOTS}&prefix=clip0009",
+            }
+            for name, paramstring in views.items():
+                results = [run_action(home, SLOTS, paramstring, []) for _ in range(args.runs + 1)][1:]
+                median = statistics.median(result['ms'] for result in results)
+                calls = results[-1]['calls']
+                print(f"{size:7d} {name:24s} {median:7.1f}ms {calls.get('os.open', 0):6d} {calls.get('os.stat', 0):6d}")
+                if median > args.budget_ms:
+                    failures.append(f"{size} videos, {name}: {median:.1f} ms is over the {args.budget_ms:.0f} ms budget")
+                if calls.get('os.open', 0) > MAX_OPENS:
+                    failures.append(f"{size} videos, {name}: {calls['os.open']} files read")
+            harness.teardown()
+    finally:
+        harness.teardown()
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
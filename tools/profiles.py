@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Check per-skin slot profiles end to end against the stub Kodi modules.
+
+Creates a profile for a second skin through the plugin's Slot Profiles
+dialog (scripted with stub dialog responses), gives it its own slot
+names and videos, then runs the service and switches kodistate.skin back
+and forth. Checks that:
+  - each switch publishes the other profile's slots and leaves none of
+    the previous profile's keys behind;
+  - the published map equals a full rebuild of the active profile;
+  - slots.json is not opened during a switch;
+  - changes saved while a profile is active survive switching away and
+    back, and binding the current skin to a profile switches to it;
+  - VBKontrol.Profile.Name / Switches / SwitchMs are published.
+Exits non-zero on the first failed check.
+
+    python tools/profiles.py [--slots 20] [--switches 10]
+"""
+
+import argparse
+import builtins
+import sys
+import time
+
+import harness
+import kodistate
+
+DEFAULT_SKIN = 'skin.estuary'
+OTHER_SKIN = 'skin.arctic.zephyr'
+# Published outside the profile maps
+GROUPS = ('vbkontrol.current.', 'vbkontrol.loop.', 'vbkontrol.stats.', 'vbkontrol.timings.',
+          'vbkontrol.active.', 'vbkontrol.loopserver.', 'vbkontrol.profile.')
+
+
+class Failed(Exception):
+    pass
+
+
+def check(condition, message):
+    if not condition:
+        raise Failed(message)
+    print(f"ok   {message}")
+
+
+def wait_for(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.02)
+    return True
+
+
+def published_map():
+    """Published VBKontrol.* properties that belong to the slot profiles"""
+    return {key: value for key, value in kodistate.window_properties(10000).items()
+            if key.startswith('vbkontrol.') and not key.startswith(GROUPS)}
+
+
+def run_plugin(skin, action, responses):
+    """Run a plugin action as Kodi would with `skin` active"""
+    kodistate.skin = skin
+    kodistate.dialog_responses[:] = responses
+    action(harness.plugin())
+    leftover = list(kodistate.dialog_responses)
+    kodistate.dialog_responses[:] = []
+    return leftover
+
+
+def run(num_slots, switches):
+    harness.setup({'num_slots': num_slots, 'poll_interval': 1})
+    for name in ("home.mp4", "zephyr.mp4", "movies.mp4", "late.mp4"):
+        harness.make_video(name)
+    from resources.lib.slotstore import STORE_FILE, VIDEO_FOLDER, SlotStore
+
+    store = SlotStore(skin=DEFAULT_SKIN)
+    store.set_video(1, VIDEO_FOLDER + "home.mp4")
+    store.set_video(2, VIDEO_FOLDER + "movies.mp4")
+
+    # Slot Profiles -> "New Profile for <skin>", named Zephyr
+    leftover = run_plugin(OTHER_SKIN, lambda plugin: plugin.manage_profiles(), [0, "Zephyr"])
+    check(not leftover and SlotStore().profile_skins("Zephyr") == [OTHER_SKIN],
+          f"the plugin created profile Zephyr for {OTHER_SKIN}")
+    zephyr = SlotStore(skin=OTHER_SKIN)
+    check(zephyr.profile == "Zephyr" and zephyr.get_video(2) == VIDEO_FOLDER + "movies.mp4",
+          "the new profile starts as a copy of the default slots")
+    zephyr.set_name(1, "Start")
+    zephyr.set_video(1, VIDEO_FOLDER + "zephyr.mp4")
+    zephyr.clear_video(2)
+    check(SlotStore(skin=DEFAULT_SKIN).get_name(1) != "Start", "editing Zephyr leaves the default slots alone")
+
+    kodistate.skin = DEFAULT_SKIN
+    thread = harness.ServiceThread()
+    service = thread.service
+    thread.start()
+
+    # Watch for slots.json being opened from any thread
+    opens = []
+    real_open = builtins.open
+
+    def counted_open(file, *args, **kwargs):
+        if str(file).endswith(STORE_FILE):
+            opens.append(file)
+        return real_open(file, *args, **kwargs)
+
+    def profile():
+        return harness.window_property('VBKontrol.Profile.Name')
+
+    try:
+        check(wait_for(lambda: profile() == "Default" and harness.window_property('VBKontrol.Slot1.Video')),
+              f"the service started with the default slots for {DEFAULT_SKIN}")
+        check(wait_for(lambda: "Zephyr" in service.profile_states
+                       and service.profile_states["Zephyr"].properties is not None),
+              "the Zephyr map was compiled after start-up")
+        # Probe answers settle the map first
+        check(wait_for(lambda: harness.window_property('VBKontrol.Slot1.VideoExists')
+                       and harness.window_property('VBKontrol.Slot2.VideoExists')),
+              "the default videos were probed")
+        default_map = published_map()
+        check(default_map.get('vbkontrol.home.video', '').endswith("home.mp4")
+              and default_map.get('vbkontrol.slot2.video', '').endswith("movies.mp4"),
+              "default slots published")
+
+        times = []
+        builtins.open = counted_open
+        try:
+            for n in range(1, switches + 1):
+                skin, name = (OTHER_SKIN, "Zephyr") if n % 2 else (DEFAULT_SKIN, "Default")
+                kodistate.skin = skin
+                check(wait_for(lambda: profile() == name
+                               and harness.window_property('VBKontrol.Profile.Switches') == str(n)),
+                      f"switch {n}: {skin} -> profile {name}")
+                times.append(float(harness.window_property('VBKontrol.Profile.SwitchMs')))
+                current = published_map()
+                if name == "Zephyr":
+                    check(current.get('vbkontrol.start.video', '').endswith("zephyr.mp4")
+                          and current.get('vbkontrol.slot1.name') == "Start"
+                          and 'vbkontrol.home.video' not in current and 'vbkontrol.slot2.video' not in current,
+                          f"switch {n}: Zephyr's slots published, no default keys left")
+                else:
+                    check(current == default_map, f"switch {n}: the default map is back exactly")
+        finally:
+            builtins.open = real_open
+        check(not opens, f"slots.json was not opened in {switches} switches")
+        print(f"     switch time {min(times):.2f}-{max(times):.2f} ms, {num_slots} slots")
+
+        # A change saved while Zephyr is active survives switching away and back
+        kodistate.skin = OTHER_SKIN
+        check(wait_for(lambda: profile() == "Zephyr"), "back on Zephyr")
+        plugin = harness.plugin()
+        plugin.set_slot_video(3, VIDEO_FOLDER + "late.mp4")
+        check(wait_for(lambda: harness.window_property('VBKontrol.Slot3.Video').endswith("late.mp4")),
+              "a video assigned in Zephyr is published")
+        kodistate.skin = DEFAULT_SKIN
+        check(wait_for(lambda: profile() == "Default" and not harness.window_property('VBKontrol.Slot3.Video')),
+              "the default slots do not have it")
+        kodistate.skin = OTHER_SKIN
+        check(wait_for(lambda: profile() == "Zephyr"
+                       and harness.window_property('VBKontrol.Slot3.Video').endswith("late.mp4")),
+              "switching back to Zephyr brings it back")
+
+        # Slot Profiles in the default skin -> "Use Zephyr for <skin>"
+        leftover = run_plugin(DEFAULT_SKIN, lambda plugin: plugin.manage_profiles(), [1])
+        check(not leftover and SlotStore().profile_for_skin(DEFAULT_SKIN) == "Zephyr",
+              f"the plugin bound {DEFAULT_SKIN} to Zephyr")
+        kodistate.skin = DEFAULT_SKIN
+        check(wait_for(lambda: profile() == "Zephyr"
+                       and harness.window_property('VBKontrol.Slot3.VideoExists')),
+              f"{DEFAULT_SKIN} shows Zephyr without a skin change")
+        current = published_map()
+    finally:
+        thread.stop()
+
+    # Against a full rebuild of the active profile, once the service is idle
+    expected = {key.lower(): value for key, value in service.build_profile_properties().items()}
+    check(current == expected,
+          f"the published map equals a full rebuild ({len(current)} properties, "
+          f"{len(current.keys() - expected.keys())} stale, {len(expected.keys() - current.keys())} missing)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--slots', type=int, default=20)
+    parser.add_argument('--switches', type=int, default=10)
+    args = parser.parse_args()
+
+    try:
+        run(args.slots, args.switches)
+    except Failed as e:
+        print(f"FAIL: {e}")
+        return 1
+    finally:
+        harness.teardown()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Check rotation playlists end to end on a simulated clock.
+
+Builds two playlists through the plugin's configure dialog, scripted with
+stub dialog responses: one ordered, rotating every --minutes of the day,
+and one shuffled, rotating every two loops. Then runs the service on a
+FakeClock whose wall time starts just before a switch, and checks:
+  - VBKontrol.SlotN.Video and NextVideo follow the precomputed schedule;
+  - the next clip is warmed (prefetch) before its switch, not after;
+  - the shuffled playlist never shows a clip twice in a row;
+  - between switches a cycle does no schedule lookup, listing or random
+    draw, however many cycles run;
+  - assigning a single video replaces the playlist and clears NextVideo.
+Exits non-zero if any check fails.
+
+    python tools/rotation.py [--minutes 10] [--hours 2]
+"""
+
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+
+import harness
+import kodistate
+
+CLIPS = ("dawn.mp4", "noon.mp4", "dusk.mp4")
+LOOP_SECONDS = 30.0  # playlist.DEFAULT_LOOP_SECONDS: the dummy clips have no duration
+
+
+def make_playlist(slot, responses):
+    """Run configure_slot for `slot` with scripted dialog answers"""
+    kodistate.dialog_responses[:] = responses
+    harness.plugin(f"action=configure_slot&slot={slot}").configure_slot(slot)
+    leftover = list(kodistate.dialog_responses)
+    kodistate.dialog_responses[:] = []
+    return leftover
+
+
+class Check:
+    def __init__(self):
+        self.failures = []
+
+    def __call__(self, condition, message):
+        print(f"{'ok  ' if condition else 'FAIL'} {message}")
+        if not condition:
+            self.failures.append(message)
+
+
+def run(minutes, hours):
+    check = Check()
+    # Probes run on real threads: a long timeout keeps the fast FakeClock
+    # from timing them out
+    harness.setup({'num_slots': 5, 'poll_interval': 60, 'probe_cache_ttl': 60, 'probe_timeout': 30,
+                   'dwell_ms': 400, 'prefetch_enabled': True, 'prefetch_mb': 1, 'prefetch_budget_mb': 64,
+                   'playlist_warm_seconds': 60})
+    for name in CLIPS:
+        harness.make_video(name)
+    from resources.lib.slotstore import VIDEO_FOLDER, SlotStore
+    videos = [VIDEO_FOLDER + name for name in CLIPS]
+
+    # Slot 2: configure -> "Rotate a Playlist", add the clips, every N minutes, save
+    leftover = make_playlist(2, [1, 0, videos, 4, 0, str(minutes), 5])
+    # Slot 3: add, order -> shuffled, every 2 loops, save
+    leftover += make_playlist(3, [1, 0, videos, 3, 4, 1, "2", 5])
+    check(not leftover, "the configure dialogs used every scripted answer")
+    store = SlotStore()
+    ordered, shuffled = store.get_playlist(2), store.get_playlist(3)
+    check(ordered and ordered['mode'] == 'minutes' and ordered['every'] == minutes
+          and len(ordered['clips']) == 24 * 60 // minutes and not store.get_video(2),
+          f"slot 2 saved a {minutes}-minute schedule of {len(ordered['clips']) if ordered else 0} entries")
+    check(shuffled and shuffled['mode'] == 'loops' and shuffled['order'] == 'shuffled'
+          and sorted(set(shuffled['clips'])) == [0, 1, 2] and shuffled['period'] == len(shuffled['clips']) * 2 * LOOP_SECONDS,
+          f"slot 3 saved a shuffled schedule of {len(shuffled['clips']) if shuffled else 0} entries, every 2 loops")
+
+    # Wall time starts 90 s before a switch of the minutes playlist
+    clock = kodistate.clock = kodistate.FakeClock()
+    local = time.localtime()
+    midnight = time.mktime((local.tm_year, local.tm_mon, local.tm_mday, 0, 0, 0, 0, 0, -1))
+    step = minutes * 60
+    first_switch = midnight + (local.tm_hour * 3600 + local.tm_min * 60) // step * step + step
+    epoch = first_switch - 90 - clock()
+    if time.localtime(first_switch).tm_mday != local.tm_mday:
+        # Too close to midnight to follow a whole day's steps: start yesterday morning
+        epoch -= 12 * 3600
+        first_switch -= 12 * 3600
+    kodistate.last_input = clock()
+    kodistate.conditions['Window.IsActive(home)'] = True
+
+    thread = harness.ServiceThread(clock=clock, wall_clock=lambda: epoch + clock())
+    service = thread.service
+
+    # Count schedule lookups, prefetch requests and any listing or draw
+    from resources.lib import playlist
+    counts = {'locate': 0, 'warm': [], 'listdir': 0, 'random': 0}
+    locate = playlist.locate
+
+    def counted_locate(*args):
+        counts['locate'] += 1
+        return locate(*args)
+    playlist.locate = counted_locate
+    warm = service.prefetcher.warm
+    service.prefetcher.warm = lambda paths: (counts['warm'].append((epoch + clock(), list(paths))), warm(paths))
+    listdir, shuffle = os.listdir, random.Random.shuffle
+    service_thread = threading.get_ident()
+
+    def expected(slot, wall, offset=0):
+        record = store.get_playlist(slot)
+        index = locate(record, wall)[0]
+        return record['videos'][record['clips'][(index + offset) % len(record['clips'])]]
+
+    def published(slot, key='Video'):
+        return harness.window_property(f'VBKontrol.Slot{slot}.{key}')
+
+    seen = {2: [], 3: []}
+
+    def sample():
+        wall = epoch + clock()
+        for slot in seen:
+            video = published(slot)
+            if video and (not seen[slot] or seen[slot][-1][1] != video):
+                seen[slot].append((wall, video))
+        clock.after(1, sample)
+
+    def before_switch():
+        wall = epoch + clock()
+        check(published(2) == expected(2, wall) and published(2, 'NextVideo') == expected(2, wall, 1),
+              f"slot 2 shows {os.path.basename(published(2))}, next {os.path.basename(published(2, 'NextVideo'))}")
+        counts['locate'] = 0
+
+        # Only the service's own cycles; the media index lists the folder
+        # on its worker thread
+        def counted_listdir(*args):
+            counts['listdir'] += threading.get_ident() == service_thread
+            return listdir(*args)
+
+        def counted_shuffle(*args):
+            counts['random'] += threading.get_ident() == service_thread
+            return shuffle(*args)
+        os.listdir, random.Random.shuffle = counted_listdir, counted_shuffle
+
+    def after_switch():
+        wall = epoch + clock()
+        # The last request for the clip before it showed (slot 3 may want it too)
+        warmed = [at for at, paths in counts['warm'] if at < first_switch
+                  and service.resolve_video(expected(2, first_switch)) in paths]
+        check(warmed and first_switch - warmed[-1] <= 60 + 1,
+              f"the next clip was warmed {first_switch - warmed[-1]:.0f} s before the switch" if warmed
+              else "the next clip was warmed before the switch")
+        check(published(2) == expected(2, wall) and published(2, 'NextVideo') == expected(2, wall, 1),
+              f"after the switch slot 2 shows {os.path.basename(published(2))}, "
+              f"next {os.path.basename(published(2, 'NextVideo'))}")
+
+    def finish():
+        os.listdir, random.Random.shuffle = listdir, shuffle
+        cycles = service.stats.cycles
+        switches = sum(len(changes) for changes in seen.values())
+        check(counts['listdir'] == 0 and counts['random'] == 0,
+              f"no folder listing or random draw in {cycles} cycles")
+        # One lookup per switch and slot, plus one per warm-up of a cursor
+        check(counts['locate'] <= 2 * switches + 4,
+              f"{counts['locate']} schedule lookups for {switches} switches in {cycles} cycles")
+        videos2 = [video for _, video in seen[2]]
+        check(len(videos2) >= hours * 60 // minutes
+              and all(video == expected(2, wall) for wall, video in seen[2][1:]),
+              f"slot 2 switched {len(videos2) - 1} times, each on its schedule")
+        videos3 = [video for _, video in seen[3]]
+        check(len(videos3) > 3 and all(a != b for a, b in zip(videos3, videos3[1:])),
+              f"slot 3 showed {len(videos3)} clips, never the same twice in a row")
+        gaps = [b - a for (a, _), (b, _) in zip(seen[3][1:], seen[3][2:])]
+        check(gaps and all(abs(gap - 2 * LOOP_SECONDS) <= 2 for gap in gaps),
+              f"slot 3 switched every {min(gaps):.0f}-{max(gaps):.0f} s (2 loops of {LOOP_SECONDS:.0f} s)")
+
+        # A single video replaces the playlist
+        plugin = harness.plugin()
+        plugin.set_slot_video(2, videos[0])
+        clock.after(2, replaced)
+
+    def replaced():
+        check(published(2).endswith(CLIPS[0]) and not published(2, 'NextVideo')
+              and not SlotStore().get_playlist(2),
+              "assigning one video replaced the playlist and cleared NextVideo")
+        kodistate.abort.set()
+
+    start = clock()
+    clock.at(start + 5, sample)
+    clock.at(start + 10, before_switch)
+    clock.at(start + 90 + 5, after_switch)
+    clock.at(start + 90 + hours * 3600, finish)
+    try:
+        service.start()
+    finally:
+        playlist.locate = locate
+        os.listdir, random.Random.shuffle = listdir, shuffle
+    return check.failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--minutes', type=int, default=10)
+    parser.add_argument('--hours', type=float, default=2.0)
+    args = parser.parse_args()
+
+    try:
+        failures = run(args.minutes, args.hours)
+    finally:
+        harness.teardown()
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
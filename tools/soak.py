@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Soak the service for simulated days and fail if anything keeps growing.
+
+Runs VBKontrolService.start() against the stub Kodi modules on a
+FakeClock, so days pass in minutes. Every simulated day has a night of
+screensaver, an evening film and menus in between with the focus moving
+between home items and windows. Around the clock, the plugin assigns,
+clears and renames slots, and clips vanish from the folder and come back.
+Each simulated hour records:
+  - traced memory (tracemalloc);
+  - open file descriptors;
+  - the number of window properties;
+  - stale properties: keys the service no longer owns, e.g. left behind
+    by a rename;
+  - the wall time of the service cycles.
+
+After a warm-up, the script exits non-zero if any of these happens:
+  - memory, descriptors or the property map grow faster than the bounds
+    allow (least-squares slope per simulated day);
+  - a stale property is ever seen;
+  - the p95 cycle time drifts between the first and last quarter.
+
+    python tools/soak.py [--days 2] [--slots 200] [--seed 1]
+                         [--max-memory-kb-per-day 256] [--max-latency-drift 1.5]
+"""
+
+import argparse
+import gc
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+import harness
+import kodistate
+
+HOUR = 3600.0
+DAY = 24 * HOUR
+CLIPS = 40
+FILM = "/media/films/film.mkv"
+WORDS = ("Kids", "Sport", "News", "Docs", "Retro", "Anime", "Jazz", "Travel", "Cinema", "Lounge")
+# Other windows the focus wanders into: video library, music, weather, settings
+WINDOWS = (10025, 10502, 12600, 10004)
+
+
+def open_fds():
+    try:
+        return len(os.listdir('/proc/self/fd'))
+    except OSError:
+        return None
+
+
+def slope_per_day(samples):
+    """Least-squares slope of (hour, value) samples, per day"""
+    n = len(samples)
+    if n < 2:
+        return 0.0
+    mean_x = sum(x for x, _ in samples) / n
+    mean_y = sum(y for _, y in samples) / n
+    var = sum((x - mean_x) ** 2 for x, _ in samples)
+    if not var:
+        return 0.0
+    return sum((x - mean_x) * (y - mean_y) for x, y in samples) / var * 24
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)] if ordered else 0.0
+
+
+class Soak:
+    def __init__(self, days, num_slots, seed, warmup):
+        self.days = days
+        self.warmup = warmup
+        self.num_slots = num_slots
+        self.random = random.Random(seed)
+        harness.setup({
+            'num_slots': num_slots, 'poll_interval': 60, 'poll_jitter': 5, 'probe_timeout': 5,
+            'probe_cache_ttl': 60, 'stats_interval': 60, 'dwell_ms': 1000, 'menu_container_id': 9000,
+            'background_playback': True, 'video_loop': True, 'prefetch_enabled': True,
+            'prefetch_neighbours': 1, 'prefetch_mb': 1, 'prefetch_budget_mb': 64,
+            'staging_enabled': True, 'staging_budget_mb': 64, 'variant_measure': True,
+            'variant_drop_threshold': 5,
+        })
+        self.clips = [harness.make_video(f"clip{i:02d}.mp4", size=4096 + i) for i in range(CLIPS)]
+        from resources.lib.slotstore import VIDEO_FOLDER, SlotStore
+        self.video_folder = VIDEO_FOLDER
+        store = SlotStore()
+        with store.transaction():
+            for i in range(1, num_slots + 1):
+                if self.random.random() < 0.8:
+                    store.set_video(i, self.video(self.random.randrange(CLIPS)))
+        self.clock = kodistate.clock = kodistate.FakeClock()
+        kodistate.durations[FILM] = 3 * HOUR
+        kodistate.last_input = self.clock()
+        kodistate.conditions['Window.IsActive(home)'] = True
+
+        self.service = harness.ServiceThread(clock=self.clock).service
+        self.start = self.clock()
+        self.cycle_ms = []  # wall ms of the service cycles this hour
+        self.samples = []  # dicts, one per simulated hour
+        self.baseline = None  # tracemalloc snapshot at the end of the warm-up
+        self.snapshot = None
+        self.edits = 0
+        run_cycle = self.service.run_cycle
+
+        def timed_cycle():
+            started = time.perf_counter()
+            run_cycle()
+            self.cycle_ms.append((time.perf_counter() - started) * 1000)
+        self.service.run_cycle = timed_cycle
+
+    def video(self, index):
+        return self.video_folder + os.path.basename(self.clips[index])
+
+    def at(self, offset, callback):
+        self.clock.at(self.start + offset, callback)
+
+    def every(self, mean, callback):
+        """Run `callback` at random intervals averaging `mean` seconds"""
+        def fire():
+            callback()
+            self.clock.after(self.random.expovariate(1.0 / mean), fire)
+        self.clock.after(self.random.expovariate(1.0 / mean), fire)
+
+    # --- Simulated user -------------------------------------------------
+
+    def in_menus(self):
+        hour = (self.clock() - self.start) % DAY / HOUR
+        return 8 <= hour < 19 or hour >= 22
+
+    def move_focus(self):
+        if not self.in_menus():
+            return
+        kodistate.last_input = self.clock()
+        if self.random.random() < 0.7:
+            kodistate.window_id = 10000
+            kodistate.conditions['Window.IsActive(home)'] = True
+            slot = self.random.randint(1, min(self.num_slots, 20))
+            kodistate.infolabels['Container(9000).ListItem.Label'] = self.service.get_slot_name(slot)
+        else:
+            kodistate.window_id = self.random.choice(WINDOWS)
+            kodistate.conditions['Window.IsActive(home)'] = False
+            kodistate.infolabels['Container.Content'] = self.random.choice(('movies', 'tvshows', ''))
+
+    def edit(self):
+        """What a user does in the plugin: assign, clear or rename a slot"""
+        plugin = harness.plugin()
+        slot = self.random.randint(1, self.num_slots)
+        action = self.random.random()
+        # Assigning 4 times as often as clearing keeps 80% of slots assigned
+        if action < 0.4:
+            plugin.set_slot_video(slot, self.video(self.random.randrange(CLIPS)))
+        elif action < 0.5:
+            plugin.clear_slot_video(slot)
+        elif action < 0.9:
+            kodistate.dialog_responses.append(f"{self.random.choice(WORDS)} {slot}")
+            plugin.rename_slot(slot)
+        else:
+            from resources.lib.slotstore import default_slot_name
+            kodistate.dialog_responses.append(default_slot_name(slot))
+            plugin.rename_slot(slot)
+        self.edits += 1
+
+    def vanish(self):
+        """A clip disappears (unplugged drive, sync job) and comes back later"""
+        path = self.clips[self.random.randrange(CLIPS)]
+        if not os.path.exists(path):
+            return
+        os.remove(path)
+
+        def restore():
+            with open(path, 'wb') as f:
+                f.write(b'\0' * 4096)
+        self.clock.after(self.random.uniform(0.5, 6) * HOUR, restore)
+
+    def schedule(self):
+        import xbmc
+        for day in range(self.days):
+            base = day * DAY
+            self.at(base, lambda: xbmc.sim_screensaver(True))
+            self.at(base + 8 * HOUR, lambda: (xbmc.sim_screensaver(False), self.move_focus()))
+            self.at(base + 19 * HOUR, lambda: xbmc.Player().play(FILM))
+            self.at(base + 22 * HOUR, lambda: (xbmc.Player().stop(), self.move_focus()))
+        self.every(90, self.move_focus)
+        self.every(600, self.edit)
+        self.every(2 * HOUR, self.vanish)
+        for hour in range(1, self.days * 24 + 1):
+            self.at(hour * HOUR, self.sample)
+        self.at(self.days * DAY + 1, kodistate.abort.set)
+
+    # --- Measurements ---------------------------------------------------
+
+    def owned_keys(self):
+        """Lowercase property keys the service currently means to publish"""
+        service = self.service
+        keys = {'vbkontrol.service.running', 'vbkontrol.service.version', 'vbkontrol.totalslots'}
+        for slot_keys in service.slot_keys.values():
+            keys.update(key.lower() for key in slot_keys)
+        for group in service.group_properties.values():
+            keys.update(key.lower() for key in group)
+        return keys
+
+    def sample(self):
+        # Kodi writes its log to a file; the stub keeps every line in memory
+        del kodistate.log_lines[:]
+        gc.collect()
+        hour = (self.clock() - self.start) / HOUR
+        if self.baseline is None and hour >= self.warmup:
+            self.baseline = tracemalloc.take_snapshot()
+        window = kodistate.window_properties(10000)
+        stale = sorted(set(window) - self.owned_keys())
+        self.samples.append({
+            'hour': hour,
+            'memory': tracemalloc.get_traced_memory()[0] / 1024.0,
+            'fds': open_fds(),
+            'properties': len(window),
+            'stale': stale,
+            'p50': percentile(self.cycle_ms, 0.5),
+            'p95': percentile(self.cycle_ms, 0.95),
+            'cycles': len(self.cycle_ms),
+        })
+        self.cycle_ms = []
+
+    def run(self):
+        tracemalloc.start()
+        self.schedule()
+        self.service.start()
+        self.snapshot = tracemalloc.take_snapshot()
+
+
+def report(soak, warmup, max_memory, max_fds, max_properties, max_drift):
+    print(f"{'hour':>5s} {'memory KB':>10s} {'fds':>4s} {'props':>6s} {'stale':>5s} "
+          f"{'cycles':>7s} {'p50 ms':>7s} {'p95 ms':>7s}")
+    for sample in soak.samples:
+        if int(sample['hour']) % 6 == 0 or sample is soak.samples[-1]:
+            print(f"{sample['hour']:5.0f} {sample['memory']:10.0f} {sample['fds'] or 0:4d} "
+                  f"{sample['properties']:6d} {len(sample['stale']):5d} {sample['cycles']:7d} "
+                  f"{sample['p50']:7.3f} {sample['p95']:7.3f}")
+
+    failures = []
+    measured = [sample for sample in soak.samples if sample['hour'] > warmup]
+    if len(measured) < 8:
+        return ["too few samples after the warm-up; run more --days"]
+
+    for name, bound, unit in (('memory', max_memory, "KB"), ('fds', max_fds, "descriptors"),
+                              ('properties', max_properties, "properties")):
+        values = [(sample['hour'], sample[name]) for sample in measured if sample[name] is not None]
+        growth = slope_per_day(values)
+        print(f"{name} growth: {growth:+.1f} {unit}/day (bound {bound})")
+        if growth > bound:
+            failures.append(f"{name} grows {growth:.1f} {unit}/day, over {bound}")
+
+    stale = [sample for sample in soak.samples if sample['stale']]
+    if stale:
+        failures.append(f"stale properties at hour {stale[0]['hour']:.0f}: {', '.join(stale[0]['stale'][:5])}")
+
+    # Hours spent in the screensaver or a film run no cycles
+    busy = [sample for sample in measured if sample['cycles']]
+    quarter = max(len(busy) // 4, 1)
+    first = percentile([sample['p95'] for sample in busy[:quarter]], 0.5)
+    last = percentile([sample['p95'] for sample in busy[-quarter:]], 0.5)
+    print(f"cycle p95: {first:.3f} ms in the first quarter, {last:.3f} ms in the last")
+    # Sub-0.2 ms differences are timer noise, not drift
+    if last > first * max_drift and last - first > 0.2:
+        failures.append(f"cycle p95 drifted from {first:.3f} ms to {last:.3f} ms")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--days', type=int, default=2)
+    parser.add_argument('--slots', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--warmup-hours', type=float, default=12.0)
+    parser.add_argument('--max-memory-kb-per-day', type=float, default=256.0)
+    parser.add_argument('--max-fds-per-day', type=float, default=0.5)
+    parser.add_argument('--max-properties-per-day', type=float, default=200.0)
+    parser.add_argument('--max-latency-drift', type=float, default=1.5)
+    args = parser.parse_args()
+
+    started = time.monotonic()
+    try:
+        soak = Soak(args.days, args.slots, args.seed, args.warmup_hours)
+        soak.run()
+        failures = report(soak, args.warmup_hours, args.max_memory_kb_per_day,
+                          args.max_fds_per_day, args.max_properties_per_day, args.max_latency_drift)
+        print(f"{args.days} simulated days, {soak.edits} plugin edits, "
+              f"{time.monotonic() - started:.0f} s wall time")
+        if failures and soak.baseline and soak.snapshot:
+            print("allocations grown most since the warm-up:")
+            for stat in soak.snapshot.compare_to(soak.baseline, 'lineno')[:8]:
+                print(f"  {stat}")
+    finally:
+        harness.teardown()
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())